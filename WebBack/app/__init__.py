@@ -1,8 +1,20 @@
-from flask import Flask, g
+from flask import Flask, g, request
 from flask_cors import CORS
 from database.db import Storage
+from database.filestore import staging_folder, sweep_staging
+from database.pool import ConnectionPool
+from .cache import TTLCache
+from .file_deletions import FileDeletionWorker
+from .images import ImageVariantPipeline, pillow_available
+from .jobs import JobQueue
+from .maintenance import MaintenanceScheduler
+from .passwords import PasswordHasher
+from .ratelimit import RateLimiter, create_backend
 import os
-    
+
+# Методы, не изменяющие данные
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
 def create_app(config_object='config'):
     app = Flask(__name__)
     app.config.from_object(config_object)
@@ -15,7 +27,15 @@ def create_app(config_object='config'):
 
     configure_cors(app)
     configure_uploads(app)
+    configure_rate_limits(app)
     configure_database(app)
+    configure_auth_cache(app)
+    configure_passwords(app)
+    configure_images(app)
+    configure_file_deletions(app)
+    configure_maintenance(app)
+    configure_jobs(app)
+    configure_commands(app)
 
     # Регистрация маршрутов
     from .routes import bp
@@ -40,11 +60,70 @@ def configure_uploads(app):
         os.makedirs(upload_dir)
     app.config['UPLOAD_FOLDER'] = os.path.abspath(upload_dir)
 
+    # Загрузки сначала пишутся в staging (см. database/filestore.py);
+    # остатки прерванных запросов убираем при старте
+    os.makedirs(staging_folder(app.config['UPLOAD_FOLDER']), exist_ok=True)
+    swept = sweep_staging(app.config['UPLOAD_FOLDER'], app.config.get('UPLOAD_STAGING_MAX_AGE', 3600))
+    if swept["removed"]:
+        app.logger.info(f"Удалено брошенных staged-загрузок: {swept['removed']}")
+
+def configure_rate_limits(app):
+    # Token bucket по RATE_LIMITS (app/ratelimit.py). Регистрируется до connect_db,
+    # поэтому отклонённый запрос не берёт соединение с БД.
+    rules = app.config.get('RATE_LIMITS')
+    if not app.config.get('RATE_LIMIT_ENABLED', True) or not rules:
+        app.extensions['rate_limiter'] = None
+        return
+    limiter = RateLimiter(rules, create_backend(app.config))
+    app.extensions['rate_limiter'] = limiter
+
+    @app.before_request
+    def check_rate_limits():
+        limiter.check()
+
 def configure_database(app):
+    # Схема приводится к актуальной версии один раз при старте процесса,
+    # а не на каждый запрос
+    if app.config.get('DB_MIGRATE_ON_STARTUP', True):
+        db = Storage(app.config['DATABASE_PATH'])
+        try:
+            applied = db.migrate()
+            if applied:
+                app.logger.info(f"Применены миграции схемы: {applied}")
+        finally:
+            db.close_connection()
+
+    # Пулы соединений на процесс: соединения настраиваются один раз и переиспользуются.
+    # Чтение (в том числе в POST вроде входа) идёт через соединения только для чтения
+    # (mode=ro, query_only), все изменения — через единственное сериализованное
+    # пишущее соединение, которое берётся только на время транзакции (Storage.writer).
+    pool_options = dict(
+        busy_timeout=app.config.get('DB_BUSY_TIMEOUT', 10),
+        cached_statements=app.config.get('DB_CACHED_STATEMENTS', 256),
+        pragmas=app.config.get('DB_PRAGMAS')
+    )
+    read_pool = ConnectionPool(
+        app.config['DATABASE_PATH'],
+        size=app.config.get('DB_POOL_SIZE', 8),
+        timeout=app.config.get('DB_POOL_TIMEOUT', 10),
+        readonly=True,
+        **pool_options
+    )
+    write_pool = ConnectionPool(
+        app.config['DATABASE_PATH'],
+        size=1,
+        timeout=app.config.get('DB_WRITE_POOL_TIMEOUT', 30),
+        **pool_options
+    )
+    app.extensions['db_read_pool'] = read_pool
+    app.extensions['db_write_pool'] = write_pool
+
     @app.before_request
     def connect_db():
-        g.db = Storage()
-        g.db.open_connection()
+        # Соединение не берётся заранее: читающее — при первом обращении к БД,
+        # пишущее — методами Storage, которые меняют данные. Нехватка соединений
+        # в пуле превращается в 503 обработчиком PoolTimeoutError (app/routes.py).
+        g.db = Storage(pool=read_pool, write_pool=write_pool)
 
     @app.teardown_appcontext
     def disconnect_db(exception=None):
@@ -54,3 +133,126 @@ def configure_database(app):
                 db.close_connection()
             except Exception as e:
                 app.logger.error(f"Ошибка при закрытии БД: {str(e)}")
+
+def configure_auth_cache(app):
+    # Кэши на процесс (app/cache.py): проверенные JWT и строки пользователей по логину.
+    # Размер 0 отключает кэш.
+    token_cache_size = app.config.get('TOKEN_CACHE_SIZE', 0)
+    user_cache_size = app.config.get('USER_CACHE_SIZE', 0)
+    app.extensions['token_cache'] = (
+        TTLCache(token_cache_size, app.config.get('TOKEN_CACHE_TTL', 300))
+        if token_cache_size else None
+    )
+    app.extensions['user_cache'] = (
+        TTLCache(user_cache_size, app.config.get('USER_CACHE_TTL', 60))
+        if user_cache_size else None
+    )
+
+def configure_passwords(app):
+    # Хэширование и проверка паролей в ограниченном пуле процессов (app/passwords.py)
+    app.extensions['password_hasher'] = PasswordHasher(
+        method=app.config.get('PASSWORD_HASH_METHOD', 'scrypt'),
+        workers=app.config.get('PASSWORD_HASH_WORKERS', 2),
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', 32),
+        queue_timeout=app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 5)
+    )
+
+def configure_images(app):
+    # Фоновые уменьшенные копии изображений (app/images.py); без Pillow — только оригиналы
+    widths = app.config.get('IMAGE_VARIANT_WIDTHS')
+    if not widths:
+        return
+    if not pillow_available():
+        app.logger.warning("Pillow не установлен: уменьшенные копии изображений не строятся")
+        return
+    app.extensions['image_variants'] = ImageVariantPipeline(
+        app.config['DATABASE_PATH'],
+        app.config['UPLOAD_FOLDER'],
+        widths,
+        quality=app.config.get('IMAGE_VARIANT_QUALITY', 80),
+        workers=app.config.get('IMAGE_VARIANT_WORKERS', 2)
+    )
+
+def configure_file_deletions(app):
+    # Файлы удалённых записей Files стираются с диска в фоне по журналу File_Deletions
+    # (app/file_deletions.py); FILE_DELETION_WORKERS = 0 — только командой file-deletions-drain
+    workers = app.config.get('FILE_DELETION_WORKERS', 4)
+    worker = FileDeletionWorker(
+        app.config['DATABASE_PATH'],
+        app.config['UPLOAD_FOLDER'],
+        workers=max(workers, 1),
+        batch_size=app.config.get('FILE_DELETION_BATCH_SIZE', 100),
+        max_attempts=app.config.get('FILE_DELETION_MAX_ATTEMPTS', 8),
+        retry_delay=app.config.get('FILE_DELETION_RETRY_DELAY', 30),
+        poll_interval=app.config.get('FILE_DELETION_POLL_INTERVAL', 60)
+    )
+    app.extensions['file_deletions'] = worker
+    if not workers:
+        return
+
+    @app.before_request
+    def start_file_deletions():
+        worker.start()
+
+    @app.after_request
+    def notify_file_deletions(response):
+        # Изменяющий запрос мог удалить записи Files
+        if request.method not in READ_ONLY_METHODS and response.status_code < 400:
+            worker.notify()
+        return response
+
+def configure_maintenance(app):
+    # Плановое обслуживание (app/maintenance.py): поток в каждом процессе,
+    # задачи выполняет только держатель аренды в Maintenance_Lease
+    scheduler = MaintenanceScheduler(
+        app.config['DATABASE_PATH'],
+        app.config['UPLOAD_FOLDER'],
+        app.config.get('MAINTENANCE_INTERVALS', {}),
+        tick=app.config.get('MAINTENANCE_TICK', 60),
+        lease_ttl=app.config.get('MAINTENANCE_LEASE_TTL', 180),
+        trash_days=app.config.get('TRASH_RETENTION_DAYS', 30),
+        purge_batch_size=app.config.get('TRASH_PURGE_BATCH_SIZE', 500),
+        purge_max_batches=app.config.get('TRASH_PURGE_MAX_BATCHES', 20),
+        staging_max_age=app.config.get('UPLOAD_STAGING_MAX_AGE', 3600),
+        analysis_limit=app.config.get('DB_ANALYSIS_LIMIT', 1000)
+    )
+    app.extensions['maintenance'] = scheduler
+    if not app.config.get('MAINTENANCE_ENABLED', True):
+        return
+
+    @app.before_request
+    def start_maintenance():
+        scheduler.start()
+
+def configure_jobs(app):
+    # Долгие операции админки выполняются фоновыми заданиями из таблицы Jobs
+    # (app/jobs.py); JOBS_WORKERS = 0 — только командой jobs-run
+    def on_finish(job):
+        # Удалённые записи Files ждут в журнале File_Deletions; строки удалённых
+        # пользователей в кэше этого процесса больше не действительны
+        app.extensions['file_deletions'].notify()
+        user_cache = app.extensions.get('user_cache')
+        if job['kind'] == 'delete_all_users' and user_cache is not None:
+            user_cache.clear()
+
+    workers = app.config.get('JOBS_WORKERS', 1)
+    queue = JobQueue(
+        app.config['DATABASE_PATH'],
+        workers=max(workers, 1),
+        batch_size=app.config.get('JOBS_BATCH_SIZE', 2000),
+        poll_interval=app.config.get('JOBS_POLL_INTERVAL', 5),
+        lease=app.config.get('JOBS_LEASE', 120),
+        batch_pause=app.config.get('JOBS_BATCH_PAUSE', 0.05),
+        on_finish=on_finish
+    )
+    app.extensions['jobs'] = queue
+    if not workers:
+        return
+
+    @app.before_request
+    def start_jobs():
+        queue.start()
+
+def configure_commands(app):
+    from .commands import register_commands
+    register_commands(app)
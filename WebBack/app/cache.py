@@ -0,0 +1,82 @@
+"""
+Ограниченный по размеру LRU-кэш со сроком жизни записей (на процесс).
+
+Используется для проверенных JWT (decorators.get_current_user) и строк
+пользователей (routes.get_user_by_login). Запись живёт не дольше ttl секунд,
+а если при записи передан expires_at (unix-время, например exp токена) —
+не дольше него. При переполнении вытесняется давно не использованная запись.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache(object):
+    def __init__(self, maxsize: int, ttl: float):
+        if maxsize < 1:
+            raise ValueError("Размер кэша должен быть не меньше 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        # key -> (value, expires_at); порядок — от давно использованных к недавним
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._stats["misses"] += 1
+                return default
+            value, expires_at = item
+            if expires_at <= now:
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value, expires_at: float = None):
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._data[key] = (value, deadline)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def pop(self, key):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def remove_where(self, predicate) -> int:
+        """Удалить записи, для значения которых predicate(value) истинно. Возвращает их число."""
+        with self._lock:
+            keys = [key for key, (value, _) in self._data.items() if predicate(value)]
+            for key in keys:
+                del self._data[key]
+            self._stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "size":     len(self._data),
+                "maxsize":  self.maxsize,
+                "ttl":      self.ttl,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                **self._stats,
+            }
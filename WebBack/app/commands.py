@@ -0,0 +1,210 @@
+import click
+from flask import current_app
+from database.db import Storage
+from database.filestore import sweep_staging
+from .images import ImageVariantPipeline, pillow_available
+from database.migrations import LATEST_VERSION
+
+
+def register_commands(app):
+    """CLI-команды обслуживания: flask --app main <команда>."""
+
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Применить недостающие миграции схемы."""
+        db = Storage(current_app.config['DATABASE_PATH'])
+        try:
+            applied = db.migrate()
+            version = db.schema_version()
+        finally:
+            db.close_connection()
+
+        if applied:
+            click.echo(f"Применены миграции: {', '.join(map(str, applied))}")
+        else:
+            click.echo("Схема уже актуальна")
+        click.echo(f"Версия схемы: {version}")
+
+    @app.cli.command("db-version")
+    def db_version():
+        """Показать текущую и последнюю доступную версию схемы."""
+        db = Storage(current_app.config['DATABASE_PATH'])
+        try:
+            db.open_connection()
+            version = db.schema_version()
+        finally:
+            db.close_connection()
+        click.echo(f"Версия схемы: {version} (последняя: {LATEST_VERSION})")
+
+    @app.cli.command("search-rebuild")
+    def search_rebuild():
+        """Перестроить полнотекстовый индекс новостей (backfill)."""
+        db = Storage(current_app.config['DATABASE_PATH'])
+        try:
+            db.open_connection()
+            count = db.search_rebuild()
+        finally:
+            db.close_connection()
+        click.echo(f"Проиндексировано новостей: {count}")
+
+    @app.cli.command("counters-check")
+    @click.option("--rebuild", is_flag=True, help="Пересчитать счётчики при расхождении")
+    def counters_check(rebuild):
+        """Сверить счётчики админки с фактическим числом записей."""
+        db = Storage(current_app.config['DATABASE_PATH'])
+        try:
+            db.open_connection()
+            mismatches = db.counters_check(rebuild=rebuild)
+        finally:
+            db.close_connection()
+
+        if not mismatches:
+            click.echo("Счётчики согласованы")
+            return
+        for name, values in mismatches.items():
+            click.echo(f"{name}: хранится {values['stored']}, фактически {values['actual']}")
+        click.echo("Счётчики пересчитаны" if rebuild else "Для исправления запустите с --rebuild")
+
+    @app.cli.command("files-dedupe")
+    @click.option("--dry-run", is_flag=True, help="Только посчитать, ничего не меняя")
+    def files_dedupe(dry_run):
+        """Перевести загруженные файлы на хранение по SHA-256 и объединить дубликаты."""
+        db = Storage(current_app.config['DATABASE_PATH'])
+        try:
+            db.open_connection()
+            report = db.files_dedupe(current_app.config['UPLOAD_FOLDER'], dry_run=dry_run)
+        finally:
+            db.close_connection()
+
+        click.echo(f"Файлов проверено: {report['files_scanned']}, "
+                   f"не найдено на диске: {report['files_missing']}")
+        click.echo(f"Дубликатов {'найдено' if dry_run else 'объединено'}: {report['duplicates_merged']}")
+        click.echo(f"Объём: {format_bytes(report['bytes_before'])} → "
+                   f"{format_bytes(report['bytes_after'])} "
+                   f"(экономия {format_bytes(report['bytes_saved'])})")
+
+    @app.cli.command("staging-sweep")
+    @click.option("--max-age", type=int, default=None,
+                  help="Возраст staged-файла в секундах (по умолчанию UPLOAD_STAGING_MAX_AGE)")
+    def staging_sweep(max_age):
+        """Удалить брошенные незавершённые загрузки из UPLOAD_FOLDER/.staging."""
+        if max_age is None:
+            max_age = current_app.config.get('UPLOAD_STAGING_MAX_AGE', 3600)
+        report = sweep_staging(current_app.config['UPLOAD_FOLDER'], max_age)
+        click.echo(f"Удалено файлов: {report['removed']} ({format_bytes(report['bytes'])})")
+
+    @app.cli.command("files-gc")
+    @click.option("--dry-run", is_flag=True, help="Только отчёт, ничего не удалять")
+    @click.option("--prune-missing", is_flag=True,
+                  help="Удалить записи Files (и их связи), для которых нет файла на диске")
+    @click.option("--min-age", type=int, default=None,
+                  help="Не трогать файлы моложе стольких секунд (по умолчанию FILES_GC_MIN_AGE)")
+    def files_gc(dry_run, prune_missing, min_age):
+        """Сверить UPLOAD_FOLDER с таблицей Files: удалить файлы-сироты, найти пропавшие."""
+        if min_age is None:
+            min_age = current_app.config.get('FILES_GC_MIN_AGE', 3600)
+        db = Storage(current_app.config['DATABASE_PATH'])
+        try:
+            db.open_connection()
+            report = db.files_gc(
+                current_app.config['UPLOAD_FOLDER'],
+                dry_run=dry_run,
+                min_age=min_age,
+                prune_missing=prune_missing
+            )
+        finally:
+            db.close_connection()
+
+        click.echo(f"Проверено файлов: {report['blobs_scanned']} (копий: {report['variants_scanned']}) "
+                   f"за {report['elapsed_seconds']:.1f} с, {report['files_per_second']} файлов/с")
+        click.echo(f"Сирот: {report['orphans']} ({format_bytes(report['orphan_bytes'])}), "
+                   f"копий без оригинала: {report['orphan_variants']} "
+                   f"({format_bytes(report['orphan_variant_bytes'])}), "
+                   f"пропущено как новые: {report['skipped_recent']}")
+        click.echo(f"Записей без файла на диске: {report['missing']}")
+        if dry_run:
+            click.echo("Пробный запуск: ничего не удалено")
+        else:
+            click.echo(f"Удалено файлов: {report['removed']} ({format_bytes(report['removed_bytes'])}), "
+                       f"записей Files: {report['pruned']}")
+
+    @app.cli.command("images-backfill")
+    @click.option("--force", is_flag=True, help="Пересобрать копии и для уже обработанных файлов")
+    def images_backfill(force):
+        """Построить уменьшенные WebP-копии для уже загруженных изображений."""
+        if not pillow_available():
+            raise click.ClickException("Pillow не установлен")
+        if not current_app.config.get('IMAGE_VARIANT_WIDTHS'):
+            raise click.ClickException("IMAGE_VARIANT_WIDTHS не задан")
+
+        if force:
+            db = Storage(current_app.config['DATABASE_PATH'])
+            try:
+                db.open_connection()
+                db.files_reset_variants()
+            finally:
+                db.close_connection()
+
+        pipeline = ImageVariantPipeline(
+            current_app.config['DATABASE_PATH'],
+            current_app.config['UPLOAD_FOLDER'],
+            current_app.config['IMAGE_VARIANT_WIDTHS'],
+            quality=current_app.config.get('IMAGE_VARIANT_QUALITY', 80),
+            workers=current_app.config.get('IMAGE_VARIANT_WORKERS', 2)
+        )
+        try:
+            processed = pipeline.run_pending()
+        finally:
+            pipeline.shutdown()
+        stats = pipeline.stats()
+        click.echo(f"Обработано файлов: {processed} (ошибок: {stats['failed']})")
+
+
+    @app.cli.command("file-deletions-drain")
+    def file_deletions_drain():
+        """Удалить с диска все файлы из журнала File_Deletions, срок которых наступил."""
+        worker = current_app.extensions['file_deletions']
+        processed = worker.drain()
+        stats = worker.stats()
+        click.echo(f"Обработано записей журнала: {processed} "
+                   f"(удалено файлов: {stats['deleted']}, снова используются: {stats['skipped']}, "
+                   f"ошибок: {stats['failed']})")
+        if stats['pending'] or stats['exhausted']:
+            click.echo(f"В журнале осталось: {stats['pending']}, исчерпали попытки: {stats['exhausted']}")
+
+
+    @app.cli.command("jobs-run")
+    def jobs_run():
+        """Выполнить все ожидающие фоновые задания (удаление новостей, пользователей, очистка корзины)."""
+        queue = current_app.extensions['jobs']
+        processed = queue.drain()
+        stats = queue.stats()
+        click.echo(f"Выполнено заданий: {processed} "
+                   f"(успешно: {stats['done']}, с ошибкой: {stats['failed']}, строк: {stats['rows']})")
+
+
+    @app.cli.command("maintenance-run")
+    @click.argument("tasks", nargs=-1)
+    def maintenance_run(tasks):
+        """Выполнить задачи обслуживания сейчас (по умолчанию — все)."""
+        scheduler = current_app.extensions['maintenance']
+        unknown = [task for task in tasks if task not in scheduler.tasks]
+        if unknown:
+            raise click.ClickException(
+                f"Неизвестные задачи: {', '.join(unknown)} (есть: {', '.join(scheduler.tasks)})"
+            )
+        failed = False
+        for task in tasks or scheduler.tasks:
+            run = scheduler.run(task)
+            outcome = run['result'] if run['status'] == 'ok' else f"ошибка: {run['error']}"
+            click.echo(f"{task}: {run['duration_ms']} мс, {outcome}")
+            failed = failed or run['status'] != 'ok'
+        if failed:
+            raise SystemExit(1)
+
+def format_bytes(size: int) -> str:
+    """Размер в байтах → строка вида «12.3 МБ»."""
+    for unit in ("Б", "КБ", "МБ", "ГБ"):
+        if size < 1024 or unit == "ГБ":
+            return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+        size /= 1024
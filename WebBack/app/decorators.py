@@ -1,16 +1,28 @@
 from functools import wraps
-from flask import request, g, jsonify, current_app
+from flask import request, g, jsonify, current_app, make_response
+import hashlib
 import jwt
 from app.exceptions import PermissionDeniedError, AuthError
 
 def get_current_user(token):
+    """
+    Данные пользователя из JWT. Проверенные токены кэшируются
+    (app.extensions['token_cache'], см. app/cache.py) до своего exp,
+    поэтому повторные запросы с тем же токеном не проверяют подпись заново.
+    """
+    cache = current_app.extensions.get('token_cache')
+    if cache is not None:
+        claims = cache.get(token)
+        if claims is not None:
+            return dict(claims)
+
     try:
         payload = jwt.decode(
             token,
             current_app.config['JWT_SECRET_KEY'],
             algorithms=[current_app.config['JWT_ALGORITHM']]
         )
-        return {
+        claims = {
             'userID': payload['userID'],
             'login': payload['login'],
             'user_role': payload['user_role'],
@@ -23,6 +35,10 @@ def get_current_user(token):
     except Exception as e:
         raise AuthError(f"Ошибка верификации токена: {str(e)}")
 
+    if cache is not None:
+        cache.set(token, claims, expires_at=payload.get('exp'))
+    return dict(claims)
+
 def role_required(roles):
     def decorator(f):
         @wraps(f)
@@ -57,3 +73,33 @@ def role_required(roles):
 
 admin_required = role_required(['Administrator'])
 moderator_required = role_required(['Administrator', 'Moderator'])
+login_required = role_required(['Administrator', 'Moderator', 'Publisher'])
+
+
+def etag_by_data_version(f):
+    """
+    Условные GET-ответы для списков: ETag строится из версии данных БД
+    и адреса запроса. Если клиент прислал совпадающий If-None-Match,
+    отвечаем 304 до выполнения запроса к спискам.
+    Применяется после проверки прав (ниже role_required в списке декораторов).
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return f(*args, **kwargs)
+
+        version = g.db.data_version()
+        etag = hashlib.sha256(f"{version}|{request.full_path}".encode("utf-8")).hexdigest()[:32]
+
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        # Клиент может хранить ответ, но обязан перепроверять его по ETag
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
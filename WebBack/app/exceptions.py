@@ -9,7 +9,8 @@ class AppError(Exception):
         status_code: int = HTTPStatus.INTERNAL_SERVER_ERROR,
         error_type: str = "server_error",
         details: dict = None,
-        loggable: bool = True
+        loggable: bool = True,
+        headers: dict = None
     ):
         super().__init__(message)
         self.message = message
@@ -17,6 +18,8 @@ class AppError(Exception):
         self.error_type = error_type
         self.details = details or {}
         self.loggable = loggable
+        # Дополнительные заголовки ответа (например, Retry-After)
+        self.headers = headers or {}
 
     def to_dict(self):
         payload = {
@@ -88,6 +91,29 @@ class BusinessRuleError(AppError):
         super().__init__(message=message, status_code=HTTPStatus.UNPROCESSABLE_ENTITY, error_type="business_rule_violation", details={"error_code": error_code})
 
 
+# === ПЕРЕГРУЗКА ===
+class ServiceUnavailableError(AppError):
+    def __init__(self, message: str = "Сервис временно перегружен, повторите запрос позже", retry_after: int = None):
+        super().__init__(
+            message=message,
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            error_type="service_unavailable",
+            headers={"Retry-After": str(retry_after)} if retry_after else None
+        )
+
+
+class RateLimitError(AppError):
+    def __init__(self, message: str = "Слишком много запросов, повторите позже", retry_after: int = 1):
+        super().__init__(
+            message=message,
+            status_code=HTTPStatus.TOO_MANY_REQUESTS,
+            error_type="rate_limited",
+            details={"retry_after": retry_after},
+            loggable=False,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
 # === ФАЙЛОВАЯ СИСТЕМА ===
 class FileSystemError(AppError):
     def __init__(self, message: str = "Ошибка файловой системы", file_path: str = None):
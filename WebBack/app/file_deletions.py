@@ -0,0 +1,144 @@
+"""
+Фоновое удаление файлов с диска по журналу File_Deletions.
+
+Когда запись Files удаляется (снятие файла с новости, окончательное удаление
+новостей, удаление пользователей с их новостями), триггер file_deletions_enqueue
+в той же транзакции пишет её guid в журнал. Запрос не ждёт диска: обработчик
+в фоновом потоке забирает записи пачками, удаляет blob и уменьшенные копии
+(filestore.delete_blob) в пуле потоков и отмечает результат в журнале.
+Неудачные попытки повторяются с экспоненциальной задержкой до max_attempts;
+журнал переживает перезапуск процесса, так что файлы не теряются и не остаются
+на диске из-за упавшего запроса.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import os
+import threading
+
+from database.db import Storage
+from database.filestore import delete_blob
+
+logger = logging.getLogger(__name__)
+
+
+class FileDeletionWorker(object):
+    def __init__(self, db_path, upload_folder, workers=4, batch_size=100,
+                 max_attempts=8, retry_delay=30, poll_interval=60, lease=300):
+        self.db_path = db_path
+        self.upload_folder = upload_folder
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.lease = lease
+
+        # Поток создаётся при первом запросе — уже в рабочем процессе сервера
+        self._thread = None
+        self._pid = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"deleted": 0, "skipped": 0, "failed": 0, "batches": 0}
+
+    def start(self):
+        """Запустить фоновый поток, если он ещё не работает в этом процессе."""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="file-deletions", daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        """Разбудить обработчик: в журнале могли появиться записи."""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.drain()
+            except Exception:
+                logger.exception("Ошибка обработки журнала удаления файлов")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+    def process_batch(self) -> int:
+        """
+        Обработать одну пачку записей, срок которых наступил.
+        Возвращает число забранных записей (0 — журнал пуст).
+        """
+        db = Storage(self.db_path)
+        try:
+            db.open_connection()
+            entries = db.file_deletions_claim(self.batch_size, self.lease, self.max_attempts)
+            if not entries:
+                return 0
+
+            # Проверка ссылки — через это же соединение: вне транзакции оно видит
+            # зафиксированные записи Files; потоки пула обращаются к нему по очереди
+            connection_lock = threading.Lock()
+
+            def is_referenced(guid: str) -> bool:
+                with connection_lock:
+                    return db.file_is_referenced(guid)
+
+            def delete(entry: dict) -> bool:
+                return delete_blob(self.upload_folder, entry['guid'], entry['deletionID'], is_referenced)
+
+            done, failed = [], []
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(delete, entry): entry for entry in entries}
+                for future in as_completed(futures):
+                    entry = futures[future]
+                    try:
+                        deleted = future.result()
+                    except Exception as e:
+                        logger.warning(f"Не удалось удалить файл {entry['guid']}: {e}")
+                        failed.append((entry['deletionID'], str(e)))
+                        continue
+                    done.append(entry['deletionID'])
+                    with self._lock:
+                        self._stats["deleted" if deleted else "skipped"] += 1
+
+            db.file_deletions_finish(done, failed, self.retry_delay)
+            with self._lock:
+                self._stats["failed"] += len(failed)
+                self._stats["batches"] += 1
+            return len(entries)
+        finally:
+            db.close_connection()
+
+    def drain(self) -> int:
+        """Обрабатывать пачки, пока в журнале есть записи со сроком. Возвращает их число."""
+        processed = 0
+        while True:
+            count = self.process_batch()
+            if not count:
+                return processed
+            processed += count
+
+    def stats(self) -> dict:
+        db = Storage(self.db_path)
+        try:
+            db.open_connection()
+            queue = db.file_deletions_stats(self.max_attempts)
+        finally:
+            db.close_connection()
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._thread is not None and self._thread.is_alive(),
+                **queue,
+                **self._stats,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._stop.set()
+        self._wakeup.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if wait and thread is not None and thread.is_alive():
+            thread.join()
@@ -0,0 +1,178 @@
+"""
+Фоновый конвейер уменьшенных копий изображений.
+
+После загрузки новые файлы ставятся в очередь пула процессов; дочерний процесс
+строит WebP-копии ширин IMAGE_VARIANT_WIDTHS (только меньше оригинала) в
+UPLOAD_FOLDER/.variants, а родительский записывает их в File_Variants.
+Запрос загрузки ответ не ждёт. Копии отдаются по /uploads/<guid>?w=<ширина>.
+
+Pillow — необязательная зависимость: без него конвейер не включается,
+и везде отдаются оригиналы.
+"""
+import concurrent.futures
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+from database.db import Storage
+from database.filestore import TEMP_PREFIX, remove_quietly, remove_variants, variant_path
+from .process_pool import ProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+def pillow_available() -> bool:
+    return Image is not None
+
+
+def render_variants(upload_folder: str, guid: str, widths: tuple, quality: int) -> list:
+    """
+    Построить WebP-копии файла guid (выполняется в дочернем процессе).
+    Ширины не больше исходной пропускаются. Анимированные GIF/WebP не уменьшаются
+    (копия сохранила бы только первый кадр) — для них отдаётся оригинал.
+    Возвращает [(width, size), ...].
+    """
+    result = []
+    with Image.open(os.path.join(upload_folder, guid)) as source:
+        if getattr(source, 'is_animated', False):
+            return result
+        image = ImageOps.exif_transpose(source)
+        image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+
+        for width in sorted(widths):
+            if width >= image.width:
+                break
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+
+            target = variant_path(upload_folder, guid, width)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=os.path.dirname(target))
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    resized.save(out, 'WEBP', quality=quality)
+                os.replace(temp_path, target)
+            except Exception:
+                remove_quietly(temp_path)
+                raise
+            result.append((width, os.path.getsize(target)))
+    return result
+
+
+class ImageVariantPipeline(object):
+    def __init__(self, db_path, upload_folder, widths, quality=80, workers=2):
+        self.db_path = db_path
+        self.upload_folder = upload_folder
+        self.widths = tuple(sorted(widths))
+        self.quality = quality
+        self.workers = workers
+
+        # Пул процессов создаётся при первой задаче (см. app/process_pool.py)
+        self._pool = ProcessPool(workers)
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._stats = {"submitted": 0, "done": 0, "failed": 0}
+
+    def _render(self, file_id: int, guid: str):
+        """Отправить файл в пул; None, если он уже обрабатывается."""
+        with self._lock:
+            if file_id in self._in_flight:
+                return None
+            self._in_flight.add(file_id)
+            self._stats["submitted"] += 1
+        return self._submit(guid)
+
+    def _submit(self, guid: str):
+        return self._pool.submit(render_variants, self.upload_folder, guid, self.widths, self.quality)
+
+    def _save_result(self, file_id: int, guid: str, future, retried: bool = False):
+        """
+        Записать результат в БД. Файл, который не удалось обработать,
+        тоже помечается обработанным (без копий) — для него отдаётся оригинал.
+        Если погиб процесс пула (OOM, сигнал), файл один раз отправляется в новый пул.
+        """
+        try:
+            variants = future.result()
+            ok = True
+        except BrokenProcessPool as e:
+            if not retried:
+                retry = self._submit(guid)
+                retry.add_done_callback(lambda f: self._save_result(file_id, guid, f, retried=True))
+                return
+            logger.warning(f"Не удалось построить копии файла {guid}: {e}")
+            variants, ok = [], False
+        except Exception as e:
+            logger.warning(f"Не удалось построить копии файла {guid}: {e}")
+            variants, ok = [], False
+
+        db = Storage(self.db_path)
+        try:
+            db.open_connection()
+            if not db.file_variants_save(file_id, variants):
+                # Файл удалили, пока строились копии
+                remove_variants(self.upload_folder, guid)
+        except Exception:
+            logger.exception(f"Ошибка записи копий файла {guid}")
+            ok = False
+        finally:
+            db.close_connection()
+            with self._lock:
+                self._in_flight.discard(file_id)
+                self._stats["done" if ok else "failed"] += 1
+
+    def submit(self, files: list):
+        """Поставить файлы [{fileID, guid}, ...] в очередь, не дожидаясь результата."""
+        for row in files:
+            future = self._render(row['fileID'], row['guid'])
+            if future is not None:
+                future.add_done_callback(
+                    lambda f, file_id=row['fileID'], guid=row['guid']: self._save_result(file_id, guid, f)
+                )
+
+    def run_pending(self, batch_size: int = 100) -> int:
+        """
+        Синхронно обработать все файлы без копий (для backfill).
+        Возвращает число обработанных файлов.
+        """
+        processed = 0
+        seen = set()
+        while True:
+            db = Storage(self.db_path)
+            try:
+                db.open_connection()
+                rows = [r for r in db.files_pending_variants(batch_size) if r['fileID'] not in seen]
+            finally:
+                db.close_connection()
+            if not rows:
+                return processed
+
+            futures = {}
+            for row in rows:
+                seen.add(row['fileID'])
+                future = self._render(row['fileID'], row['guid'])
+                if future is not None:
+                    futures[future] = row
+            for future in concurrent.futures.as_completed(futures):
+                row = futures[future]
+                self._save_result(row['fileID'], row['guid'], future)
+                processed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "widths":    list(self.widths),
+                "workers":   self.workers,
+                "in_flight": len(self._in_flight),
+                **self._stats,
+                **self._pool.stats(),
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,209 @@
+"""
+Фоновые задания для долгих операций админки (удалить все новости, очистить
+корзину, удалить всех пользователей).
+
+Маршрут только ставит задание в таблицу Jobs и отвечает 202 с jobID; ход
+выполнения — GET /api/admin/jobs/<id>. Обработчики (JOBS_WORKERS потоков в
+каждом процессе) забирают задания одним UPDATE ... RETURNING и выполняют шаги
+вида (JOB_KINDS) пачками по JOBS_BATCH_SIZE строк. Каждая пачка — своя короткая
+транзакция, в которой же отмечается прогресс и продлевается аренда, а между
+пачками обработчик уступает блокировку записи на JOBS_BATCH_PAUSE секунд.
+Если процесс упал, аренда истекает и задание продолжает другой обработчик
+с сохранённой позиции (операции по условию повторять безопасно).
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from database.db import Storage
+
+logger = logging.getLogger(__name__)
+
+# Виды заданий: имя → шаги по порядку (операции Storage, см. BULK_OPERATIONS)
+JOB_KINDS = {
+    "delete_news_all":  ["news_soft_delete_all"],
+    "purge_trash":      ["purge_trash"],
+    "delete_all_users": ["users_news_delete", "users_delete"],
+}
+
+
+def job_report(job: dict) -> dict:
+    """Задание для API: прогресс в процентах, скорость (строк/с) и оценка оставшегося времени."""
+    report = dict(job)
+    total, processed = job['total'], job['processed']
+    elapsed = job.get('elapsed_seconds') or 0.0
+    rate = processed / elapsed if elapsed > 0 else None
+    remaining = max(total - processed, 0) if total is not None else None
+
+    report['elapsed_seconds'] = round(elapsed, 3)
+    report['progress'] = round(min(processed / total, 1.0) * 100, 1) if total else (
+        100.0 if job['status'] == 'done' else 0.0
+    )
+    report['rows_per_second'] = round(rate, 1) if rate else None
+    report['eta_seconds'] = (
+        round(remaining / rate, 1) if job['status'] == 'running' and rate and remaining is not None else None
+    )
+    report.pop('owner', None)
+    return report
+
+
+class JobQueue(object):
+    def __init__(self, db_path, workers=1, batch_size=2000, poll_interval=5,
+                 lease=120, batch_pause=0.05, on_finish=None):
+        self.db_path = db_path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.batch_pause = batch_pause
+        # Вызывается после успешного задания (в потоке обработчика) — сбросить кэши и т. п.
+        self.on_finish = on_finish
+
+        # Потоки создаются при первом запросе — уже в рабочем процессе сервера
+        self._threads = []
+        self._pid = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {"done": 0, "failed": 0, "lost": 0, "batches": 0, "rows": 0}
+
+    @staticmethod
+    def _new_owner() -> str:
+        """Имя владельца задания: хост, процесс и случайный суффикс."""
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def start(self):
+        """Запустить потоки обработчиков, если они ещё не работают в этом процессе."""
+        with self._lock:
+            if self._pid == os.getpid() and any(t.is_alive() for t in self._threads):
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"jobs-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def notify(self):
+        """Разбудить обработчики: появилось новое задание."""
+        self._wakeup.set()
+
+    def _run(self):
+        owner = self._new_owner()
+        while not self._stop.is_set():
+            try:
+                if self.run_next(owner):
+                    continue
+            except Exception:
+                logger.exception("Ошибка обработчика фоновых заданий")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def run_next(self, owner: str = None) -> bool:
+        """Взять и выполнить одно задание. False — очередь пуста."""
+        owner = owner or self._new_owner()
+        db = Storage(self.db_path)
+        try:
+            db.open_connection()
+            job = db.job_claim(owner, self.lease)
+            if job is None:
+                return False
+            self._execute(db, job, owner)
+            return True
+        finally:
+            db.close_connection()
+
+    def _execute(self, db: Storage, job: dict, owner: str):
+        steps = JOB_KINDS.get(job['kind'])
+        if steps is None:
+            db.job_finish(job['jobID'], owner, error=f"Неизвестный вид задания: {job['kind']}")
+            self._count("failed")
+            return
+        params = job['params'] or {}
+        state = job['state'] or {}
+        try:
+            if job['total'] is None:
+                total = sum(db.bulk_count(step, params) for step in steps[state.get('step', 0):])
+                db.job_update(job['jobID'], owner, total=total)
+
+            for index in range(state.get('step', 0), len(steps)):
+                step = steps[index]
+                if state.get('step') != index:
+                    state = {"step": index, "after_id": 0, "counts": state.get('counts', {})}
+                    if not db.job_update(job['jobID'], owner, state=state):
+                        self._count("lost")
+                        return
+                while not self._stop.is_set():
+                    ids = db.job_step(job['jobID'], owner, step, params, state, self.batch_size, self.lease)
+                    if ids is None:
+                        # Аренду забрал другой обработчик (этот слишком долго молчал)
+                        self._count("lost")
+                        return
+                    state = Storage.job_state_after(state, step, ids)
+                    with self._lock:
+                        self._stats["batches"] += 1
+                        self._stats["rows"] += len(ids)
+                    if len(ids) < self.batch_size:
+                        break
+                    # Уступить блокировку записи запросам, ждущим её между пачками
+                    time.sleep(self.batch_pause)
+                if self._stop.is_set():
+                    # Остановка процесса: задание доделает другой обработчик после аренды
+                    return
+        except Exception as e:
+            logger.exception(f"Ошибка фонового задания {job['jobID']} ({job['kind']})")
+            db.connection.rollback()
+            db.job_finish(job['jobID'], owner, error=str(e))
+            self._count("failed")
+            return
+
+        counts = state.get('counts', {})
+        db.job_finish(job['jobID'], owner, result=counts)
+        self._count("done")
+        if self.on_finish is not None:
+            try:
+                self.on_finish(dict(job, result=counts))
+            except Exception:
+                logger.exception(f"Ошибка обработчика завершения задания {job['jobID']}")
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def drain(self) -> int:
+        """Выполнить все ожидающие задания в текущем потоке. Возвращает их число."""
+        owner = self._new_owner()
+        count = 0
+        while self.run_next(owner):
+            count += 1
+        return count
+
+    def stats(self) -> dict:
+        db = Storage(self.db_path)
+        try:
+            db.open_connection()
+            queue = db.jobs_stats()
+        finally:
+            db.close_connection()
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": any(t.is_alive() for t in self._threads),
+                "jobs":    queue,
+                **self._stats,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._stop.set()
+        self._wakeup.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if wait:
+            for thread in threads:
+                if thread.is_alive():
+                    thread.join()
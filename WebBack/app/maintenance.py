@@ -0,0 +1,215 @@
+"""
+Фоновое обслуживание БД и хранилища по расписанию.
+
+Задачи (интервалы — MAINTENANCE_INTERVALS, 0 отключает задачу):
+● purge_expired  — окончательное удаление новостей, пролежавших в корзине
+  дольше TRASH_RETENTION_DAYS, ограниченными пачками;
+● wal_checkpoint — PRAGMA wal_checkpoint(TRUNCATE), чтобы -wal не разрастался;
+● optimize       — обновление статистики планировщика запросов;
+● staging_sweep  — удаление брошенных staged-загрузок.
+
+В каждом рабочем процессе работает свой поток, но задачи выполняет только
+ведущий — процесс, который держит строку-аренду в Maintenance_Lease и продлевает
+её каждый такт. Если ведущий пропал, аренда истекает и её забирает другой процесс.
+Время и итог последнего запуска каждой задачи пишутся в Maintenance_Runs —
+оттуда же берётся срок следующего запуска, так что смена ведущего не
+перезапускает задачи раньше времени.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from database.db import Storage
+from database.filestore import sweep_staging
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = 'maintenance'
+
+# Формат дат SQLite datetime('now') (UTC)
+SQLITE_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class MaintenanceScheduler(object):
+    def __init__(self, db_path, upload_folder, intervals, tick=60, lease_ttl=180,
+                 trash_days=30, purge_batch_size=500, purge_max_batches=20,
+                 staging_max_age=3600, analysis_limit=1000):
+        self.db_path = db_path
+        self.upload_folder = upload_folder
+        self.intervals = {name: seconds for name, seconds in intervals.items() if seconds}
+        self.tick = tick
+        self.lease_ttl = lease_ttl
+        self.trash_days = trash_days
+        self.purge_batch_size = purge_batch_size
+        self.purge_max_batches = purge_max_batches
+        self.staging_max_age = staging_max_age
+        self.analysis_limit = analysis_limit
+
+        self.tasks = {
+            "purge_expired":  self._purge_expired,
+            "wal_checkpoint": self._wal_checkpoint,
+            "optimize":       self._optimize,
+            "staging_sweep":  self._staging_sweep,
+        }
+        unknown = set(self.intervals) - set(self.tasks)
+        if unknown:
+            raise ValueError(f"Неизвестные задачи обслуживания: {', '.join(sorted(unknown))}")
+
+        # Поток создаётся при первом запросе — уже в рабочем процессе сервера
+        self.owner = self._new_owner()
+        self.is_leader = False
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _new_owner() -> str:
+        """Имя владельца аренды: хост, процесс и случайный суффикс."""
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    # -------------------------------
+    # Задачи: каждая получает открытое соединение и возвращает итог для журнала
+
+    def _purge_expired(self, db: Storage) -> dict:
+        purged = db.purge_expired_news(
+            self.trash_days,
+            batch_size=self.purge_batch_size,
+            max_batches=self.purge_max_batches
+        )
+        return {"purged": purged}
+
+    def _wal_checkpoint(self, db: Storage) -> dict:
+        return db.wal_checkpoint('TRUNCATE')
+
+    def _optimize(self, db: Storage) -> dict:
+        return db.optimize(self.analysis_limit)
+
+    def _staging_sweep(self, db: Storage) -> dict:
+        return sweep_staging(self.upload_folder, self.staging_max_age)
+
+    # -------------------------------
+    # Запуск
+
+    def run(self, task: str, db: Storage = None) -> dict:
+        """
+        Выполнить задачу сейчас (без проверки аренды) и записать итог в Maintenance_Runs.
+        Возвращает запись о запуске: {task, status, duration_ms, result, error}.
+        """
+        if task not in self.tasks:
+            raise KeyError(task)
+        own_db = db is None
+        if own_db:
+            db = Storage(self.db_path)
+            db.open_connection()
+        try:
+            started_at = datetime.utcnow().strftime(SQLITE_DATETIME_FORMAT)
+            start = time.perf_counter()
+            result, error = None, None
+            try:
+                result = self.tasks[task](db)
+            except Exception as e:
+                db.connection.rollback()
+                logger.exception(f"Ошибка задачи обслуживания {task}")
+                error = str(e)
+            duration_ms = round((time.perf_counter() - start) * 1000)
+            db.maintenance_record_run(task, started_at, duration_ms, result, error, self.owner)
+            return {
+                "task":        task,
+                "status":      'error' if error is not None else 'ok',
+                "duration_ms": duration_ms,
+                "result":      result,
+                "error":       error,
+            }
+        finally:
+            if own_db:
+                db.close_connection()
+
+    def run_due(self) -> list:
+        """
+        Один такт: взять/продлить аренду и, если этот процесс ведущий,
+        выполнить задачи, срок которых наступил. Возвращает выполненные запуски.
+        """
+        db = Storage(self.db_path)
+        try:
+            db.open_connection()
+            self.is_leader = db.maintenance_acquire_lease(LEASE_NAME, self.owner, self.lease_ttl)
+            if not self.is_leader:
+                return []
+
+            now = datetime.utcnow()
+            last_finished = {run['task']: run['finished_at'] for run in db.maintenance_runs()}
+            done = []
+            for task, interval in self.intervals.items():
+                if self._stop.is_set():
+                    break
+                finished_at = last_finished.get(task)
+                if finished_at is not None:
+                    due = datetime.strptime(finished_at, SQLITE_DATETIME_FORMAT) + timedelta(seconds=interval)
+                    if due > now:
+                        continue
+                done.append(self.run(task, db))
+                # Длинная задача не должна дать аренде истечь
+                db.maintenance_acquire_lease(LEASE_NAME, self.owner, self.lease_ttl)
+            return done
+        finally:
+            db.close_connection()
+
+    # -------------------------------
+    # Фоновый поток
+
+    def start(self):
+        """Запустить фоновый поток, если он ещё не работает в этом процессе."""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self.owner = self._new_owner()
+            self.is_leader = False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_due()
+            except Exception:
+                logger.exception("Ошибка планировщика обслуживания")
+            self._stop.wait(self.tick)
+
+    def stats(self) -> dict:
+        db = Storage(self.db_path)
+        try:
+            db.open_connection()
+            lease = db.maintenance_lease(LEASE_NAME)
+            runs = db.maintenance_runs()
+        finally:
+            db.close_connection()
+        return {
+            "running":   self._thread is not None and self._thread.is_alive(),
+            "owner":     self.owner,
+            "is_leader": self.is_leader,
+            "lease":     lease,
+            "intervals": self.intervals,
+            "runs":      runs,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._stop.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if wait and thread is not None and thread.is_alive():
+            thread.join()
+        if self.is_leader:
+            db = Storage(self.db_path)
+            try:
+                db.open_connection()
+                db.maintenance_release_lease(LEASE_NAME, self.owner)
+            finally:
+                db.close_connection()
+            self.is_leader = False
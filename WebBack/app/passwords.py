@@ -0,0 +1,111 @@
+"""
+Хэширование и проверка паролей в пуле процессов.
+
+generate_password_hash / check_password_hash (werkzeug, scrypt или pbkdf2)
+намеренно медленные. Они выполняются в пуле из PASSWORD_HASH_WORKERS процессов,
+а одновременно принятых задач не больше PASSWORD_HASH_MAX_PENDING: запрос,
+не дождавшийся места за PASSWORD_HASH_QUEUE_TIMEOUT секунд, получает 503
+с Retry-After. Так всплеск входов не занимает все рабочие потоки сервера.
+На время ожидания маршруты возвращают соединение с БД в пул (Storage.released).
+Если процесс пула погиб, пул пересоздаётся, а задача повторяется (app/process_pool.py).
+
+Если PASSWORD_HASH_METHOD поменялся, при успешном входе пароль
+перехэшируется новыми параметрами (needs_rehash).
+"""
+import threading
+import time
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .exceptions import ServiceUnavailableError
+from .process_pool import ProcessPool
+
+
+def _method_of(pwhash: str) -> str:
+    """Метод с параметрами из хэша werkzeug: 'scrypt:32768:8:1$соль$хэш' → 'scrypt:32768:8:1'."""
+    return pwhash.split('$', 1)[0]
+
+
+class PasswordHasher(object):
+    def __init__(self, method='scrypt', workers=2, max_pending=32, queue_timeout=5):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+
+        self._pool = ProcessPool(workers)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._method_params = None
+        self._stats = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0,
+                       "in_flight": 0, "busy_seconds": 0.0}
+
+    def _call(self, func, *args):
+        """Выполнить func в пуле (workers = 0 — в текущем потоке), не больше max_pending одновременно."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise ServiceUnavailableError(
+                "Слишком много одновременных входов, повторите запрос позже",
+                retry_after=max(1, round(self.queue_timeout))
+            )
+        with self._lock:
+            self._stats["in_flight"] += 1
+        start = time.perf_counter()
+        try:
+            if not self.workers:
+                return func(*args)
+            return self._pool.run(func, *args)
+        finally:
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._stats["busy_seconds"] += time.perf_counter() - start
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        pwhash = self._call(generate_password_hash, password, self.method)
+        with self._lock:
+            self._stats["hashed"] += 1
+            self._method_params = _method_of(pwhash)
+        return pwhash
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        valid = self._call(check_password_hash, pwhash, password)
+        with self._lock:
+            self._stats["verified"] += 1
+        return valid
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Хэш сделан другим методом или с другими параметрами, чем текущий PASSWORD_HASH_METHOD."""
+        if self._method_params is None:
+            # Параметры по умолчанию известны werkzeug: узнаём их один раз по хэшу пустой строки
+            self._method_params = _method_of(self._call(generate_password_hash, '', self.method))
+        return _method_of(pwhash) != self._method_params
+
+    def verify_and_update(self, pwhash: str, password: str):
+        """
+        Проверить пароль и, если он верен, но хэш устарел, посчитать новый.
+        Возвращает (верен ли пароль, новый хэш или None).
+        """
+        if not self.verify(pwhash, password):
+            return False, None
+        if not self.needs_rehash(pwhash):
+            return True, None
+        new_hash = self.hash(password)
+        with self._lock:
+            self._stats["rehashed"] += 1
+        return True, new_hash
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "method":      self.method,
+                "workers":     self.workers,
+                "max_pending": self.max_pending,
+                **self._stats,
+                "busy_seconds": round(self._stats["busy_seconds"], 3),
+                **self._pool.stats(),
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
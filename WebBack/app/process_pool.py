@@ -0,0 +1,77 @@
+"""
+Пул процессов для тяжёлых задач (уменьшенные копии изображений, хэши паролей).
+
+● Создаётся при первой задаче — уже в рабочем процессе сервера, после fork
+  (другой pid) создаётся заново;
+● процессы пула запускаются через forkserver (где его нет — spawn), а не fork:
+  к первой задаче в процессе уже работают фоновые потоки (обслуживание,
+  задания, журнал удаления файлов), и fork многопоточного процесса может
+  унести в дочерний захваченные ими блокировки;
+● если процесс пула погиб (OOM, сигнал), ProcessPoolExecutor становится
+  непригодным (BrokenProcessPool) — такой пул заменяется новым при следующей
+  постановке задачи, а не ломает все последующие.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def start_context():
+    """Контекст запуска процессов пула: forkserver, а где его нет — spawn."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class ProcessPool(object):
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {"rebuilt": 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=start_context())
+                self._pid = os.getpid()
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        """Убрать сломанный пул, если его ещё не заменил другой поток."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self._stats["rebuilt"] += 1
+        executor.shutdown(wait=False)
+
+    def submit(self, func, *args):
+        """Поставить задачу в пул; сломанный пул пересоздаётся, и постановка повторяется."""
+        executor = self._get_executor()
+        try:
+            return executor.submit(func, *args)
+        except BrokenProcessPool:
+            self._discard(executor)
+            return self._get_executor().submit(func, *args)
+
+    def run(self, func, *args):
+        """
+        Выполнить задачу и дождаться результата. Если процесс пула погиб во время
+        задачи, она один раз повторяется в новом пуле.
+        """
+        try:
+            return self.submit(func, *args).result()
+        except BrokenProcessPool:
+            return self.submit(func, *args).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,230 @@
+"""
+Ограничение частоты запросов (token bucket) для дорогих маршрутов.
+
+Правила задаются в RATE_LIMITS по имени эндпоинта:
+    "main.login": [{"per": "ip", "rate": "10/minute", "burst": 10, "methods": ["POST"]}]
+● per    — чей бакет: "ip" (request.remote_addr) или "user" (userID из JWT;
+           без действительного токена — по IP);
+● rate   — пополнение бакета: "<N>/second|minute|hour";
+● burst  — ёмкость бакета (сколько запросов подряд допустимо), по умолчанию N;
+● methods — к каким методам применяется правило (по умолчанию ко всем, кроме OPTIONS).
+
+Проверка выполняется в before_request до взятия соединения с основной БД;
+отказ — 429 с Retry-After. Хранилища бакетов:
+● MemoryBackend — в памяти процесса (у каждого рабочего процесса свои бакеты);
+● SQLiteBackend — общий для всех процессов отдельный файл SQLite
+  (RATE_LIMIT_DB_PATH), бакет меняется одним UPSERT ... RETURNING.
+За прокси remote_addr — адрес прокси: приложение нужно обернуть в werkzeug ProxyFix.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, request
+
+from .decorators import get_current_user
+from .exceptions import AuthError, RateLimitError
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> float:
+    """'10/minute' → токенов в секунду."""
+    count, _, period = rate.partition('/')
+    if period not in PERIODS:
+        raise ValueError(f"Неверный формат лимита: {rate}")
+    return float(count) / PERIODS[period]
+
+
+class Rule(object):
+    def __init__(self, endpoint, per='ip', rate='60/minute', burst=None, methods=None):
+        if per not in ('ip', 'user'):
+            raise ValueError(f"Неизвестный тип лимита: {per}")
+        self.endpoint = endpoint
+        self.per = per
+        self.rate = parse_rate(rate)
+        self.burst = float(burst if burst is not None else rate.partition('/')[0])
+        self.methods = {m.upper() for m in methods} if methods else None
+        self.name = f"{endpoint}:{per}:{rate}"
+
+    def applies(self, method: str) -> bool:
+        if method == 'OPTIONS':
+            return False
+        return self.methods is None or method in self.methods
+
+
+# -------------------------------
+# Хранилища бакетов: take(key, rate, burst) → (разрешено, секунд до следующего токена)
+
+class MemoryBackend(object):
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        # key -> (tokens, updated_at); порядок — от давно использованных к недавним
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Вытесненный бакет просто начнётся заново полным
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class SQLiteBackend(object):
+    # Раз в столько проверок удаляются бакеты, которые давно полны
+    PRUNE_EVERY = 10000
+
+    def __init__(self, db_path, busy_timeout=5):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._calls = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.db_path, timeout=self.busy_timeout,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL').fetchall()
+            # Состояние лимитов не критично: потеря последних изменений при сбое питания допустима
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS Rate_Buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    full_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0):
+        # Время — по часам системы: бакеты общие для процессов, monotonic у каждого свой
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute('''
+            INSERT INTO Rate_Buckets (key, tokens, updated_at, full_at)
+            VALUES (:key, :burst - :cost, :now, :now + :cost / :rate)
+            ON CONFLICT(key) DO UPDATE SET
+                tokens = min(:burst, tokens + (:now - updated_at) * :rate) - :cost,
+                updated_at = :now,
+                full_at = :now + (:burst - min(:burst, tokens + (:now - updated_at) * :rate) + :cost) / :rate
+            WHERE min(:burst, tokens + (:now - updated_at) * :rate) >= :cost
+            RETURNING tokens
+        ''', {"key": key, "burst": burst, "cost": cost, "now": now, "rate": rate}).fetchone()
+
+        self._calls += 1
+        if self._calls % self.PRUNE_EVERY == 0:
+            self.prune()
+
+        if row is not None:
+            return True, 0.0
+        current = connection.execute(
+            'SELECT tokens, updated_at FROM Rate_Buckets WHERE key = ?', (key,)
+        ).fetchone()
+        if current is None:
+            # Бакет только что удалён prune() другого процесса — он был полон
+            return True, 0.0
+        tokens, updated_at = current
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        return False, max(0.0, (cost - tokens) / rate)
+
+    def prune(self) -> int:
+        """Удалить бакеты, которые уже полны: они не отличаются от отсутствующих."""
+        cursor = self._connection().execute('DELETE FROM Rate_Buckets WHERE full_at <= ?', (time.time(),))
+        return cursor.rowcount
+
+    def size(self) -> int:
+        return self._connection().execute('SELECT count(*) FROM Rate_Buckets').fetchone()[0]
+
+
+# -------------------------------
+# Ограничитель
+
+class RateLimiter(object):
+    def __init__(self, rules: dict, backend):
+        self.backend = backend
+        self.rules = {
+            endpoint: [Rule(endpoint, **spec) for spec in specs]
+            for endpoint, specs in rules.items()
+        }
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _client_key(self, rule: Rule) -> str:
+        if rule.per == 'user':
+            user_id = self._user_id()
+            if user_id is not None:
+                return f"{rule.name}:u{user_id}"
+        return f"{rule.name}:ip{request.remote_addr}"
+
+    @staticmethod
+    def _user_id():
+        """userID из токена запроса (через кэш проверенных токенов); None — нет токена или он неверен."""
+        if 'current_user' in g:
+            return g.current_user['userID']
+        auth_header = request.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return None
+        try:
+            return get_current_user(auth_header[len('Bearer '):])['userID']
+        except AuthError:
+            return None
+
+    def _count(self, rule: Rule, allowed: bool):
+        with self._lock:
+            stats = self._stats.setdefault(rule.name, {"allowed": 0, "rejected": 0})
+            stats["allowed" if allowed else "rejected"] += 1
+
+    def check(self):
+        """Проверить текущий запрос по правилам его эндпоинта; при превышении — RateLimitError (429)."""
+        rules = self.rules.get(request.endpoint)
+        if not rules:
+            return
+        for rule in rules:
+            if not rule.applies(request.method):
+                continue
+            allowed, retry_after = self.backend.take(self._client_key(rule), rule.rate, rule.burst)
+            self._count(rule, allowed)
+            if not allowed:
+                raise RateLimitError(retry_after=max(1, math.ceil(retry_after)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            rules = {name: dict(counts) for name, counts in self._stats.items()}
+        return {
+            "backend": type(self.backend).__name__,
+            "buckets": self.backend.size(),
+            "rules":   rules,
+        }
+
+
+def create_backend(config):
+    """Хранилище бакетов по RATE_LIMIT_BACKEND: 'memory' или 'sqlite'."""
+    kind = config.get('RATE_LIMIT_BACKEND', 'memory')
+    if kind == 'memory':
+        return MemoryBackend(config.get('RATE_LIMIT_MEMORY_MAXSIZE', 100000))
+    if kind == 'sqlite':
+        path = config.get('RATE_LIMIT_DB_PATH') or os.path.join(
+            os.path.dirname(os.path.abspath(config['DATABASE_PATH'])), 'ratelimit.db'
+        )
+        return SQLiteBackend(path)
+    raise ValueError(f"Неизвестное хранилище лимитов: {kind}")
@@ -1,15 +1,24 @@
 from http import HTTPStatus
+import base64
+import binascii
 import json
 import os
-from flask import Blueprint, jsonify, request, make_response, g, send_from_directory, current_app
-from .decorators import admin_required, moderator_required
+from urllib.parse import quote
+from flask import (
+    Blueprint, jsonify, request, g, send_from_directory,
+    current_app, stream_with_context, url_for
+)
+from .decorators import admin_required, moderator_required, login_required, etag_by_data_version
 import jwt
 import sqlite3
 import logging
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.exceptions import BadRequest
 
+from database.db import Storage
+from database.pool import PoolTimeoutError
+from database.filestore import VARIANT_FORMAT, sniff_mimetype, variant_path
+from .jobs import job_report
 from .exceptions import (
     AppError, BusinessRuleError, ConstraintError,
     DatabaseError, FileValidationError, NotFoundError,
@@ -29,7 +38,16 @@ def handle_app_error(error: AppError):
     """Глобальный обработчик наших исключений AppError."""
     if error.loggable:
         current_app.logger.error(f"{error.error_type}: {error.message}")
-    return jsonify(error.to_dict()), error.status_code
+    return jsonify(error.to_dict()), error.status_code, error.headers
+
+
+@bp.errorhandler(PoolTimeoutError)
+def handle_pool_timeout(error):
+    """Соединение с БД не выдано за DB_*_POOL_TIMEOUT (соединения берутся лениво — прямо в обработчике)."""
+    return handle_app_error(DatabaseError(
+        "База данных перегружена, повторите запрос позже",
+        status_code=HTTPStatus.SERVICE_UNAVAILABLE
+    ))
 
 
 @bp.errorhandler(Exception)
@@ -49,6 +67,40 @@ def handle_bad_request(error):
     }), HTTPStatus.BAD_REQUEST
 
 
+# ===========================
+#   Потоковая отдача списков
+# ===========================
+
+def json_list_response(items):
+    """
+    JSON-массив из итерируемого источника (обычно Storage.iter_*).
+    Для эндпоинтов из STREAM_JSON_ENDPOINTS массив отдаётся потоком по элементу,
+    не собирая ни список, ни итоговую строку в памяти; для остальных — обычный jsonify.
+    Первый элемент читается сразу, чтобы ошибки БД произошли до отправки заголовков
+    и обработались как обычно.
+    """
+    if request.endpoint not in current_app.config.get("STREAM_JSON_ENDPOINTS", ()):
+        return jsonify(list(items))
+
+    items = iter(items)
+    first = next(items, None)
+    dumps = current_app.json.dumps
+
+    def generate():
+        if first is None:
+            yield "[]\n"
+            return
+        yield "[" + dumps(first, separators=(",", ":"))
+        for item in items:
+            yield "," + dumps(item, separators=(",", ":"))
+        yield "]\n"
+
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype=current_app.json.mimetype
+    )
+
+
 # ===========================
 #   Простейший health check
 # ===========================
@@ -64,33 +116,114 @@ def ping():
 
 @bp.route('/uploads/<filename>')
 def upload_file(filename):
-    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-    if not os.path.exists(file_path) or 'placeholder' in filename:
+    """
+    Загруженный файл (или его WebP-копия по ?w=<ширина>).
+    Имена файлов не меняются при жизни файла (guid = SHA-256 содержимого или
+    уникальный uuid), поэтому ответ кэшируется бессрочно (immutable) с сильным
+    ETag из имени; If-None-Match/If-Modified-Since → 304, Range → 206.
+    При UPLOADS_ACCEL_REDIRECT_PREFIX байты отдаёт фронтовой nginx (X-Accel-Redirect),
+    при USE_X_SENDFILE — сервер, понимающий X-Sendfile; рабочий процесс Python
+    только проверяет права на кэш и формирует заголовки.
+    Оригинал отдаётся без обращения к БД: имя неизменяемо, наличие проверяет
+    os.stat, MIME-тип — сигнатура файла (sniff_mimetype); Files читается только для ?w=.
+    """
+    # Скрытые имена — служебные каталоги и временные файлы хранилища, не blob
+    if 'placeholder' in filename or filename.startswith('.'):
+        raise NotFoundError(resource_type="Файл", resource_id=filename)
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    path = os.path.join(upload_folder, filename)
+    etag = filename
+    mimetype = None
+    max_age = current_app.config.get('UPLOADS_CACHE_MAX_AGE', 31536000)
+    immutable = True
+
+    # ?w=<ширина> — наименьшая готовая WebP-копия не уже запрошенной, иначе оригинал
+    if request.args.get('w'):
+        try:
+            width = int(request.args['w'])
+        except ValueError:
+            raise ValidationError("Неверный формат w")
+        file = g.db.file_get_by_guid(filename)
+        if file is None:
+            raise NotFoundError(resource_type="Файл", resource_id=filename)
+        suitable = [w for w in file['variants'] if w >= width]
+        if suitable:
+            path = variant_path(upload_folder, filename, suitable[0])
+            etag = f"{filename}_{suitable[0]}"
+            mimetype = f"image/{VARIANT_FORMAT}"
+        elif not file['variants_ready']:
+            # Копии ещё строятся: оригинал отдаём, но ненадолго кэшируем
+            max_age, immutable = 60, False
+
+    if not os.path.isfile(path):
         raise NotFoundError(resource_type="Файл", resource_id=filename)
 
     try:
-        response = make_response(send_from_directory(current_app.config['UPLOAD_FOLDER'], filename))
-        response.headers['Cache-Control'] = 'public, max-age=604800'
-        return response
+        if mimetype is None:
+            mimetype = sniff_mimetype(path)
+        accel_prefix = current_app.config.get('UPLOADS_ACCEL_REDIRECT_PREFIX')
+        if accel_prefix:
+            response = current_app.response_class(mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = (
+                accel_prefix.rstrip('/') + '/' + quote(os.path.relpath(path, upload_folder))
+            )
+            response.set_etag(etag)
+            response.last_modified = os.stat(path).st_mtime
+            response.make_conditional(request)
+        else:
+            response = send_from_directory(
+                os.path.dirname(path),
+                os.path.basename(path),
+                mimetype=mimetype,
+                etag=etag,
+                conditional=True,
+                max_age=max_age
+            )
+            response.accept_ranges = 'bytes'
     except IOError as e:
         raise FileSystemError(f"Ошибка чтения файла {filename}") from e
 
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.cache_control.immutable = immutable
+    return response
+
 # ===========================
 #     News: list / create / delete all
 # ===========================
 
 @bp.route("/api/news", methods=["GET", "POST", "DELETE", "OPTIONS"])
+@etag_by_data_version
 def news_line():
     if request.method == "OPTIONS":
         return jsonify({}), HTTPStatus.OK
 
-    # GET: вернуть все «утверждённые» и не удалённые новости
+    # GET: «утверждённые» и не удалённые новости.
+    # Без limit/cursor — вся лента списком (как раньше),
+    # с ними — страница {"items": [...], "next_cursor": "..."}
     if request.method == "GET":
-        news_list = [
-            n for n in g.db.get_news()
-            if n['status'] == 'Approved' and not n.get('delete_date')
-        ]
-        return jsonify(news_list)
+        filters = parse_feed_filters(request.args)
+
+        if "limit" not in request.args and "cursor" not in request.args:
+            return json_list_response(g.db.iter_news_feed(**filters))
+
+        try:
+            limit = int(request.args.get("limit", current_app.config["NEWS_FEED_DEFAULT_LIMIT"]))
+        except ValueError:
+            raise ValidationError("Неверный формат limit")
+        if not 1 <= limit <= current_app.config["NEWS_FEED_MAX_LIMIT"]:
+            raise ValidationError(
+                "Недопустимое значение limit",
+                details={"min": 1, "max": current_app.config["NEWS_FEED_MAX_LIMIT"]}
+            )
+
+        after = decode_feed_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        news_list, next_key = g.db.get_news_feed(limit=limit, after=after, **filters)
+        return jsonify({
+            "items":       news_list,
+            "next_cursor": encode_feed_cursor(next_key) if next_key else None
+        })
 
     # POST: создать новую новость (Pending)
     elif request.method == "POST":
@@ -106,25 +239,13 @@ def news_line():
 
         primary_news_data = request.form
         login = primary_news_data.get("login")
-        user = g.db.user_get_by_login(login)
+        user = get_user_by_login(login)
         if not user:
             raise AuthError("Неверные данные при авторизации")
 
         files_list = request.files.getlist('files') if 'files' in request.files else []
-        MAX_FILE_SIZE = 5 * 1024 * 1024
-        ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-
         for file in files_list:
-            if file.content_length > MAX_FILE_SIZE:
-                raise FileValidationError(
-                    f"Файл {file.filename} превышает лимит размера",
-                    file_info={"filename": file.filename, "size": file.content_length}
-                )
-            if not ('.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS):
-                raise FileValidationError(
-                    f"Недопустимый формат файла: {file.filename}",
-                    file_info={"filename": file.filename, "allowed": ALLOWED_EXTENSIONS}
-                )
+            validate_upload(file)
 
         try:
             # --- Преобразуем categoryID: пустая строка или "null" → None, иначе int ---
@@ -157,25 +278,285 @@ def news_line():
         except sqlite3.OperationalError as e:
             raise DatabaseError("Ошибка записи в базу данных") from e
 
+        schedule_image_variants()
         return jsonify({"message": "Новость успешно добавлена"}), HTTPStatus.OK
 
     # DELETE: массово «пометить все как удалённые»
     elif request.method == "DELETE":
         @moderator_required
         def delete_news_all():
-            news_ids = [row[0] for row in g.db.cursor.execute('''
-                SELECT newsID FROM News WHERE delete_date IS NULL
-            ''')]
-            if news_ids:
-                g.db.news_soft_delete_multiple(news_ids)
-
-            return jsonify({
-                "message": "Все новости помечены как удалённые",
-                "count": len(news_ids)
-            }), HTTPStatus.OK
+            # Пачками в фоновом задании (app/jobs.py): ход — /api/admin/jobs/<jobID>
+            return submit_job("delete_news_all", message="Удаление всех новостей поставлено в очередь")
         return delete_news_all()
 
 
+# ===========================
+#     Helpers: uploads / users
+# ===========================
+
+def schedule_image_variants():
+    """Поставить новые загрузки в фоновую очередь уменьшенных копий (если она включена)."""
+    pipeline = current_app.extensions.get('image_variants')
+    if pipeline is not None:
+        pipeline.submit(g.db.files_pending_variants(limit=100))
+
+
+MAX_FILE_SIZE = 5 * 1024 * 1024
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+
+def get_user_by_login(login):
+    """
+    Строка пользователя по логину через кэш app.extensions['user_cache'] (app/cache.py).
+    Кэш сбрасывается при изменении и удалении пользователей в этом процессе;
+    в остальных рабочих процессах запись живёт не дольше USER_CACHE_TTL.
+    """
+    cache = current_app.extensions.get('user_cache')
+    if cache is None:
+        return g.db.user_get_by_login(login)
+    user = cache.get(login)
+    if user is None:
+        user = g.db.user_get_by_login(login)
+        if user is not None:
+            cache.set(login, user)
+    return user
+
+
+def invalidate_user_cache(user_id=None):
+    """Убрать из кэша строку пользователя user_id (None — весь кэш)."""
+    cache = current_app.extensions.get('user_cache')
+    if cache is None:
+        return
+    if user_id is None:
+        cache.clear()
+    else:
+        cache.remove_where(lambda user: user['userID'] == user_id)
+
+
+def validate_upload(file):
+    """Проверка размера и расширения загружаемого файла."""
+    if file.content_length > MAX_FILE_SIZE:
+        raise FileValidationError(
+            f"Файл {file.filename} превышает лимит размера",
+            file_info={"filename": file.filename, "size": file.content_length}
+        )
+    if not ('.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS):
+        raise FileValidationError(
+            f"Недопустимый формат файла: {file.filename}",
+            file_info={"filename": file.filename, "allowed": ALLOWED_EXTENSIONS}
+        )
+
+
+# ===========================
+#     News: bulk create
+# ===========================
+
+@bp.route("/api/news/bulk", methods=["POST", "OPTIONS"])
+@login_required
+def news_bulk():
+    """
+    Пакетный импорт новостей (статус Pending) от имени текущего пользователя.
+    • JSON: {"items": [{title, description, event_start, event_end, categoryID}, ...]}
+    • multipart: поле items — тот же JSON-массив, файлы i-й новости — в полях files[i]
+    Ответ: результат по каждой новости в порядке items
+    ({"index", "status": "created", "newsID"} или {"index", "status": "error", "error"}).
+    """
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        raw_items = payload.get("items") if isinstance(payload, dict) else None
+    else:
+        try:
+            raw_items = json.loads(request.form.get("items", ""))
+        except ValueError:
+            raise ValidationError("Поле items должно содержать JSON-массив")
+
+    if not isinstance(raw_items, list) or not raw_items:
+        raise ValidationError("Ожидается непустой массив items")
+    max_items = current_app.config["NEWS_BULK_MAX_ITEMS"]
+    if len(raw_items) > max_items:
+        raise ValidationError(
+            "Слишком много новостей в одном запросе",
+            details={"max": max_items}
+        )
+
+    category_ids = {c["categoryID"] for c in g.db.category_get_all()}
+    results = [None] * len(raw_items)
+    valid_items, valid_indexes = [], []
+    for index, raw in enumerate(raw_items):
+        try:
+            item = parse_bulk_item(raw, category_ids)
+            item["files"] = request.files.getlist(f"files[{index}]")
+            for file in item["files"]:
+                validate_upload(file)
+        except ValidationError as e:
+            results[index] = {"index": index, "status": "error", "error": e.message}
+            continue
+        valid_items.append(item)
+        valid_indexes.append(index)
+
+    try:
+        inserted = g.db.news_add_bulk(
+            g.current_user["userID"],
+            valid_items,
+            current_app.config["UPLOAD_FOLDER"],
+            chunk_size=current_app.config["NEWS_BULK_CHUNK_SIZE"]
+        )
+    except FileNotFoundError as e:
+        raise FileSystemError("Система хранения файлов недоступна") from e
+    except sqlite3.OperationalError as e:
+        raise DatabaseError("Ошибка записи в базу данных") from e
+
+    for index, result in zip(valid_indexes, inserted):
+        if "newsID" in result:
+            results[index] = {"index": index, "status": "created", "newsID": result["newsID"]}
+        else:
+            results[index] = {"index": index, "status": "error", "error": result["error"]}
+
+    schedule_image_variants()
+    created = sum(1 for r in results if r["status"] == "created")
+    return jsonify({
+        "created": created,
+        "failed":  len(results) - created,
+        "results": results
+    }), HTTPStatus.OK
+
+
+def parse_bulk_item(raw, category_ids: set) -> dict:
+    """Проверить и привести одну новость пакетного импорта к формату News."""
+    if not isinstance(raw, dict):
+        raise ValidationError("Элемент items должен быть объектом")
+
+    title = raw.get("title")
+    description = raw.get("description")
+    if not isinstance(title, str) or not title.strip() \
+            or not isinstance(description, str) or not description.strip():
+        raise ValidationError("Отсутствуют обязательные поля title и description")
+
+    dates = {}
+    for field in ("event_start", "event_end"):
+        value = raw.get(field)
+        if value in (None, ""):
+            dates[field] = None
+            continue
+        try:
+            dates[field] = datetime.fromisoformat(str(value)).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            raise ValidationError(f"Неверный формат даты {field}")
+    if dates["event_start"] is None:
+        raise ValidationError("Отсутствует обязательное поле event_start")
+    if dates["event_end"] is not None and dates["event_end"] < dates["event_start"]:
+        raise ValidationError("Дата окончания события раньше даты начала")
+
+    category_id = raw.get("categoryID")
+    if category_id in (None, "", "null"):
+        category_id = None
+    else:
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            raise ValidationError("Неверный формат categoryID")
+        if category_id not in category_ids:
+            raise ValidationError(f"Категория {category_id} не найдена")
+
+    return {
+        "title":       title,
+        "description": description,
+        "event_start": dates["event_start"],
+        "event_end":   dates["event_end"],
+        "categoryID":  category_id,
+    }
+
+
+# ===========================
+#     News: full-text search
+# ===========================
+
+@bp.route("/api/news/search", methods=["GET"])
+def search_news():
+    """
+    Полнотекстовый поиск по опубликованным новостям: ?q=...&limit=...&offset=...
+    Результаты отсортированы по релевантности (bm25), в title_highlight и snippet
+    совпадения выделены тегами <mark>.
+    """
+    query = request.args.get("q", "").strip()
+    if len(query) < 2:
+        raise ValidationError("Поисковый запрос должен содержать минимум 2 символа")
+
+    try:
+        limit = int(request.args.get("limit", current_app.config["NEWS_FEED_DEFAULT_LIMIT"]))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        raise ValidationError("Неверный формат limit или offset")
+    if not 1 <= limit <= current_app.config["NEWS_FEED_MAX_LIMIT"] or offset < 0:
+        raise ValidationError(
+            "Недопустимые параметры пагинации",
+            details={"limit_max": current_app.config["NEWS_FEED_MAX_LIMIT"]}
+        )
+
+    try:
+        news_list, next_offset = g.db.search_news(query, limit=limit, offset=offset)
+    except sqlite3.OperationalError as e:
+        raise DatabaseError(
+            "Ошибка полнотекстового поиска",
+            details={"operation": "search_news"}
+        ) from e
+
+    return jsonify({
+        "items":       news_list,
+        "next_offset": next_offset
+    }), HTTPStatus.OK
+
+
+# ===========================
+#     News: feed cursor / filters
+# ===========================
+
+def encode_feed_cursor(key) -> str:
+    """Ключ (publish_date, newsID) → непрозрачный токен для клиента."""
+    raw = json.dumps(list(key), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_feed_cursor(token: str) -> tuple:
+    """Токен курсора → ключ (publish_date, newsID)."""
+    try:
+        publish_date, news_id = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        if not isinstance(publish_date, str) or not isinstance(news_id, int):
+            raise ValueError(token)
+        return publish_date, news_id
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise ValidationError("Неверный курсор пагинации")
+
+
+def parse_feed_filters(args) -> dict:
+    """Фильтры ленты: categoryID, event_from, event_to (даты начала события)."""
+    filters = {}
+
+    raw_cat = args.get("categoryID")
+    if raw_cat:
+        try:
+            filters["category_id"] = int(raw_cat)
+        except ValueError:
+            raise ValidationError("Неверный формат categoryID")
+
+    for arg, key, day_time in (("event_from", "event_from", "00:00:00"),
+                               ("event_to", "event_to", "23:59:59")):
+        raw_date = args.get(arg)
+        if not raw_date:
+            continue
+        try:
+            parsed = datetime.fromisoformat(raw_date)
+        except ValueError:
+            raise ValidationError(f"Неверный формат даты {arg}", details={"format": "YYYY-MM-DD[ HH:MM:SS]"})
+        # Даты в News хранятся строкой 'YYYY-MM-DD HH:MM:SS'
+        if len(raw_date) == 10:
+            filters[key] = f"{parsed.strftime('%Y-%m-%d')} {day_time}"
+        else:
+            filters[key] = parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+    return filters
+
+
 # ===========================
 #  News: single GET / PUT / DELETE
 # ===========================
@@ -205,31 +586,13 @@ def single_news(newsID):
             )
 
         primary_news_data = request.form
-        user = g.db.user_get_by_login(primary_news_data.get("login"))
+        user = get_user_by_login(primary_news_data.get("login"))
         if not user:
             raise AuthError("Неверные данные при авторизации")
 
         files_list = request.files.getlist('files') if 'files' in request.files else []
-        MAX_FILE_SIZE = 5 * 1024 * 1024
-        ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-
         for file in files_list:
-            if file.content_length > MAX_FILE_SIZE:
-                raise FileValidationError(
-                    f"Файл {file.filename} превышает лимит размера",
-                    file_info={"filename": file.filename, "size": file.content_length}
-                )
-            if '.' not in file.filename:
-                raise FileValidationError(
-                    "Файл не имеет расширения",
-                    file_info={"filename": file.filename}
-                )
-            ext = file.filename.rsplit('.', 1)[1].lower()
-            if ext not in ALLOWED_EXTENSIONS:
-                raise FileValidationError(
-                    f"Недопустимый формат файла: {file.filename}",
-                    file_info={"filename": file.filename, "allowed": ALLOWED_EXTENSIONS, "actual": ext}
-                )
+            validate_upload(file)
 
         # --- Преобразуем categoryID: пустая строка или "null" → None, иначе int ---
         raw_cat = primary_news_data.get("categoryID")
@@ -264,6 +627,7 @@ def single_news(newsID):
         except FileNotFoundError as e:
             raise FileSystemError("Ошибка файловой системы") from e
 
+        schedule_image_variants()
         return jsonify({"message": "Новость успешно обновлена и одобрена"}), HTTPStatus.OK
 
     # DELETE: «мягкое удаление» (в корзину)
@@ -287,23 +651,29 @@ def login():
     if request.method == "OPTIONS":
         return jsonify({}), HTTPStatus.OK
 
-    import unicodedata
     data = request.get_json()
     login = data.get("login", "").strip()
     password = data.get("password", "").strip()
     if not login or not password:
         raise ValidationError("Логин и пароль обязательны")
 
-    norm_login = unicodedata.normalize("NFKC", login).casefold()
-    matched_user = None
-    for user in g.db.user_get_all():
-        db_login = unicodedata.normalize("NFKC", user["login"]).casefold()
-        if norm_login == db_login:
-            matched_user = g.db.user_get_by_id(user["userID"])
-            break
+    # Поиск по нормализованному ключу логина (NFKC + casefold) через индекс
+    matched_user = g.db.user_get_by_login_key(login)
+    if not matched_user:
+        raise AuthError("Неверный логин или пароль")
 
-    if not matched_user or not check_password_hash(matched_user["password"], password):
+    # Проверка пароля — в пуле процессов (app/passwords.py); на это время
+    # соединение с БД возвращается в пул. Устаревший хэш пересчитывается.
+    hasher = current_app.extensions['password_hasher']
+    with g.db.released():
+        valid, new_hash = hasher.verify_and_update(matched_user["password"], password)
+    if not valid:
         raise AuthError("Неверный логин или пароль")
+    if new_hash is not None:
+        try:
+            g.db.user_set_password_hash(matched_user["userID"], new_hash, matched_user["password"])
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"Не удалось обновить хэш пароля пользователя {matched_user['userID']}: {e}")
 
     try:
         token_payload = {
@@ -361,20 +731,17 @@ def register():
             details={"requirement": "Минимум 5 символов"}
         )
 
-    import unicodedata
-    norm_login = unicodedata.normalize("NFKC", login).casefold()
-    norm_nick  = unicodedata.normalize("NFKC", nickname).casefold()
-    all_users = g.db.user_get_all()
-    for user in all_users:
-        existing_login = unicodedata.normalize("NFKC", user["login"]).casefold()
-        existing_nick  = unicodedata.normalize("NFKC", user["nick"]).casefold()
-        if existing_login == norm_login:
-            raise ConstraintError("Логин уже используется", constraint="unique_login")
-        if existing_nick == norm_nick:
-            raise ConstraintError("Никнейм уже используется", constraint="unique_nick")
+    conflict = g.db.user_find_conflict(login=login, nick=nickname)
+    if conflict == "login":
+        raise ConstraintError("Логин уже используется", constraint="unique_login")
+    if conflict == "nick":
+        raise ConstraintError("Никнейм уже используется", constraint="unique_nick")
+
+    with g.db.released():
+        password_hash = current_app.extensions['password_hasher'].hash(password)
 
     try:
-        user_id = g.db.user_create(login, password, nickname)
+        user_id = g.db.user_create(login, password, nickname, password_hash=password_hash)
     except ValueError as e:
         msg = str(e)
         if "логин" in msg:
@@ -419,8 +786,7 @@ def logout():
 @moderator_required
 def admin_users():
     try:
-        users = g.db.user_get_all()
-        return jsonify(users)
+        return json_list_response(g.db.iter_users())
     except sqlite3.OperationalError as e:
         raise DatabaseError(
             "Не удалось получить данные пользователей",
@@ -446,6 +812,7 @@ def admin_users_real_passwords():
 
 @bp.route("/api/admin/pending-news", methods=["GET"])
 @moderator_required
+@etag_by_data_version
 def pending_news():
     """
     Список новостей со статусом 'Pending' и delete_date IS NULL.
@@ -457,6 +824,38 @@ def pending_news():
         raise e
 
 
+# Ошибка, если новость на месте, но её статус не допускает переход: действие → (сообщение, код)
+TRANSITION_CONFLICTS = {
+    "approve":        ("Новость уже была модерацией обработана", "ALREADY_MODERATED"),
+    "reject":         ("Новость уже была модерацией обработана", "ALREADY_MODERATED"),
+    "archive":        ("Новость уже находится в архиве", "ALREADY_ARCHIVED"),
+    "unarchive":      ("Новость не в архиве", "NOT_IN_ARCHIVE"),
+    "unarchive_edit": ("Новость не в архиве", "NOT_IN_ARCHIVE"),
+    "restore":        ("Новость не находится в корзине", "NOT_IN_TRASH"),
+}
+
+
+def apply_news_transition(newsID, action, moderator_id=None):
+    """
+    Переход статуса новости одним условным UPDATE (Storage.news_transition).
+    Не применён: новости нет там, где ждёт переход → 404, статус не тот → 422.
+    Возвращает {newsID, status} после перехода.
+    """
+    try:
+        news, reason = g.db.news_transition(newsID, action, moderator_id)
+    except sqlite3.OperationalError as e:
+        raise DatabaseError(
+            "Ошибка изменения статуса новости",
+            details={"operation": action, "news_id": newsID}
+        ) from e
+    if reason == 'not_found':
+        raise NotFoundError(resource_type="Новость", resource_id=newsID)
+    if reason == 'conflict':
+        message, error_code = TRANSITION_CONFLICTS[action]
+        raise BusinessRuleError(message, error_code=error_code)
+    return news
+
+
 @bp.route("/api/admin/moderate-news/<int:newsID>", methods=["POST", "OPTIONS"])
 @moderator_required
 def moderate_news(newsID):
@@ -481,48 +880,10 @@ def moderate_news(newsID):
                 details={"allowed_actions": ["approve", "reject"]}
             )
 
-        news_data = g.db.get_news_single(newsID)
-        if not news_data or not news_data[0]:
-            raise NotFoundError(resource_type="Новость", resource_id=newsID)
-
-        current_status = news_data[0]['status']
-        if current_status != "Pending":
-            raise BusinessRuleError(
-                "Новость уже была модерацией обработана",
-                error_code="ALREADY_MODERATED"
-            )
-
-        new_status = "Approved" if action == "approve" else "Rejected"
-        moderator_id = g.current_user['userID']
-
-        try:
-            # 1) Меняем status; если Approved → сбрасываем archive_date (триггер поставит publish_date)
-            g.db.cursor.execute('''
-                UPDATE News
-                SET status = ?,
-                    moderated_byID = ?,
-                    archive_date = NULL
-                WHERE newsID = ?
-            ''', (new_status, moderator_id, newsID))
-
-            # 2) Если отклонено (reject) → soft delete сразу
-            if action == "reject":
-                g.db.cursor.execute('''
-                    UPDATE News
-                    SET delete_date = datetime('now', 'localtime')
-                    WHERE newsID = ?
-                ''', (newsID,))
-
-            g.db.connection.commit()
-        except sqlite3.OperationalError as e:
-            raise DatabaseError(
-                "Ошибка обновления статуса новости",
-                details={
-                    "operation": "news_moderation",
-                    "news_id": newsID,
-                    "new_status": new_status
-                }
-            ) from e
+        # approve: status='Approved', archive_date=NULL (триггер поставит publish_date);
+        # reject: status='Rejected' и сразу в корзину
+        news = apply_news_transition(newsID, action, g.current_user['userID'])
+        new_status = news['status']
 
         return jsonify({
             "message": f"Новость успешно {'одобрена' if action == 'approve' else 'отклонена'}",
@@ -539,6 +900,84 @@ def moderate_news(newsID):
         )
 
 
+@bp.route("/api/admin/moderate-news/batch", methods=["POST", "OPTIONS"])
+@moderator_required
+def moderate_news_batch():
+    """
+    Пакетная модерация: {"items": [{"newsID": 1, "action": "approve"}, ...]},
+    action — approve, reject или archive. Все переходы — одна транзакция
+    (Storage.news_transition_many), модератор — текущий пользователь.
+    Ответ: результат по каждому элементу в порядке items
+    ({"index", "newsID", "status": "ok", "newStatus"} или
+    {"index", "newsID", "status": "error", "error", "error_code"}).
+    """
+    if request.method == "OPTIONS":
+        return jsonify({}), HTTPStatus.OK
+
+    payload = request.get_json(silent=True) or {}
+    raw_items = payload.get("items") if isinstance(payload, dict) else None
+    if not isinstance(raw_items, list) or not raw_items:
+        raise ValidationError("Ожидается непустой массив items")
+    max_items = current_app.config["MODERATION_BATCH_MAX_ITEMS"]
+    if len(raw_items) > max_items:
+        raise ValidationError(
+            "Слишком много новостей в одном запросе",
+            details={"max": max_items}
+        )
+
+    allowed_actions = ("approve", "reject", "archive")
+    results = [None] * len(raw_items)
+    items, indexes, seen = [], [], set()
+    for index, raw in enumerate(raw_items):
+        news_id = raw.get("newsID") if isinstance(raw, dict) else None
+        action = raw.get("action") if isinstance(raw, dict) else None
+        if not isinstance(news_id, int) or isinstance(news_id, bool):
+            error, error_code = "Поле newsID должно быть целым числом", "INVALID_ITEM"
+        elif action not in allowed_actions:
+            error, error_code = "Недопустимое действие", "INVALID_ACTION"
+        elif news_id in seen:
+            error, error_code = "Новость уже указана в этом запросе", "DUPLICATE_ITEM"
+        else:
+            seen.add(news_id)
+            items.append((news_id, action))
+            indexes.append(index)
+            continue
+        results[index] = {"index": index, "newsID": news_id, "status": "error",
+                          "error": error, "error_code": error_code}
+
+    try:
+        outcomes = g.db.news_transition_many(
+            items,
+            g.current_user["userID"],
+            chunk_size=current_app.config["MODERATION_BATCH_CHUNK_SIZE"]
+        ) if items else {}
+    except sqlite3.OperationalError as e:
+        raise DatabaseError(
+            "Ошибка пакетной модерации",
+            details={"operation": "news_transition_many"}
+        ) from e
+
+    for index, (news_id, action) in zip(indexes, items):
+        news, reason = outcomes[news_id]
+        if reason is None:
+            results[index] = {"index": index, "newsID": news_id, "status": "ok",
+                              "newStatus": news["status"]}
+            continue
+        if reason == "not_found":
+            error, error_code = f"Новость с ID={news_id} не найдена", "NOT_FOUND"
+        else:
+            error, error_code = TRANSITION_CONFLICTS[action]
+        results[index] = {"index": index, "newsID": news_id, "status": "error",
+                          "error": error, "error_code": error_code}
+
+    applied = sum(1 for r in results if r["status"] == "ok")
+    return jsonify({
+        "applied": applied,
+        "failed":  len(results) - applied,
+        "results": results
+    }), HTTPStatus.OK
+
+
 @bp.route("/api/admin/users/<int:user_id>", methods=["PUT", "DELETE"])
 @admin_required
 def admin_user_operations(user_id):
@@ -577,32 +1016,25 @@ def handle_user_update(user_id):
 
     # Проверка на уникальность login и nick
     if 'login' in filtered_data or 'nick' in filtered_data:
-        current_user = g.db.user_get_by_id(user_id)
-        current_login = current_user['login']
-        current_nick  = current_user['nick']
-        import unicodedata
-        norm_new_login = unicodedata.normalize("NFKC", filtered_data.get('login', current_login)).casefold()
-        norm_new_nick  = unicodedata.normalize("NFKC", filtered_data.get('nick', current_nick)).casefold()
-
-        all_users = g.db.user_get_all()
-        for u in all_users:
-            if u['userID'] == user_id:
-                continue
-            other_login = unicodedata.normalize("NFKC", u['login']).casefold()
-            other_nick  = unicodedata.normalize("NFKC", u['nick']).casefold()
-            if norm_new_login == other_login:
-                raise ConstraintError(
-                    "Пользователь с таким логином уже существует",
-                    constraint="unique_login"
-                )
-            if norm_new_nick == other_nick:
-                raise ConstraintError(
-                    "Пользователь с таким никнеймом уже существует",
-                    constraint="unique_nick"
-                )
+        conflict = g.db.user_find_conflict(
+            login=filtered_data.get('login'),
+            nick=filtered_data.get('nick'),
+            exclude_id=user_id
+        )
+        if conflict == 'login':
+            raise ConstraintError(
+                "Пользователь с таким логином уже существует",
+                constraint="unique_login"
+            )
+        if conflict == 'nick':
+            raise ConstraintError(
+                "Пользователь с таким никнеймом уже существует",
+                constraint="unique_nick"
+            )
 
     try:
         g.db.user_update(user_id, filtered_data)
+        invalidate_user_cache(user_id)
         return jsonify({
             "message": "Пользователь успешно обновлен",
             "userID":  user_id
@@ -623,6 +1055,7 @@ def handle_user_deletion(user_id):
         )
     try:
         g.db.user_delete(user_id)
+        invalidate_user_cache(user_id)
         return jsonify({
             "message": "Пользователь успешно удален",
             "userID":  user_id
@@ -638,26 +1071,17 @@ def handle_user_deletion(user_id):
 @bp.route("/api/admin/users/all", methods=["DELETE"])
 @admin_required
 def delete_all_users():
-    try:
-        current_user_id = g.current_user['userID']
-        initial_users = g.db.user_get_all()
-        other_users = [u for u in initial_users if u['userID'] != current_user_id]
-
-        if not other_users:
-            raise BusinessRuleError(
-                "Нет пользователей доступных для удаления",
-                error_code="NO_USERS_TO_DELETE"
-            )
-
-        g.db.users_delete_all(exclude_ids=[current_user_id])
-        remaining_users = g.db.user_get_all()
-        return jsonify({
-            "message":        "Пользователи успешно удалены",
-            "remainingUsers": remaining_users,
-            "deletedCount":   len(other_users)
-        }), HTTPStatus.OK
-    except BusinessRuleError as e:
-        raise e
+    """
+    Удаление всех пользователей, кроме текущего и первого администратора, вместе
+    с их новостями — фоновым заданием (app/jobs.py): ход — /api/admin/jobs/<jobID>.
+    """
+    params = {"exclude": g.db.users_delete_exclusions([g.current_user['userID']])}
+    if not g.db.bulk_count("users_delete", params):
+        raise BusinessRuleError(
+            "Нет пользователей доступных для удаления",
+            error_code="NO_USERS_TO_DELETE"
+        )
+    return submit_job("delete_all_users", params, message="Удаление пользователей поставлено в очередь")
 
 
 # ===========================
@@ -682,12 +1106,8 @@ def categories():
             if not name:
                 raise ValidationError("Название категории обязательно")
 
-            import unicodedata
-            normalized_name = unicodedata.normalize("NFKC", name).casefold()
-            for cat in g.db.category_get_all():
-                existing_name = unicodedata.normalize("NFKC", cat["name"]).casefold()
-                if normalized_name == existing_name:
-                    raise ConstraintError("Категория с таким названием уже существует", constraint="unique_name")
+            if g.db.category_get_by_name_key(name):
+                raise ConstraintError("Категория с таким названием уже существует", constraint="unique_name")
 
             category_id = g.db.category_create(name=name, description=description)
             return jsonify({
@@ -714,8 +1134,7 @@ def delete_all_categories():
         return jsonify({}), HTTPStatus.OK
 
     try:
-        g.db.cursor.execute("DELETE FROM Categories")
-        g.db.connection.commit()
+        g.db.category_delete_all()
         return jsonify({
             "message": "Все категории успешно удалены"
         }), HTTPStatus.OK
@@ -738,13 +1157,9 @@ def update_category(category_id):
     if not name:
         raise ValidationError("Название категории обязательно")
 
-    import unicodedata
-    normalized_name = unicodedata.normalize("NFKC", name).casefold()
-    for cat in g.db.category_get_all():
-        if cat["categoryID"] != category_id:
-            existing_name = unicodedata.normalize("NFKC", cat["name"]).casefold()
-            if normalized_name == existing_name:
-                raise ConstraintError("Категория с таким названием уже существует", constraint="unique_name")
+    existing = g.db.category_get_by_name_key(name)
+    if existing and existing["categoryID"] != category_id:
+        raise ConstraintError("Категория с таким названием уже существует", constraint="unique_name")
 
     g.db.category_update(category_id, name=name, description=description)
     return jsonify({"message": "Категория успешно обновлена"}), HTTPStatus.OK
@@ -756,12 +1171,13 @@ def update_category(category_id):
 
 @bp.route("/api/admin/trash", methods=["GET"])
 @moderator_required
+@etag_by_data_version
 def get_trash():
     try:
-        deleted_news = g.db.get_deleted_news()
+        deleted_news = g.db.iter_deleted_news()
         # отбираем только те, что действительно имеют delete_date
-        news_list = [n for n in deleted_news if n.get('delete_date')]
-        return jsonify(news_list), HTTPStatus.OK
+        news_list = (n for n in deleted_news if n.get('delete_date'))
+        return json_list_response(news_list), HTTPStatus.OK
     except sqlite3.OperationalError as e:
         raise DatabaseError(
             "Ошибка получения данных корзины",
@@ -791,29 +1207,15 @@ def purge_single_news(newsID):
 @bp.route("/api/admin/trash/purge", methods=["DELETE"])
 @moderator_required
 def purge_trash():
-    try:
-        g.db.cursor.execute('''
-            SELECT newsID FROM News WHERE delete_date IS NOT NULL
-        ''')
-        news_ids = [row[0] for row in g.db.cursor.fetchall()]
-        if news_ids:
-            g.db.purge_news(news_ids)
-        return jsonify({
-            "message": "Корзина очищена",
-            "count":   len(news_ids)
-        }), HTTPStatus.OK
-    except sqlite3.OperationalError as e:
-        raise DatabaseError(
-            "Ошибка очистки корзины",
-            details={"operation": "purge_trash"}
-        ) from e
+    # Пачками в фоновом задании (app/jobs.py): ход — /api/admin/jobs/<jobID>
+    return submit_job("purge_trash", message="Очистка корзины поставлена в очередь")
 
 
 @bp.route("/api/admin/trash/check-expired", methods=["POST"])
 @moderator_required
 def check_expired():
     try:
-        purged_count = g.db.purge_expired_news()
+        purged_count = g.db.purge_expired_news(current_app.config.get('TRASH_RETENTION_DAYS', 30))
         return jsonify({
             "message": "Просроченные новости удалены",
             "count":   purged_count
@@ -833,29 +1235,8 @@ def restore_news(newsID):
     ● Сбрасываем delete_date, archive_date, publish_date → NULL
     ● Переводим статус → 'Pending'
     """
-    news_data = g.db.get_deleted_news_single(newsID)
-    if not news_data:
-        raise NotFoundError(resource_type="Новость", resource_id=newsID)
-    if not news_data.get('delete_date'):
-        raise BusinessRuleError("Новость не находится в корзине", error_code="NOT_IN_TRASH")
-
-    try:
-        g.db.cursor.execute('''
-            UPDATE News
-            SET delete_date   = NULL,
-                archive_date  = NULL,
-                publish_date  = NULL,
-                status        = 'Pending'
-            WHERE newsID = ?
-        ''', (newsID,))
-        g.db.connection.commit()
-
-        return jsonify({"message": "Новость успешно восстановлена"}), HTTPStatus.OK
-    except sqlite3.OperationalError as e:
-        raise DatabaseError(
-            "Ошибка восстановления новости",
-            details={"operation": "restore_news", "news_id": newsID}
-        ) from e
+    apply_news_transition(newsID, "restore")
+    return jsonify({"message": "Новость успешно восстановлена"}), HTTPStatus.OK
 
 
 @bp.route("/api/admin/trash/<int:newsID>/restore-edit", methods=["POST"])
@@ -866,29 +1247,8 @@ def restore_edit_news(newsID):
     ● Сбрасываем delete_date, archive_date, publish_date → NULL
     ● Оставляем статус 'Pending'
     """
-    news_data = g.db.get_deleted_news_single(newsID)
-    if not news_data:
-        raise NotFoundError(resource_type="Новость", resource_id=newsID)
-    if not news_data.get('delete_date'):
-        raise BusinessRuleError("Новость не находится в корзине", error_code="NOT_IN_TRASH")
-
-    try:
-        g.db.cursor.execute('''
-            UPDATE News
-            SET delete_date   = NULL,
-                archive_date  = NULL,
-                publish_date  = NULL,
-                status        = 'Pending'
-            WHERE newsID = ?
-        ''', (newsID,))
-        g.db.connection.commit()
-
-        return jsonify({"message": "Новость подготовлена к восстановлению для редактирования"}), HTTPStatus.OK
-    except sqlite3.OperationalError as e:
-        raise DatabaseError(
-            "Ошибка восстановления новости",
-            details={"operation": "restore_edit_news", "news_id": newsID}
-        ) from e
+    apply_news_transition(newsID, "restore")
+    return jsonify({"message": "Новость подготовлена к восстановлению для редактирования"}), HTTPStatus.OK
 
 
 # ===========================
@@ -901,45 +1261,23 @@ def archive_news(newsID):
     if request.method == "OPTIONS":
         return jsonify({}), HTTPStatus.OK
 
-    try:
-        news_data = g.db.get_news_single(newsID)
-        if not news_data or not news_data[0]:
-            raise NotFoundError(resource_type="Новость", resource_id=newsID)
-
-        current_status = news_data[0]['status']
-        if current_status == 'Archived':
-            raise BusinessRuleError("Новость уже находится в архиве", error_code="ALREADY_ARCHIVED")
-
-        # Устанавливаем status='Archived', ставим archive_date=now, сбрасываем delete_date
-        g.db.cursor.execute('''
-            UPDATE News
-            SET status       = 'Archived',
-                archive_date = datetime('now', 'localtime'),
-                delete_date  = NULL
-            WHERE newsID = ?
-        ''', (newsID,))
-        g.db.connection.commit()
-
-        return jsonify({"message": "Новость успешно перемещена в архив"}), HTTPStatus.OK
-
-    except sqlite3.OperationalError as e:
-        raise DatabaseError(
-            "Ошибка при архивации новости",
-            details={"operation": "archive_news", "news_id": newsID}
-        ) from e
+    # status='Archived', archive_date=now
+    apply_news_transition(newsID, "archive")
+    return jsonify({"message": "Новость успешно перемещена в архив"}), HTTPStatus.OK
 
 
 @bp.route("/api/admin/archived-news", methods=["GET"])
 @moderator_required
+@etag_by_data_version
 def archived_news():
     """
     Возвращает все новости со статусом 'Archived' и delete_date IS NULL.
     """
     try:
-        archived_list = g.db.get_archived_news()
+        archived_list = g.db.iter_archived_news()
         # Отбираем только те, что имеют archive_date
-        news_list = [n for n in archived_list if n.get('archive_date')]
-        return jsonify(news_list), HTTPStatus.OK
+        news_list = (n for n in archived_list if n.get('archive_date'))
+        return json_list_response(news_list), HTTPStatus.OK
     except sqlite3.OperationalError as e:
         raise DatabaseError(
             "Ошибка получения данных архива",
@@ -958,30 +1296,8 @@ def restore_archived_news(newsID):
     if request.method == "OPTIONS":
         return jsonify({}), HTTPStatus.OK
 
-    news_data = g.db.get_news_single(newsID)
-    if not news_data or not news_data[0]:
-        raise NotFoundError(resource_type="Новость", resource_id=newsID)
-
-    current_status = news_data[0]['status']
-    if current_status != 'Archived':
-        raise BusinessRuleError("Новость не в архиве", error_code="NOT_IN_ARCHIVE")
-
-    try:
-        g.db.cursor.execute('''
-            UPDATE News
-            SET status       = 'Approved',
-                archive_date = NULL,
-                delete_date  = NULL
-            WHERE newsID = ?
-        ''', (newsID,))
-        g.db.connection.commit()
-
-        return jsonify({"message": f"Новость {newsID} восстановлена из архива"}), HTTPStatus.OK
-    except sqlite3.OperationalError as e:
-        raise DatabaseError(
-            "Ошибка восстановления новости из архива",
-            details={"operation": "restore_archived_news", "news_id": newsID}
-        ) from e
+    apply_news_transition(newsID, "unarchive")
+    return jsonify({"message": f"Новость {newsID} восстановлена из архива"}), HTTPStatus.OK
 
 
 @bp.route("/api/admin/archived-news/<int:newsID>/restore-edit", methods=["POST", "OPTIONS"])
@@ -995,31 +1311,8 @@ def restore_edit_archived_news(newsID):
     if request.method == "OPTIONS":
         return jsonify({}), HTTPStatus.OK
 
-    news_data = g.db.get_news_single(newsID)
-    if not news_data or not news_data[0]:
-        raise NotFoundError(resource_type="Новость", resource_id=newsID)
-
-    current_status = news_data[0]['status']
-    if current_status != 'Archived':
-        raise BusinessRuleError("Новость не в архиве", error_code="NOT_IN_ARCHIVE")
-
-    try:
-        g.db.cursor.execute('''
-            UPDATE News
-            SET status       = 'Pending',
-                archive_date = NULL,
-                delete_date  = NULL,
-                publish_date = NULL
-            WHERE newsID = ?
-        ''', (newsID,))
-        g.db.connection.commit()
-
-        return jsonify({"message": f"Новость {newsID} восстановлена для редактирования"}), HTTPStatus.OK
-    except sqlite3.OperationalError as e:
-        raise DatabaseError(
-            "Ошибка восстановления новости для редактирования",
-            details={"operation": "restore_edit_archived_news", "news_id": newsID}
-        ) from e
+    apply_news_transition(newsID, "unarchive_edit")
+    return jsonify({"message": f"Новость {newsID} восстановлена для редактирования"}), HTTPStatus.OK
 
 
 @bp.route("/api/admin/archived-news/<int:newsID>/delete", methods=["DELETE", "OPTIONS"])
@@ -1058,27 +1351,18 @@ def delete_all_archived_news():
         return jsonify({}), HTTPStatus.OK
 
     try:
-        # Выбираем все newsID тех записей, которые в архиве и ещё не удалены
-        g.db.cursor.execute('''
-            SELECT newsID
-              FROM News
-             WHERE archive_date IS NOT NULL
-               AND delete_date IS NULL
-        ''')
-        news_ids = [row[0] for row in g.db.cursor.fetchall()]
-
-        if news_ids:
-            g.db.news_soft_delete_multiple(news_ids)
+        # Все записи, которые в архиве и ещё не удалены, — одним условием, без выборки ID
+        count = g.db.news_soft_delete_archived()
 
         return jsonify({
             "message": "Все архивные новости перемещены в корзину",
-            "count":   len(news_ids)
+            "count":   count
         }), HTTPStatus.OK
 
     except sqlite3.OperationalError as e:
         raise DatabaseError(
             "Ошибка при массовом перемещении архивных новостей в корзину",
-            details={"operation": "news_soft_delete_multiple"}
+            details={"operation": "news_soft_delete_archived"}
         ) from e
 
 
@@ -1141,3 +1425,192 @@ def count_archived_news():
             "Не удалось получить количество новостей в архиве",
             details={"operation": "count_archived_news", "error": str(e)}
         ) from e
+
+
+@bp.route("/api/admin/dashboard/counts", methods=["GET"])
+@moderator_required
+def dashboard_counts():
+    """
+    Все счётчики вкладок админки одним запросом:
+    pending_news, users, trash_news, archived_news.
+    """
+    try:
+        return jsonify(g.db.dashboard_counts()), HTTPStatus.OK
+    except sqlite3.DatabaseError as e:
+        raise DatabaseError(
+            "Не удалось получить счётчики админки",
+            details={"operation": "dashboard_counts", "error": str(e)}
+        ) from e
+
+
+# ===========================
+#   Сверка загрузок с Files
+# ===========================
+
+@bp.route("/api/admin/files/gc", methods=["POST"])
+@admin_required
+def files_gc():
+    """
+    Сверка UPLOAD_FOLDER с таблицей Files (см. Storage.files_gc).
+    Тело (JSON, всё необязательно):
+    ● dry_run — по умолчанию true: только отчёт; false — удалить файлы-сироты;
+    ● prune_missing — удалить записи Files без файла на диске (только при dry_run=false);
+    ● min_age — не трогать файлы моложе стольких секунд (по умолчанию FILES_GC_MIN_AGE).
+    Пишущее соединение пула запрос не берёт (см. Storage.writer): сверка идёт через
+    отдельное соединение, долгое сканирование пишет только во временные таблицы
+    и блокировку записи не держит, а удаление записей при prune_missing — одна
+    короткая транзакция, которая ждёт блокировку SQLite как любой другой писатель.
+    """
+    payload = request.get_json(silent=True) or {}
+    dry_run = payload.get('dry_run', True)
+    prune_missing = payload.get('prune_missing', False)
+    min_age = payload.get('min_age', current_app.config.get('FILES_GC_MIN_AGE', 3600))
+    if not isinstance(dry_run, bool) or not isinstance(prune_missing, bool):
+        raise ValidationError("dry_run и prune_missing должны быть true/false")
+    if isinstance(min_age, bool) or not isinstance(min_age, (int, float)) or min_age < 0:
+        raise ValidationError("min_age должен быть неотрицательным числом секунд")
+
+    db = Storage(current_app.config['DATABASE_PATH'])
+    try:
+        db.open_connection()
+        report = db.files_gc(
+            current_app.config['UPLOAD_FOLDER'],
+            dry_run=dry_run,
+            min_age=min_age,
+            prune_missing=prune_missing
+        )
+    except sqlite3.DatabaseError as e:
+        raise DatabaseError(
+            "Не удалось сверить загруженные файлы",
+            details={"operation": "files_gc", "error": str(e)}
+        ) from e
+    except OSError as e:
+        raise FileSystemError(
+            "Ошибка доступа к каталогу загрузок",
+            file_path=getattr(e, 'filename', None)
+        ) from e
+    finally:
+        db.close_connection()
+    return jsonify(report), HTTPStatus.OK
+
+
+# ===========================
+#   Плановое обслуживание
+# ===========================
+
+@bp.route("/api/admin/maintenance", methods=["GET"])
+@admin_required
+def maintenance_status():
+    """
+    Состояние планировщика обслуживания (app/maintenance.py): кто держит аренду,
+    интервалы задач и последний запуск каждой — время, длительность, итог, ошибки.
+    """
+    try:
+        return jsonify(current_app.extensions['maintenance'].stats()), HTTPStatus.OK
+    except sqlite3.DatabaseError as e:
+        raise DatabaseError(
+            "Не удалось получить состояние обслуживания",
+            details={"operation": "maintenance_status", "error": str(e)}
+        ) from e
+
+
+@bp.route("/api/admin/maintenance/<task>/run", methods=["POST"])
+@admin_required
+def maintenance_run(task):
+    """
+    Выполнить задачу обслуживания сейчас, не дожидаясь расписания.
+    Задача идёт через своё соединение планировщика (как и по расписанию), поэтому
+    запрос не занимает пишущее соединение пула, а читающее возвращается в пул
+    на время выполнения: долгая очистка корзины не отнимает соединения у запросов.
+    """
+    scheduler = current_app.extensions['maintenance']
+    if task not in scheduler.tasks:
+        raise NotFoundError("Задача обслуживания", task)
+    with g.db.released():
+        run = scheduler.run(task)
+    status = HTTPStatus.OK if run['status'] == 'ok' else HTTPStatus.INTERNAL_SERVER_ERROR
+    return jsonify(run), status
+
+
+# ===========================
+#   Фоновые задания
+# ===========================
+
+def submit_job(kind, params=None, message="Задание поставлено в очередь"):
+    """
+    Поставить фоновое задание (app/jobs.py) и ответить 202 с jobID и адресом
+    для отслеживания. Если такое же задание уже ждёт или выполняется, возвращается оно.
+    """
+    try:
+        job, created = g.db.job_submit(kind, params, g.current_user['userID'])
+    except sqlite3.OperationalError as e:
+        raise DatabaseError(
+            "Не удалось поставить задание в очередь",
+            details={"operation": "job_submit", "kind": kind}
+        ) from e
+    current_app.extensions['jobs'].notify()
+
+    location = url_for('main.get_job', job_id=job['jobID'])
+    response = jsonify({
+        "message":  message if created else "Такое задание уже выполняется",
+        "jobID":    job['jobID'],
+        "status":   job['status'],
+        "location": location
+    })
+    return response, HTTPStatus.ACCEPTED, {"Location": location}
+
+
+@bp.route("/api/admin/jobs", methods=["GET"])
+@moderator_required
+def list_jobs():
+    """Последние фоновые задания (новые первыми) с прогрессом."""
+    return jsonify([job_report(job) for job in g.db.jobs_recent()]), HTTPStatus.OK
+
+
+@bp.route("/api/admin/jobs/<int:job_id>", methods=["GET"])
+@moderator_required
+def get_job(job_id):
+    """
+    Ход фонового задания: статус, обработано строк из total, progress (%),
+    rows_per_second, eta_seconds (для выполняющихся), result или error.
+    """
+    job = g.db.job_get(job_id)
+    if job is None:
+        raise NotFoundError(resource_type="Задание", resource_id=job_id)
+    return jsonify(job_report(job)), HTTPStatus.OK
+
+
+# ===========================
+#   Метрики процесса
+# ===========================
+
+@bp.route("/api/admin/metrics", methods=["GET"])
+@admin_required
+def admin_metrics():
+    """
+    Метрики текущего процесса: пулы соединений с БД для чтения и записи
+    (размер, занятость, время ожидания выдачи соединения), очередь
+    уменьшенных копий изображений, журнал удаления файлов, попадания
+    в кэши проверенных токенов и пользователей, пул хэширования паролей,
+    фоновые задания и ограничитель частоты запросов.
+    """
+    pipeline = current_app.extensions.get('image_variants')
+    limiter = current_app.extensions.get('rate_limiter')
+    return jsonify({
+        "db_pool": {
+            "read":  current_app.extensions['db_read_pool'].stats(),
+            "write": current_app.extensions['db_write_pool'].stats()
+        },
+        "image_variants": pipeline.stats() if pipeline is not None else None,
+        "file_deletions": current_app.extensions['file_deletions'].stats(),
+        "password_hasher": current_app.extensions['password_hasher'].stats(),
+        "jobs": current_app.extensions['jobs'].stats(),
+        "rate_limits": limiter.stats() if limiter is not None else None,
+        "auth_cache": {
+            name: cache.stats() if cache is not None else None
+            for name, cache in (
+                ("tokens", current_app.extensions.get('token_cache')),
+                ("users",  current_app.extensions.get('user_cache'))
+            )
+        }
+    }), HTTPStatus.OK
@@ -0,0 +1,127 @@
+"""
+Массовые операции над News на больших таблицах:
+● «мягко удалить всё» (DELETE /api/news);
+● «очистить корзину» (DELETE /api/admin/trash/purge).
+
+Способы:
+● «ID в Python» — прежний путь: выбрать все newsID и передать их одним
+  IN (?, ?, ...) — упирается в предел числа параметров SQLite
+  (SQLITE_MAX_VARIABLE_NUMBER: 32766 в обычной сборке, 250000 в некоторых дистрибутивах);
+● «по условию» — Storage.news_soft_delete_all / purge_trash: UPDATE/DELETE по
+  условию пачками по BULK_BATCH_SIZE строк (каждая — своя транзакция).
+
+Для каждого: время, строк в секунду и пик памяти Python.
+
+Запуск из каталога WebBack:
+    python -m benchmarks.bench_bulk_ops
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db import Storage
+
+SIZES = [10000, 100000, 300000]
+
+
+def seed(db_path, count):
+    db = Storage(db_path)
+    try:
+        db.migrate()
+        db.cursor.execute('''
+            INSERT INTO Users (login, password, nick, user_role)
+            VALUES ('bench', '-', 'bench', 'Administrator')
+        ''')
+        db.cursor.executemany('''
+            INSERT INTO News (publisherID, title, description, status, event_start, create_date)
+            VALUES (1, ?, 'Описание новости для замера', 'Approved', '2025-01-01 10:00:00', '2025-01-01 10:00:00')
+        ''', ((f"Новость {i}",) for i in range(count)))
+        db.connection.commit()
+    finally:
+        db.close_connection()
+
+
+def legacy_soft_delete_all(db):
+    news_ids = [row[0] for row in db.cursor.execute('SELECT newsID FROM News WHERE delete_date IS NULL')]
+    placeholders = ','.join(['?'] * len(news_ids))
+    db.cursor.execute('BEGIN TRANSACTION;')
+    db.cursor.execute(f'''
+        UPDATE News
+        SET delete_date = datetime('now', 'localtime'), archive_date = NULL, publish_date = NULL
+        WHERE newsID IN ({placeholders})
+    ''', news_ids)
+    db.connection.commit()
+    return len(news_ids)
+
+
+def legacy_purge_trash(db):
+    news_ids = [row[0] for row in db.cursor.execute('SELECT newsID FROM News WHERE delete_date IS NOT NULL')]
+    placeholders = ','.join(['?'] * len(news_ids))
+    db.cursor.execute('BEGIN TRANSACTION;')
+    db.cursor.execute(f'DELETE FROM News WHERE newsID IN ({placeholders})', news_ids)
+    db.connection.commit()
+    return len(news_ids)
+
+
+def prepare_trash(db_path):
+    """Перед очисткой корзины все новости должны быть в ней (не зависит от предыдущего замера)."""
+    db = Storage(db_path)
+    try:
+        db.open_connection()
+        db.cursor.execute("UPDATE News SET delete_date = datetime('now', 'localtime') WHERE delete_date IS NULL")
+        db.connection.commit()
+    finally:
+        db.close_connection()
+
+
+def measure(db_path, operation):
+    db = Storage(db_path)
+    try:
+        db.open_connection()
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            count = operation(db)
+            error = None
+        except sqlite3.OperationalError as e:
+            db.connection.rollback()
+            count, error = 0, str(e)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        db.close_connection()
+    return count, elapsed, peak, error
+
+
+def main():
+    print(f"{'Строк':>7} | {'Операция':<14} | {'Способ':<12} | {'Время, с':>8} | "
+          f"{'Строк/с':>8} | {'Пик, МБ':>7}")
+    print("-" * 75)
+    operations = (
+        ("мягкое удаление", legacy_soft_delete_all, lambda db: db.news_soft_delete_all(), None),
+        ("очистка корзины", legacy_purge_trash, lambda db: db.purge_trash(), prepare_trash),
+    )
+    for size in SIZES:
+        for method, index in (("ID в Python", 1), ("по условию", 2)):
+            with tempfile.TemporaryDirectory() as tmp:
+                db_path = os.path.join(tmp, "bench.db")
+                seed(db_path, size)
+                for operation in operations:
+                    if operation[3] is not None:
+                        operation[3](db_path)
+                    count, elapsed, peak, error = measure(db_path, operation[index])
+                    if error:
+                        print(f"{size:>7} | {operation[0]:<14} | {method:<12} | ошибка: {error}")
+                        continue
+                    print(f"{size:>7} | {operation[0]:<14} | {method:<12} | {elapsed:>8.2f} | "
+                          f"{count / elapsed:>8.0f} | {peak / 2 ** 20:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
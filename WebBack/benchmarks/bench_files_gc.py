@@ -0,0 +1,100 @@
+"""
+Скорость сверки UPLOAD_FOLDER с таблицей Files: запрос на каждый файл
+(SELECT ... WHERE guid = ?) против Storage.files_gc — имена пачками во
+временную таблицу и anti-join. 10% файлов на диске — сироты, 1% записей
+Files — без файла. Оба варианта работают в режиме отчёта (ничего не удаляют).
+Кроме времени меряется пик памяти Python (tracemalloc): наивной сверке нужно
+множество всех имён, files_gc держит в памяти только пачку.
+
+Запуск из каталога WebBack (размеры можно передать аргументами):
+    python -m benchmarks.bench_files_gc [100000 ...]
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db import Storage
+from database.filestore import scan_blobs
+
+FILE_COUNTS = [10000, 100000]
+ORPHAN_SHARE = 0.1
+MISSING_SHARE = 0.01
+
+
+def fill(db: Storage, folder: str, count: int):
+    """count файлов на диске; записи Files — для всех, кроме сирот, плюс пропавшие."""
+    orphans = int(count * ORPHAN_SHARE)
+    rows = []
+    for i in range(count):
+        guid = hashlib.sha256(str(i).encode()).hexdigest()
+        open(os.path.join(folder, guid), 'wb').close()
+        if i >= orphans:
+            rows.append((guid, guid))
+    for i in range(int(count * MISSING_SHARE)):
+        guid = hashlib.sha256(f"missing-{i}".encode()).hexdigest()
+        rows.append((guid, guid))
+    db.cursor.executemany(
+        "INSERT INTO Files (guid, format, content_hash, size) VALUES (?, 'jpg', ?, 0)", rows
+    )
+    db.connection.commit()
+    return orphans
+
+
+def per_file_queries(db: Storage, folder: str) -> dict:
+    """Наивная сверка: запрос на каждый файл и множество всех guid в памяти."""
+    orphans = 0
+    seen = set()
+    for name, _, _ in scan_blobs(folder):
+        seen.add(name)
+        db.cursor.execute('SELECT 1 FROM Files WHERE guid = ?', (name,))
+        if db.cursor.fetchone() is None:
+            orphans += 1
+    db.cursor.execute('SELECT guid FROM Files')
+    missing = sum(1 for row in db.cursor if row[0] not in seen)
+    return {"orphans": orphans, "missing": missing}
+
+
+def measure(func, *args, **kwargs):
+    """(результат, секунды, пик памяти в байтах)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or FILE_COUNTS
+    print(f"{'Файлов':>9} | {'Запрос на файл':>22} | {'Врем. таблица':>22} | {'Файлов/с':>10} | "
+          f"{'Сирот':>7} | {'Пропавших':>9}")
+    print("-" * 96)
+    for count in counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = os.path.join(tmp, "uploads")
+            os.makedirs(folder)
+            db = Storage(db_path=os.path.join(tmp, "bench.db"))
+            db.migrate()
+            db.open_connection()
+            expected_orphans = fill(db, folder, count)
+
+            naive, naive_time, naive_peak = measure(per_file_queries, db, folder)
+            # min_age < 0: только что созданные файлы тоже проверяются
+            report, gc_time, gc_peak = measure(db.files_gc, folder, dry_run=True, min_age=-60)
+            db.close_connection()
+
+            assert naive["orphans"] == report["orphans"] == expected_orphans
+            assert naive["missing"] == report["missing"]
+            print(f"{count:>9} | {naive_time:>6.2f} с, {naive_peak / 2**20:>7.1f} МБ | "
+                  f"{gc_time:>6.2f} с, {gc_peak / 2**20:>7.1f} МБ | "
+                  f"{count / gc_time:>10.0f} | {report['orphans']:>7} | {report['missing']:>9}")
+
+
+if __name__ == "__main__":
+    main()
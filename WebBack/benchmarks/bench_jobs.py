@@ -0,0 +1,163 @@
+"""
+Очистка большой корзины и её влияние на остальные изменяющие запросы
+(POST /api/categories), которые в это время идут через приложение.
+
+Режимы:
+● «в запросе» — прежний путь: один DELETE по всей корзине одной транзакцией,
+  запрос ждёт его окончания и всё это время держит блокировку записи;
+● «фоновое задание» — DELETE /api/admin/trash/purge ставит задание (app/jobs.py),
+  которое удаляет пачками по JOBS_BATCH_SIZE с паузой JOBS_BATCH_PAUSE между ними.
+
+Для каждого: время ответа на запрос очистки, время до полного удаления и
+p50/p99/максимум задержки параллельных записей.
+
+Запуск из каталога WebBack:
+    python -m benchmarks.bench_jobs
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from app import create_app
+from database.db import Storage
+
+ROWS = 200000
+WRITE_THREADS = 2
+
+
+def make_config(tmp, workers):
+    class BenchConfig:
+        pass
+    for key in dir(config):
+        if key.isupper():
+            setattr(BenchConfig, key, getattr(config, key))
+    BenchConfig.DATABASE_PATH = os.path.join(tmp, "bench.db")
+    BenchConfig.UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+    BenchConfig.IMAGE_VARIANT_WIDTHS = []
+    BenchConfig.MAINTENANCE_ENABLED = False
+    BenchConfig.FILE_DELETION_WORKERS = 0
+    BenchConfig.RATE_LIMIT_ENABLED = False
+    BenchConfig.DB_WRITE_POOL_TIMEOUT = 600
+    BenchConfig.JOBS_WORKERS = workers
+    return BenchConfig
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def seed_trash(db_path, count):
+    db = Storage(db_path)
+    try:
+        db.open_connection()
+        db.cursor.executemany('''
+            INSERT INTO News (publisherID, title, description, status, event_start, create_date, delete_date)
+            VALUES (1, ?, 'Описание', 'Approved', '2025-01-01 10:00:00', '2025-01-01 10:00:00', '2025-02-01 10:00:00')
+        ''', ((f"Новость {i}",) for i in range(count)))
+        db.connection.commit()
+    finally:
+        db.close_connection()
+
+
+def trash_size(db_path):
+    db = Storage(db_path)
+    try:
+        db.open_connection()
+        return db.bulk_count('purge_trash')
+    finally:
+        db.close_connection()
+
+
+def purge_inline(db_path):
+    """Прежний путь: вся корзина одной транзакцией."""
+    db = Storage(db_path)
+    try:
+        db.open_connection()
+        db.cursor.execute('BEGIN IMMEDIATE;')
+        db.cursor.execute('DELETE FROM News WHERE delete_date IS NOT NULL')
+        db.connection.commit()
+    finally:
+        db.close_connection()
+
+
+def writer(client, headers, stop, latencies, errors):
+    counter = 0
+    while not stop.is_set():
+        counter += 1
+        start = time.perf_counter()
+        response = client.post('/api/categories', headers=headers,
+                               json={'name': f'Категория {threading.get_ident()} {counter}'})
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+        time.sleep(0.01)
+
+
+def run_mode(title, background):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(make_config(tmp, workers=1 if background else 0))
+        client = app.test_client()
+        client.post('/api/auth/register', json={'login': 'bench', 'password': 'secret1', 'nickname': 'bench'})
+        db_path = app.config['DATABASE_PATH']
+        db = Storage(db_path)
+        try:
+            db.open_connection()
+            db.cursor.execute("UPDATE Users SET user_role = 'Administrator'")
+            db.connection.commit()
+        finally:
+            db.close_connection()
+        token = client.post('/api/auth/login', json={'login': 'bench', 'password': 'secret1'}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        seed_trash(db_path, ROWS)
+
+        stop = threading.Event()
+        latencies, errors = [], []
+        threads = [
+            threading.Thread(target=writer, args=(app.test_client(), headers, stop, latencies, errors))
+            for _ in range(WRITE_THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        latencies.clear()
+
+        start = time.perf_counter()
+        if background:
+            assert client.delete('/api/admin/trash/purge', headers=headers).status_code == 202
+            response_time = time.perf_counter() - start
+            while trash_size(db_path):
+                time.sleep(0.05)
+        else:
+            purge_inline(db_path)
+            response_time = time.perf_counter() - start
+        total_time = time.perf_counter() - start
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+        app.extensions['jobs'].shutdown()
+
+        print(f"{title:<17} | {response_time:>9.3f} | {total_time:>9.2f} | {len(latencies):>7} | "
+              f"{statistics.median(latencies) * 1000:>7.1f} | {percentile(latencies, 0.99) * 1000:>7.0f} | "
+              f"{max(latencies) * 1000:>8.0f} | {len(errors):>6}")
+
+
+def main():
+    print(f"Строк в корзине: {ROWS}, потоков записи: {WRITE_THREADS}, "
+          f"пачка: {config.JOBS_BATCH_SIZE}, пауза: {config.JOBS_BATCH_PAUSE * 1000:.0f} мс")
+    print(f"{'Режим':<17} | {'Ответ, с':>9} | {'Всего, с':>9} | {'Записей':>7} | "
+          f"{'p50, мс':>7} | {'p99, мс':>7} | {'макс, мс':>8} | {'Ошибок':>6}")
+    print("-" * 92)
+    run_mode("в запросе", background=False)
+    run_mode("фоновое задание", background=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Бенчмарк памяти при отдаче больших списков новостей:
+пиковое выделение (tracemalloc) и время для jsonify(списка) и потоковой
+отдачи json_list_response(Storage.iter_news_feed()).
+
+Тело ответа читается по частям и отбрасывается, как это делает WSGI-сервер,
+поэтому в пик попадает только то, что держит в памяти само приложение.
+
+Запуск из каталога WebBack:
+    python -m benchmarks.bench_json_memory
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask, g, jsonify
+
+from app.routes import json_list_response
+from database.db import Storage
+
+ROW_COUNTS = [1000, 5000, 15000]
+DESCRIPTION_LENGTH = 500
+FILES_PER_NEWS = 2
+
+
+def fill_database(db: Storage, rows: int):
+    db.cursor.execute('''
+        INSERT INTO Users (login, password, nick, user_role)
+        VALUES ('bench', 'x', 'bench', 'Publisher')
+    ''')
+    publisher_id = db.cursor.lastrowid
+    db.cursor.executemany('''
+        INSERT INTO News (publisherID, title, description, status, event_start,
+                          create_date, publish_date)
+        VALUES (?, ?, ?, 'Approved', '2025-01-01 10:00:00',
+                datetime('now', 'localtime'), datetime('now', 'localtime'))
+    ''', [(publisher_id, f"Новость {i}", "я" * DESCRIPTION_LENGTH) for i in range(rows)])
+    db.cursor.execute('SELECT newsID FROM News')
+    news_ids = [row[0] for row in db.cursor.fetchall()]
+    for news_id in news_ids:
+        for i in range(FILES_PER_NEWS):
+            db.cursor.execute(
+                "INSERT INTO Files (guid, format) VALUES (?, 'jpg')",
+                (f"{news_id}-{i}",)
+            )
+            db.cursor.execute(
+                "INSERT INTO File_Link (fileID, newsID) VALUES (?, ?)",
+                (db.cursor.lastrowid, news_id)
+            )
+    db.connection.commit()
+
+
+def buffered_response():
+    """Прежний путь: весь список, затем вся строка JSON."""
+    news_list, _ = g.db.get_news_feed()
+    return jsonify(news_list)
+
+
+def streamed_response():
+    return json_list_response(g.db.iter_news_feed())
+
+
+def measure(app: Flask, db: Storage, view):
+    """Пик памяти и время от вызова view до отдачи последнего байта."""
+    with app.test_request_context('/api/news'):
+        app.preprocess_request()
+        g.db = db
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = view()
+        size = 0
+        for chunk in response.response:
+            size += len(chunk)
+        response.close()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return size, peak, elapsed
+
+
+def main():
+    app = Flask(__name__)
+    # Тот же адрес, что у news_line, чтобы json_list_response выбрал потоковый режим
+    app.add_url_rule('/api/news', endpoint='main.news_line')
+    app.config['STREAM_JSON_ENDPOINTS'] = {'main.news_line'}
+
+    print(f"{'Строк':>8} | {'Ответ':>9} | {'Пик (jsonify)':>14} | {'Пик (поток)':>12} | "
+          f"{'Время (jsonify)':>15} | {'Время (поток)':>13}")
+    print("-" * 90)
+    for rows in ROW_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Storage(db_path=os.path.join(tmp, "bench.db"))
+            db.migrate()
+            fill_database(db, rows)
+
+            size, buffered_peak, buffered_time = measure(app, db, buffered_response)
+            streamed_size, streamed_peak, streamed_time = measure(app, db, streamed_response)
+            assert size == streamed_size, "Размер ответа изменился"
+
+            print(f"{rows:>8} | {size / 2**20:>6.1f} МБ | {buffered_peak / 2**20:>11.1f} МБ | "
+                  f"{streamed_peak / 2**20:>9.1f} МБ | {buffered_time * 1000:>12.1f} мс | "
+                  f"{streamed_time * 1000:>10.1f} мс")
+            db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Всплеск входов (POST /api/auth/login) и его влияние на остальные изменяющие
+запросы (POST /api/categories), которые идут через то же единственное пишущее
+соединение с БД.
+
+Режимы:
+● «в потоке запроса» — прежний путь: пароль проверяется в потоке запроса,
+  пока запрос держит пишущее соединение;
+● «пул процессов» — app/passwords.py: проверка в пуле процессов,
+  соединение на это время возвращается в пул (Storage.released).
+
+Для каждого режима: входов в секунду, p50/p99 входа и p50/p99 записи.
+
+Запуск из каталога WebBack:
+    python -m benchmarks.bench_login
+"""
+import contextlib
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from app import create_app
+from database.db import Storage
+
+LOGIN_THREADS = 16
+WRITE_THREADS = 2
+DURATION = 5.0
+
+
+def make_config(tmp, workers):
+    class BenchConfig:
+        pass
+    for key in dir(config):
+        if key.isupper():
+            setattr(BenchConfig, key, getattr(config, key))
+    BenchConfig.DATABASE_PATH = os.path.join(tmp, "bench.db")
+    BenchConfig.UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+    BenchConfig.IMAGE_VARIANT_WIDTHS = []
+    BenchConfig.MAINTENANCE_ENABLED = False
+    BenchConfig.FILE_DELETION_WORKERS = 0
+    BenchConfig.RATE_LIMIT_ENABLED = False
+    BenchConfig.PASSWORD_HASH_WORKERS = workers
+    BenchConfig.PASSWORD_HASH_MAX_PENDING = LOGIN_THREADS
+    BenchConfig.PASSWORD_HASH_QUEUE_TIMEOUT = 60
+    BenchConfig.DB_WRITE_POOL_TIMEOUT = 60
+    return BenchConfig
+
+
+def percentile(values, share):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def worker(client, request, stop, latencies, errors):
+    while not stop.is_set():
+        start = time.perf_counter()
+        status = request(client)
+        elapsed = time.perf_counter() - start
+        if status >= 400:
+            errors.append(status)
+        latencies.append(elapsed)
+
+
+def run_mode(title, workers, inline):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(make_config(tmp, workers))
+        client = app.test_client()
+        client.post('/api/auth/register', json={'login': 'bench', 'password': 'secret1', 'nickname': 'bench'})
+        db = Storage(app.config['DATABASE_PATH'])
+        try:
+            db.open_connection()
+            db.cursor.execute("UPDATE Users SET user_role = 'Administrator'")
+            db.connection.commit()
+        finally:
+            db.close_connection()
+        token = client.post('/api/auth/login', json={'login': 'bench', 'password': 'secret1'}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        counter = iter(range(10 ** 9))
+
+        def login(c):
+            return c.post('/api/auth/login', json={'login': 'bench', 'password': 'secret1'}).status_code
+
+        def write(c):
+            return c.post('/api/categories', json={'name': f'Категория {next(counter)}'},
+                          headers=headers).status_code
+
+        original_released = Storage.released
+        if inline:
+            # Прежний путь: соединение остаётся занятым на время проверки пароля
+            Storage.released = lambda self: contextlib.nullcontext()
+        stop = threading.Event()
+        login_latencies, write_latencies, errors = [], [], []
+        threads = [
+            threading.Thread(target=worker, args=(app.test_client(), login, stop, login_latencies, errors))
+            for _ in range(LOGIN_THREADS)
+        ] + [
+            threading.Thread(target=worker, args=(app.test_client(), write, stop, write_latencies, errors))
+            for _ in range(WRITE_THREADS)
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            time.sleep(DURATION)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            Storage.released = original_released
+            app.extensions['password_hasher'].shutdown()
+
+        print(f"{title:<22} | {len(login_latencies) / DURATION:>9.1f} | "
+              f"{statistics.median(login_latencies) * 1000:>7.0f} | {percentile(login_latencies, 0.99) * 1000:>7.0f} | "
+              f"{len(write_latencies) / DURATION:>9.1f} | "
+              f"{statistics.median(write_latencies) * 1000:>7.0f} | {percentile(write_latencies, 0.99) * 1000:>7.0f} | "
+              f"{len(errors):>6}")
+
+
+def main():
+    print(f"Потоков входа: {LOGIN_THREADS}, потоков записи: {WRITE_THREADS}, "
+          f"{DURATION:.0f} с на режим, CPU: {os.cpu_count()}, метод: {config.PASSWORD_HASH_METHOD}")
+    print(f"{'Режим':<22} | {'Входов/с':>9} | {'p50, мс':>7} | {'p99, мс':>7} | "
+          f"{'Записей/с':>9} | {'p50, мс':>7} | {'p99, мс':>7} | {'Ошибок':>6}")
+    print("-" * 98)
+    run_mode("в потоке запроса", 0, inline=True)
+    run_mode("пул процессов", max(2, os.cpu_count() or 2), inline=False)
+
+
+if __name__ == "__main__":
+    main()
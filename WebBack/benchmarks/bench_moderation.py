@@ -0,0 +1,97 @@
+"""
+Разбор очереди модерации: N новостей в статусе Pending одобряются
+● по одной — POST /api/admin/moderate-news/<id> на каждую (свой запрос, своя транзакция);
+● пакетом — один POST /api/admin/moderate-news/batch (одна транзакция).
+
+Для каждого способа: время и новостей в секунду (фиксаций: N против одной).
+
+Запуск из каталога WebBack:
+    python -m benchmarks.bench_moderation
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from app import create_app
+from database.db import Storage
+
+SIZES = [100, 500, 1000]
+
+
+def make_config(tmp):
+    class BenchConfig:
+        pass
+    for key in dir(config):
+        if key.isupper():
+            setattr(BenchConfig, key, getattr(config, key))
+    BenchConfig.DATABASE_PATH = os.path.join(tmp, "bench.db")
+    BenchConfig.UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+    BenchConfig.IMAGE_VARIANT_WIDTHS = []
+    BenchConfig.MAINTENANCE_ENABLED = False
+    BenchConfig.FILE_DELETION_WORKERS = 0
+    BenchConfig.RATE_LIMIT_ENABLED = False
+    return BenchConfig
+
+
+def seed_pending(db_path, count):
+    db = Storage(db_path)
+    try:
+        db.open_connection()
+        db.cursor.executemany('''
+            INSERT INTO News (publisherID, title, description, status, event_start, create_date)
+            VALUES (1, ?, 'Описание', 'Pending', '2025-01-01 10:00:00', datetime('now', 'localtime'))
+        ''', [(f"Новость {i}",) for i in range(count)])
+        db.connection.commit()
+        db.cursor.execute("SELECT newsID FROM News WHERE status = 'Pending' ORDER BY newsID")
+        return [row[0] for row in db.cursor.fetchall()]
+    finally:
+        db.close_connection()
+
+
+def run(size, batch):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(make_config(tmp))
+        client = app.test_client()
+        client.post('/api/auth/register', json={'login': 'bench', 'password': 'secret1', 'nickname': 'bench'})
+        db_path = app.config['DATABASE_PATH']
+        db = Storage(db_path)
+        try:
+            db.open_connection()
+            db.cursor.execute("UPDATE Users SET user_role = 'Administrator'")
+            db.connection.commit()
+        finally:
+            db.close_connection()
+        token = client.post('/api/auth/login', json={'login': 'bench', 'password': 'secret1'}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        news_ids = seed_pending(db_path, size)
+
+        start = time.perf_counter()
+        if batch:
+            response = client.post('/api/admin/moderate-news/batch', headers=headers, json={
+                "items": [{"newsID": news_id, "action": "approve"} for news_id in news_ids]
+            })
+            assert response.status_code == 200 and response.get_json()['applied'] == size
+        else:
+            for news_id in news_ids:
+                response = client.post(f'/api/admin/moderate-news/{news_id}', headers=headers,
+                                       json={"action": "approve"})
+                assert response.status_code == 200
+        elapsed = time.perf_counter() - start
+    return elapsed
+
+
+def main():
+    print(f"{'Новостей':>8} | {'Способ':<10} | {'Время, с':>9} | {'Новостей/с':>10}")
+    print("-" * 47)
+    for size in SIZES:
+        for title, batch in (("по одной", False), ("пакетом", True)):
+            elapsed = run(size, batch)
+            print(f"{size:>8} | {title:<10} | {elapsed:>9.3f} | {size / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Бенчмарк выборки списков новостей: число SQL-запросов и время
+для старого пути (запрос файлов на каждую строку) и общего пути Storage._fetch_news.
+
+Запуск из каталога WebBack:
+    python -m benchmarks.bench_news_listing
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.db import Storage
+
+ROW_COUNTS = [100, 1000, 5000, 15000]
+FILES_PER_NEWS = 2
+
+
+def fill_database(db: Storage, rows: int):
+    db.cursor.execute('''
+        INSERT INTO Users (login, password, nick, user_role)
+        VALUES ('bench', 'x', 'bench', 'Publisher')
+    ''')
+    publisher_id = db.cursor.lastrowid
+    db.cursor.executemany('''
+        INSERT INTO News (publisherID, title, description, status, event_start, create_date)
+        VALUES (?, ?, ?, 'Approved', '2025-01-01 10:00:00', datetime('now', 'localtime'))
+    ''', [(publisher_id, f"Новость {i}", "x" * 500) for i in range(rows)])
+    db.cursor.execute('SELECT newsID FROM News')
+    news_ids = [row[0] for row in db.cursor.fetchall()]
+    for news_id in news_ids:
+        for i in range(FILES_PER_NEWS):
+            db.cursor.execute(
+                "INSERT INTO Files (guid, format) VALUES (?, 'jpg')",
+                (f"{news_id}-{i}",)
+            )
+            db.cursor.execute(
+                "INSERT INTO File_Link (fileID, newsID) VALUES (?, ?)",
+                (db.cursor.lastrowid, news_id)
+            )
+    db.connection.commit()
+
+
+def legacy_get_news(db: Storage) -> list:
+    """Прежняя реализация get_news: отдельный запрос файлов на каждую новость."""
+    db.cursor.execute('''
+        SELECT n.newsID, n.title, n.description, n.status, n.create_date,
+               n.publish_date, n.event_start, n.event_end,
+               up.nick AS publisher_nick, um.nick AS moderator_nick,
+               c.name AS category_name, n.archive_date
+        FROM News n
+        JOIN Users up ON up.userID = n.publisherID
+        LEFT JOIN Users um ON um.userID = n.moderated_byID
+        LEFT JOIN Categories c ON c.categoryID = n.categoryID
+        WHERE n.delete_date IS NULL
+        ORDER BY n.create_date DESC
+    ''')
+    news_items = []
+    for row in db.cursor.fetchall():
+        db.cursor.execute('''
+            SELECT f.fileID, guid, format
+            FROM Files f
+            JOIN File_Link fl ON fl.fileID = f.fileID
+            WHERE fl.newsID = ?
+            ORDER BY f.fileID ASC
+        ''', (row['newsID'],))
+        files = [{
+            'fileID':    r['fileID'],
+            'fileName':  r['guid'],
+            'fileFormat':r['format']
+        } for r in db.cursor.fetchall()]
+        news_items.append({**dict(row), 'files': files})
+    return news_items
+
+
+def measure(db: Storage, func):
+    statements = []
+    db.connection.set_trace_callback(statements.append)
+    start = time.perf_counter()
+    result = func(db)
+    elapsed = time.perf_counter() - start
+    db.connection.set_trace_callback(None)
+    return result, len(statements), elapsed
+
+
+def main():
+    print(f"{'Строк':>8} | {'Запросов (было)':>16} | {'Запросов (стало)':>16} | "
+          f"{'Время (было)':>12} | {'Время (стало)':>13}")
+    print("-" * 80)
+    for rows in ROW_COUNTS:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Storage(db_path=os.path.join(tmp, "bench.db"))
+            db.migrate()
+            fill_database(db, rows)
+
+            legacy, legacy_queries, legacy_time = measure(db, legacy_get_news)
+            current, current_queries, current_time = measure(db, Storage.get_news)
+            # variants (ширины уменьшенных копий) появились позже — в сравнении не участвуют
+            for item in current:
+                for f in item['files']:
+                    f.pop('variants')
+            assert legacy == current, "Формат ответа изменился"
+
+            print(f"{rows:>8} | {legacy_queries:>16} | {current_queries:>16} | "
+                  f"{legacy_time * 1000:>9.1f} мс | {current_time * 1000:>10.1f} мс")
+            db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Накладные расходы ограничителя частоты запросов (app/ratelimit.py).
+
+1) Сама проверка бакета (take) для MemoryBackend и SQLiteBackend:
+   проверок в секунду и p99 на 10 000 разных ключей.
+2) Полный запрос GET /api/ping через приложение: без ограничителя и с правилом
+   на этот эндпоинт (бакет не переполняется) для каждого хранилища.
+
+Запуск из каталога WebBack:
+    python -m benchmarks.bench_ratelimit
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from app import create_app
+from app.ratelimit import MemoryBackend, SQLiteBackend
+
+CHECKS = 50000
+KEYS = 10000
+REQUESTS = 5000
+# Правило, которое при замере никогда не срабатывает
+PING_RULES = {"main.ping": [{"per": "ip", "rate": "1000000/second", "burst": 1000000}]}
+
+
+def make_config(tmp, backend):
+    class BenchConfig:
+        pass
+    for key in dir(config):
+        if key.isupper():
+            setattr(BenchConfig, key, getattr(config, key))
+    BenchConfig.DATABASE_PATH = os.path.join(tmp, "bench.db")
+    BenchConfig.UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+    BenchConfig.IMAGE_VARIANT_WIDTHS = []
+    BenchConfig.MAINTENANCE_ENABLED = False
+    BenchConfig.FILE_DELETION_WORKERS = 0
+    BenchConfig.RATE_LIMIT_ENABLED = backend is not None
+    BenchConfig.RATE_LIMIT_BACKEND = backend or 'memory'
+    BenchConfig.RATE_LIMITS = PING_RULES
+    return BenchConfig
+
+
+def bench_backend(backend):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(CHECKS):
+        begin = time.perf_counter()
+        backend.take(f"bench:{i % KEYS}", 100.0, 100.0)
+        latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return CHECKS / elapsed, latencies[int(len(latencies) * 0.99)]
+
+
+def bench_requests(backend):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(make_config(tmp, backend))
+        client = app.test_client()
+        for _ in range(200):
+            client.get('/api/ping')
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            assert client.get('/api/ping').status_code == 200
+        elapsed = time.perf_counter() - start
+    return elapsed / REQUESTS
+
+
+def main():
+    print(f"Проверка бакета ({CHECKS} проверок, {KEYS} ключей)")
+    print(f"{'Хранилище':<14} | {'Проверок/с':>11} | {'p99, мкс':>9}")
+    print("-" * 40)
+    with tempfile.TemporaryDirectory() as tmp:
+        for title, backend in (("memory", MemoryBackend()),
+                               ("sqlite", SQLiteBackend(os.path.join(tmp, "ratelimit.db")))):
+            rate, p99 = bench_backend(backend)
+            print(f"{title:<14} | {rate:>11.0f} | {p99 * 1e6:>9.1f}")
+
+    print()
+    print(f"GET /api/ping через приложение ({REQUESTS} запросов)")
+    print(f"{'Ограничитель':<14} | {'мкс/запрос':>11} | {'Накладные':>10}")
+    print("-" * 42)
+    baseline = bench_requests(None)
+    print(f"{'выключен':<14} | {baseline * 1e6:>11.0f} | {'—':>10}")
+    for backend in ('memory', 'sqlite'):
+        per_request = bench_requests(backend)
+        print(f"{backend:<14} | {per_request * 1e6:>11.0f} | {(per_request - baseline) * 1e6:>7.0f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Накладные расходы на запрос: GET /api/ping в текущем виде
+и с прежним прогоном DDL схемы на каждый запрос.
+
+Запуск из каталога WebBack:
+    python -m benchmarks.bench_request_overhead
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from app import create_app
+from database import migrations
+from database.db import Storage
+
+REQUESTS = 2000
+
+
+def make_config(tmp):
+    class BenchConfig:
+        pass
+    for key in dir(config):
+        if key.isupper():
+            setattr(BenchConfig, key, getattr(config, key))
+    BenchConfig.DATABASE_PATH = os.path.join(tmp, "bench.db")
+    BenchConfig.UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+    return BenchConfig
+
+
+def run(client, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = client.get("/api/ping")
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    return timings
+
+
+def report(title, timings):
+    timings = sorted(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"{title:30} среднее {statistics.mean(timings) * 1e6:8.0f} мкс | "
+          f"медиана {statistics.median(timings) * 1e6:8.0f} мкс | p99 {p99 * 1e6:8.0f} мкс")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(make_config(tmp))
+        client = app.test_client()
+        run(client, 100)  # прогрев
+        report("Текущий путь", run(client, REQUESTS))
+
+        # Прежнее поведение: DDL схемы и commit на каждое открытие соединения
+        original_open = Storage.open_connection
+
+        def open_with_ddl(self):
+            original_open(self)
+            migrations._migration_baseline(self.cursor)
+            self.connection.commit()
+
+        Storage.open_connection = open_with_ddl
+        try:
+            run(client, 100)
+            report("+ DDL схемы на каждый запрос", run(client, REQUESTS))
+        finally:
+            Storage.open_connection = original_open
+
+
+if __name__ == "__main__":
+    main()
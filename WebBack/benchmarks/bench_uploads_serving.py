@@ -0,0 +1,92 @@
+"""
+Пропускная способность GET /uploads/<guid> в рабочем процессе Python:
+отдача байтов самим приложением (send_from_directory) против X-Accel-Redirect,
+когда приложение формирует только заголовки, а байты отдаёт nginx.
+Дополнительно — повторный запрос с If-None-Match (304) и Range (206).
+
+Запуск из каталога WebBack:
+    python -m benchmarks.bench_uploads_serving
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from app import create_app
+from database.db import Storage
+
+FILE_SIZES = [100 * 1024, 1024 * 1024, 5 * 1024 * 1024]
+REQUESTS = 300
+
+
+def make_config(tmp):
+    class BenchConfig:
+        pass
+    for key in dir(config):
+        if key.isupper():
+            setattr(BenchConfig, key, getattr(config, key))
+    BenchConfig.DATABASE_PATH = os.path.join(tmp, "bench.db")
+    BenchConfig.UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+    BenchConfig.IMAGE_VARIANT_WIDTHS = []
+    return BenchConfig
+
+
+def add_file(app, size: int) -> str:
+    guid = f"{size:064x}"
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], guid), 'wb') as f:
+        f.write(os.urandom(size))
+    db = Storage(app.config['DATABASE_PATH'])
+    try:
+        db.open_connection()
+        db.cursor.execute('''
+            INSERT INTO Files (guid, format, content_hash, size, variants_date)
+            VALUES (?, 'jpg', ?, ?, datetime('now'))
+        ''', (guid, guid, size))
+        db.connection.commit()
+    finally:
+        db.close_connection()
+    return guid
+
+
+def run(client, url, headers=None, expected=200):
+    """Запросов в секунду и байт тела, прочитанных из приложения."""
+    transferred = 0
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        response = client.get(url, headers=headers or {})
+        assert response.status_code == expected, response.status_code
+        transferred += len(response.data)
+    elapsed = time.perf_counter() - start
+    return REQUESTS / elapsed, transferred / REQUESTS
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(make_config(tmp))
+        client = app.test_client()
+
+        print(f"{'Файл':>8} | {'Режим':<22} | {'Запросов/с':>10} | {'Тело из Python':>14}")
+        print("-" * 64)
+        for size in FILE_SIZES:
+            url = f"/uploads/{add_file(app, size)}"
+            etag = client.get(url).headers['ETag']
+
+            cases = [
+                ("Python (200)", None, {}, 200),
+                ("Python, Range (206)", None, {'Range': 'bytes=0-65535'}, 206),
+                ("Python, If-None-Match", None, {'If-None-Match': etag}, 304),
+                ("X-Accel-Redirect", '/_uploads/', {}, 200),
+            ]
+            for title, prefix, headers, expected in cases:
+                app.config['UPLOADS_ACCEL_REDIRECT_PREFIX'] = prefix
+                run(client, url, headers, expected)  # прогрев
+                rps, body = run(client, url, headers, expected)
+                print(f"{size // 1024:>5} КБ | {title:<22} | {rps:>10.0f} | {body / 1024:>11.0f} КБ")
+            print("-" * 64)
+
+
+if __name__ == "__main__":
+    main()
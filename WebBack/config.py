@@ -8,6 +8,22 @@ DATABASE_PATH = os.path.join(BASE_DIR, "database", "storage.db")
 # Папка для загрузок
 UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 
+# Отдача /uploads: имена файлов неизменны, поэтому кэш бессрочный (immutable)
+UPLOADS_CACHE_MAX_AGE = 31536000
+# Внутренний location nginx, отображённый на UPLOAD_FOLDER (например, '/_uploads/'):
+# при заданном префиксе байты файлов отдаёт nginx по X-Accel-Redirect.
+# Для Apache/lighttpd вместо него можно включить USE_X_SENDFILE = True.
+UPLOADS_ACCEL_REDIRECT_PREFIX = os.getenv('UPLOADS_ACCEL_REDIRECT_PREFIX')
+USE_X_SENDFILE = False
+
+# Незавершённые загрузки в UPLOAD_FOLDER/.staging старше этого срока (с)
+# удаляются при старте приложения и командой `flask --app main staging-sweep`
+UPLOAD_STAGING_MAX_AGE = 3600
+
+# Сверка UPLOAD_FOLDER с таблицей Files (`flask --app main files-gc`,
+# POST /api/admin/files/gc): файлы моложе этого срока (с) сиротами не считаются
+FILES_GC_MIN_AGE = 3600
+
 # Разрешённые домены для CORS
 CORS_ORIGINS = [
     "http://localhost:3000",
@@ -19,3 +35,120 @@ CORS_ORIGINS = [
 JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'your-secret-key-here')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_DELTA = timedelta(hours=24)
+
+# Кэш проверенных токенов (запись живёт не дольше exp токена) и строк пользователей
+# по логину: число записей на процесс (0 — без кэша) и срок жизни записи (с).
+# Изменения пользователя в другом рабочем процессе видны не позже USER_CACHE_TTL.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 300
+USER_CACHE_SIZE = 1000
+USER_CACHE_TTL = 60
+
+# Хэширование паролей (app/passwords.py): метод werkzeug с параметрами
+# (смена метода — пароли перехэшируются при следующем входе), процессов в пуле
+# (0 — в потоке запроса), одновременно принятых задач и сколько ждать места (с) до 503
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+PASSWORD_HASH_MAX_PENDING = 32
+PASSWORD_HASH_QUEUE_TIMEOUT = 5
+
+# Ограничение частоты запросов (app/ratelimit.py): правила по эндпоинтам,
+# хранилище бакетов: 'memory' (свои в каждом процессе) или 'sqlite' (общие, файл RATE_LIMIT_DB_PATH,
+# по умолчанию ratelimit.db рядом с DATABASE_PATH)
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH')
+RATE_LIMITS = {
+    "main.login":       [{"per": "ip", "rate": "10/minute", "burst": 10, "methods": ["POST"]}],
+    "main.register":    [{"per": "ip", "rate": "10/hour", "burst": 5}],
+    "main.news_line":   [{"per": "user", "rate": "30/minute", "burst": 10, "methods": ["POST"]},
+                         {"per": "ip", "rate": "60/minute", "burst": 20, "methods": ["POST"]}],
+    "main.single_news": [{"per": "user", "rate": "30/minute", "burst": 10, "methods": ["PUT"]}],
+    "main.news_bulk":   [{"per": "user", "rate": "10/minute", "burst": 3}],
+}
+
+# Публичная лента новостей: размер страницы по умолчанию и максимальный
+NEWS_FEED_DEFAULT_LIMIT = 20
+NEWS_FEED_MAX_LIMIT = 100
+
+# Уменьшенные WebP-копии изображений (/uploads/<guid>?w=<ширина>), строятся
+# в фоне пулом процессов; пустой список отключает конвейер. Нужен Pillow.
+IMAGE_VARIANT_WIDTHS = [320, 800, 1600]
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+# Фоновое обслуживание (app/maintenance.py): интервалы задач в секундах (0 — не запускать),
+# такт планировщика и срок аренды ведущего процесса (с)
+MAINTENANCE_ENABLED = os.getenv('MAINTENANCE_ENABLED', '1') == '1'
+MAINTENANCE_TICK = 60
+MAINTENANCE_LEASE_TTL = 180
+MAINTENANCE_INTERVALS = {
+    "purge_expired":  3600,
+    "wal_checkpoint": 600,
+    "optimize":       86400,
+    "staging_sweep":  3600,
+}
+# Корзина: срок хранения (дни) и пачки окончательного удаления за один запуск
+TRASH_RETENTION_DAYS = 30
+TRASH_PURGE_BATCH_SIZE = 500
+TRASH_PURGE_MAX_BATCHES = 20
+# Сколько строк на индекс читает ANALYZE при обновлении статистики
+DB_ANALYSIS_LIMIT = 1000
+
+# Фоновое удаление файлов по журналу File_Deletions (app/file_deletions.py):
+# потоков удаления (0 — только командой file-deletions-drain), записей за пачку,
+# попыток до отказа, базовая задержка повтора (с), опрос журнала без уведомлений (с)
+FILE_DELETION_WORKERS = int(os.getenv('FILE_DELETION_WORKERS', 4))
+FILE_DELETION_BATCH_SIZE = 100
+FILE_DELETION_MAX_ATTEMPTS = 8
+FILE_DELETION_RETRY_DELAY = 30
+FILE_DELETION_POLL_INTERVAL = 60
+
+# Пакетный импорт новостей (/api/news/bulk): максимум новостей в запросе
+# и размер пачки, вставляемой одной транзакцией
+NEWS_BULK_MAX_ITEMS = 5000
+NEWS_BULK_CHUNK_SIZE = 200
+
+# Фоновые задания (app/jobs.py) для удаления всех новостей, очистки корзины и удаления
+# всех пользователей: потоков-обработчиков в процессе (0 — только командой jobs-run),
+# строк в одной транзакции, пауза между пачками для других писателей (с),
+# опрос очереди без уведомлений (с), аренда задания обработчиком (с)
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 1))
+JOBS_BATCH_SIZE = 2000
+JOBS_BATCH_PAUSE = 0.05
+JOBS_POLL_INTERVAL = 5
+JOBS_LEASE = 120
+
+# Пакетная модерация (/api/admin/moderate-news/batch): максимум новостей в запросе
+# и сколько новостей меняет один UPDATE (вся пачка — одна транзакция)
+MODERATION_BATCH_MAX_ITEMS = 1000
+MODERATION_BATCH_CHUNK_SIZE = 500
+
+# Эндпоинты, отдающие большие списки потоковым JSON (по элементу, без сборки
+# всего ответа в памяти); остальные отвечают обычным jsonify
+STREAM_JSON_ENDPOINTS = {
+    "main.news_line",
+    "main.get_trash",
+    "main.archived_news",
+    "main.admin_users",
+}
+
+# Применять миграции схемы при старте приложения
+# (при False — только командой `flask --app main db-upgrade`)
+DB_MIGRATE_ON_STARTUP = True
+
+# Пулы соединений SQLite (на процесс): читающий и одно пишущее соединение,
+# которое берётся только на время транзакции изменения
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = 10          # ожидание свободного соединения для чтения, с
+DB_WRITE_POOL_TIMEOUT = 30    # ожидание очереди к пишущему соединению, с
+DB_BUSY_TIMEOUT = 10          # ожидание блокировки записи SQLite, с
+DB_CACHED_STATEMENTS = 256    # кэш подготовленных выражений на соединение
+
+# PRAGMA, применяемые один раз к каждому соединению пула
+DB_PRAGMAS = {
+    "synchronous": "NORMAL",      # безопасно в режиме WAL
+    "cache_size": -16000,         # ~16 МБ кэша страниц
+    "mmap_size": 134217728,       # 128 МБ memory-mapped I/O
+    "temp_store": "MEMORY",
+}
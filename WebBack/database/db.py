@@ -1,17 +1,266 @@
 import os
-import uuid
+import contextlib
+import functools
+import html
+import itertools
+import json
+import shutil
 import sqlite3
+import time
 from flask import current_app
 from werkzeug.security import generate_password_hash
 from enums import InvalidValues
+from database.migrations import (
+    COUNTER_CONDITIONS, apply_migrations, get_schema_version,
+    rebuild_dashboard_counters, rebuild_news_fts
+)
+from database.filestore import (
+    delete_blob, discard, hash_file, promote, remove_quietly, remove_variants,
+    scan_blobs, scan_variants, stage_upload, variants_folder
+)
+from database.normalize import normalize_key
+from database.search import build_match_query, normalize_text
+
+# Безопасный предел числа параметров в одном запросе (SQLITE_MAX_VARIABLE_NUMBER
+# в старых сборках SQLite равен 999)
+SQLITE_MAX_VARIABLES = 999
+
+# Служебные маркеры подсветки FTS: текст сначала экранируется, затем маркеры → <mark>
+HIGHLIGHT_OPEN = '\x02'
+HIGHLIGHT_CLOSE = '\x03'
+# Многоточие на обрезанных краях snippet()
+SNIPPET_ELLIPSIS = '…'
+
+# Общая часть выборки новостей: автор, модератор и категория
+NEWS_SELECT_FROM = '''
+    FROM News n
+    JOIN Users up ON up.userID = n.publisherID
+    LEFT JOIN Users um ON um.userID = n.moderated_byID
+    LEFT JOIN Categories c ON c.categoryID = n.categoryID
+'''
+
+# Колонки публичных списков новостей (лента, поиск)
+NEWS_LIST_COLUMNS = '''
+    n.newsID,
+    n.title,
+    n.description,
+    n.status,
+    n.create_date,
+    n.publish_date,
+    n.event_start,
+    n.event_end,
+    up.nick   AS publisher_nick,
+    um.nick   AS moderator_nick,
+    c.name    AS category_name,
+    n.archive_date
+'''
+
+# Сколько строк потоковые выборки (iter_*) читают одним запросом (см. _iter_keyset)
+STREAM_BATCH_SIZE = 500
+
+# Сколько новостей удаляется из корзины одной транзакцией (purge_expired_news)
+PURGE_BATCH_SIZE = 500
+
+# Сколько новостей меняет одна транзакция массовых операций по условию
+# (news_soft_delete_all, news_soft_delete_archived, purge_trash)
+BULK_BATCH_SIZE = 5000
+
+# Размер пачки имён файлов при сверке UPLOAD_FOLDER с Files (files_gc)
+GC_BATCH_SIZE = 10000
+
+# Переходы статусов новости (news_transition): действие → условие и изменения.
+# from  — допустимые текущие статусы;
+# trash — где должна быть новость: в корзине (delete_date IS NOT NULL) или нет;
+# set   — присваивания UPDATE (:moderator — ID модератора).
+NEWS_TRANSITIONS = {
+    "approve": {
+        "from":  ("Pending",),
+        "trash": False,
+        "set":   "status = 'Approved', moderated_byID = :moderator, archive_date = NULL",
+    },
+    "reject": {
+        "from":  ("Pending",),
+        "trash": False,
+        "set":   "status = 'Rejected', moderated_byID = :moderator, archive_date = NULL, "
+                 "delete_date = datetime('now', 'localtime')",
+    },
+    "archive": {
+        "from":  ("Pending", "Approved", "Rejected"),
+        "trash": False,
+        "set":   "status = 'Archived', archive_date = datetime('now', 'localtime')",
+    },
+    # Из архива: обратно в ленту (триггер update_publish_date поставит publish_date)
+    "unarchive": {
+        "from":  ("Archived",),
+        "trash": False,
+        "set":   "status = 'Approved', archive_date = NULL",
+    },
+    # Из архива на повторную модерацию
+    "unarchive_edit": {
+        "from":  ("Archived",),
+        "trash": False,
+        "set":   "status = 'Pending', archive_date = NULL, publish_date = NULL",
+    },
+    # Из корзины на повторную модерацию (из любого статуса)
+    "restore": {
+        "from":  ("Pending", "Approved", "Rejected", "Archived"),
+        "trash": True,
+        "set":   "status = 'Pending', delete_date = NULL, archive_date = NULL, publish_date = NULL",
+    },
+}
+
+
+# Присваивания мягкого удаления (news_soft_delete и массовые варианты)
+NEWS_SOFT_DELETE_SET = "delete_date = datetime('now', 'localtime'), archive_date = NULL, publish_date = NULL"
+
+# Массовые операции по условию, выполняемые пачками (Storage.bulk_run, фоновые
+# задания app/jobs.py): имя → таблица, ключ, UPDATE/DELETE и условие отбора строк.
+# Операция должна выводить строку из условия; :параметры подставляются из params.
+BULK_OPERATIONS = {
+    "news_soft_delete_all": {
+        "table": "News", "key": "newsID",
+        "statement": f"UPDATE News SET {NEWS_SOFT_DELETE_SET}",
+        "where": "delete_date IS NULL",
+    },
+    "news_soft_delete_archived": {
+        "table": "News", "key": "newsID",
+        "statement": f"UPDATE News SET {NEWS_SOFT_DELETE_SET}",
+        "where": "archive_date IS NOT NULL AND delete_date IS NULL",
+    },
+    "purge_trash": {
+        "table": "News", "key": "newsID",
+        "statement": "DELETE FROM News",
+        "where": "delete_date IS NOT NULL",
+    },
+    # :age — например '-30 days'
+    "purge_expired": {
+        "table": "News", "key": "newsID",
+        "statement": "DELETE FROM News",
+        "where": "delete_date <= datetime('now', :age)",
+    },
+    # Удаление пользователей: сначала их новости (триггеры файлов — пачками),
+    # затем сами пользователи; :exclude — список ID, которые остаются
+    "users_news_delete": {
+        "table": "News", "key": "newsID",
+        "statement": "DELETE FROM News",
+        "where": "publisherID NOT IN (SELECT value FROM json_each(:exclude))",
+    },
+    "users_delete": {
+        "table": "Users", "key": "userID",
+        "statement": "DELETE FROM Users",
+        "where": "userID NOT IN (SELECT value FROM json_each(:exclude))",
+    },
+}
+
+
+def _bulk_params(params: dict) -> dict:
+    """Параметры операции BULK_OPERATIONS: списки передаются JSON-массивом (для json_each)."""
+    return {
+        name: json.dumps(value) if isinstance(value, (list, tuple)) else value
+        for name, value in (params or {}).items()
+    }
+
+
+# Формат дат заданий (Jobs): UTC с миллисекундами — для скорости и оставшегося времени
+SQL_DATETIME_MS = '%Y-%m-%d %H:%M:%f'
+
+# Колонки Jobs для API; elapsed_seconds — от начала до последнего шага (или завершения)
+JOB_COLUMNS = '''
+    jobID, kind, params, status, state, total, processed, batches, result, error,
+    created_by, owner, created_at, started_at, updated_at, finished_at,
+    (julianday(coalesce(finished_at, updated_at)) - julianday(started_at)) * 86400.0 AS elapsed_seconds
+'''
+
+
+def _job_from_row(row) -> dict:
+    """Строка Jobs → dict с разобранными params, state и result."""
+    job = dict(row)
+    for field in ('params', 'state', 'result'):
+        job[field] = json.loads(job[field]) if job[field] else None
+    return job
+
+
+def _writes(method):
+    """Метод Storage, изменяющий данные: выполняется с пишущим соединением (Storage.writer)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.writer():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _transition_where(transition: dict) -> str:
+    """Условие UPDATE для перехода: состояние новости, из которого он допустим."""
+    statuses = ', '.join(f"'{status}'" for status in transition['from'])
+    location = 'delete_date IS NOT NULL' if transition['trash'] else 'delete_date IS NULL'
+    return f"status IN ({statuses}) AND {location}"
+
+
+def _batched(iterable, size: int):
+    """Разбить итерируемое на списки длиной до size."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _restore_original(marked, original):
+    """
+    Перенести маркеры подсветки с текста индекса на исходный текст новости.
+    highlight()/snippet() возвращают текст из News_FTS, где «ё» уже заменена на «е»;
+    замена посимвольная, поэтому позиции совпадают: находим фрагмент (у snippet —
+    без многоточий по краям) в нормализованном исходном тексте и берём символы оттуда.
+    Если фрагмент не найден (индекс устарел), возвращается текст индекса как есть.
+    """
+    if marked is None or original is None:
+        return marked
+    plain = marked.replace(HIGHLIGHT_OPEN, '').replace(HIGHLIGHT_CLOSE, '')
+    folded = normalize_text(original)
+    for lead in ((len(SNIPPET_ELLIPSIS), 0) if plain.startswith(SNIPPET_ELLIPSIS) else (0,)):
+        for trail in ((len(SNIPPET_ELLIPSIS), 0) if plain.endswith(SNIPPET_ELLIPSIS) else (0,)):
+            core = plain[lead:len(plain) - trail]
+            start = folded.find(core)
+            if start < 0:
+                continue
+            source = original[start:start + len(core)]
+            restored = []
+            position = 0
+            for char in marked:
+                if char not in (HIGHLIGHT_OPEN, HIGHLIGHT_CLOSE):
+                    if lead <= position < lead + len(core):
+                        char = source[position - lead]
+                    position += 1
+                restored.append(char)
+            return ''.join(restored)
+    return marked
+
+
+def _render_highlight(text):
+    """Экранировать HTML в тексте FTS и превратить маркеры подсветки в <mark>."""
+    if text is None:
+        return None
+    return (html.escape(text)
+            .replace(HIGHLIGHT_OPEN, '<mark>')
+            .replace(HIGHLIGHT_CLOSE, '</mark>'))
 
 
 class Storage(object):
-    def __init__(self, db_path=None):
-        self.connection = None
-        self.cursor = None
-
-        if db_path:
+    def __init__(self, db_path=None, pool=None, write_pool=None):
+        self._connection = None
+        self._cursor = None
+        # Пул соединений (database/pool.py); без пула соединение открывается напрямую.
+        # С пулом соединение берётся лениво — при первом обращении к connection/cursor.
+        self.pool = pool
+        # Пул записи: изменения (методы с @_writes) берут из него соединение только
+        # на время своей транзакции (см. writer()); без него пишут через своё соединение
+        self.write_pool = write_pool
+        self._writer_depth = 0
+
+        if pool is not None:
+            self.db_path = pool.db_path
+        elif db_path:
             # Прямой путь, переданный вручную (например, из config.py)
             self.db_path = db_path
         else:
@@ -29,327 +278,256 @@ class Storage(object):
     # -------------------------------
     # Работа с соединением
 
+    @property
+    def connection(self):
+        if self._connection is None and self.pool is not None:
+            self.open_connection()
+        return self._connection
+
+    @property
+    def cursor(self):
+        if self._cursor is None and self.pool is not None:
+            self.open_connection()
+        return self._cursor
+
     def open_connection(self):
-        """Открыть соединение к базе (с WAL и row_factory)."""
-        if self.connection is None:
-            self.connection = sqlite3.connect(
+        """
+        Открыть соединение к базе (с WAL и row_factory).
+        При наличии пула соединение берётся из него уже настроенным.
+        Схема здесь не создаётся — это делают миграции (см. migrate()).
+        """
+        if self._connection is None:
+            if self.pool is not None:
+                self._connection = self.pool.acquire()
+                self._cursor = self._connection.cursor()
+                return
+
+            self._connection = sqlite3.connect(
                 self.db_path,
                 timeout=10,
                 check_same_thread=False
             )
 
-            schema_initialized = False
-
-            self.connection.row_factory = sqlite3.Row
-            self.cursor = self.connection.cursor()
-            self.cursor.execute('PRAGMA foreign_keys = ON;')
-            self.cursor.execute('PRAGMA journal_mode=WAL')
-
-            # Инициализируем схему только один раз за время жизни программы
-            if not schema_initialized:
-                self._create_tables()
-                self._create_indexes()
-                self._create_triggers()
-                schema_initialized = True
-            
-            self.connection.commit()
+            self._connection.row_factory = sqlite3.Row
+            self._cursor = self._connection.cursor()
+            self._cursor.execute('PRAGMA foreign_keys = ON;')
+            self._cursor.execute('PRAGMA journal_mode=WAL').fetchall()
 
     def close_connection(self):
-        """Закрыть соединение к базе, если оно открыто."""
-        if self.connection:
+        """Закрыть соединение к базе (или вернуть его в пул), если оно открыто."""
+        if self._connection:
             try:
-                self.connection.close()
+                if self.pool is not None:
+                    self._cursor.close()
+                    self.pool.release(self._connection)
+                else:
+                    self._connection.close()
             except:
                 pass
             finally:
-                self.connection = None
-                self.cursor = None
-
-    def _create_tables(self):
-        """Создать необходимые таблицы (если их ещё нет)."""
-        try:
-            # 1) Таблица Users
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS Users (
-                    userID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nick TEXT NOT NULL COLLATE NOCASE,
-                    login TEXT NOT NULL COLLATE NOCASE,
-                    password TEXT NOT NULL,
-                    user_role TEXT NOT NULL CHECK(
-                        user_role IN ('Administrator', 'Moderator', 'Publisher')
-                    ),
-                    real_password TEXT,
-                    registration_date TEXT NOT NULL DEFAULT ''
-                )
-            ''')
-
-            # 2) Таблица News
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS News (
-                    newsID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    publisherID INTEGER NOT NULL,
-                    moderated_byID INTEGER,
-                    title TEXT NOT NULL,
-                    description TEXT NOT NULL,
-                    status TEXT NOT NULL DEFAULT 'Pending' CHECK(
-                        status IN ('Pending', 'Approved', 'Rejected', 'Archived')
-                    ),
-                    event_start TEXT NOT NULL,
-                    event_end TEXT,
-                    publish_date TEXT,
-                    create_date TEXT NOT NULL,
-                    delete_date TEXT,
-                    archive_date TEXT,
-                    categoryID INTEGER,
-                    FOREIGN KEY (publisherID) REFERENCES Users(userID) ON DELETE CASCADE,
-                    FOREIGN KEY (moderated_byID) REFERENCES Users(userID) ON DELETE SET NULL,
-                    FOREIGN KEY (categoryID) REFERENCES Categories(categoryID) ON DELETE SET NULL
-                )
-            ''')
-
-            # 3) Таблица Files
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS Files (
-                    fileID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guid TEXT NOT NULL,
-                    format TEXT NOT NULL
-                )
-            ''')
-
-            # 4) Таблица File_Link (связь Files ↔ News)
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS File_Link (
-                    file_linkID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    fileID INTEGER NOT NULL,
-                    newsID INTEGER NOT NULL,
-                    FOREIGN KEY (fileID) REFERENCES Files(fileID) ON DELETE CASCADE,
-                    FOREIGN KEY (newsID) REFERENCES News(newsID) ON DELETE CASCADE
-                )
-            ''')
-
-            # 5) Таблица Categories
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS Categories (
-                    categoryID INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL COLLATE NOCASE UNIQUE,
-                    description TEXT,
-                    create_date TEXT NOT NULL
-                )
-            ''')
+                self._connection = None
+                self._cursor = None
 
-            self.connection.commit()
-        except sqlite3.OperationalError as e:
-            print(f"Ошибка создания таблиц: {e}")
-
-    def _create_indexes(self):
-        """Создать индексы для оптимизации поиска."""
+    @contextlib.contextmanager
+    def released(self):
+        """
+        Вернуть соединение в пул на время долгой работы без БД (например, проверки
+        пароля). С пулом соединение снова возьмётся при следующем обращении,
+        без пула — открывается сразу после блока. Транзакция не должна быть открыта.
+        """
+        self.close_connection()
         try:
-            # Users
-            self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_nick_nocase ON Users(nick COLLATE NOCASE)')
-            self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_login_nocase ON Users(login COLLATE NOCASE)')
-
-            # News
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_publisher ON News(publisherID)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_status ON News(status)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_create_date ON News(create_date)')
-            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_archive_date ON News(archive_date)')
-
-            # Files
-            self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_files_guid ON Files(guid)')
-
-            # Categories
-            self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_categories_name_nocase ON Categories(name COLLATE NOCASE)')
+            yield
+        finally:
+            if self.pool is None:
+                self.open_connection()
 
-            self.connection.commit()
-        except sqlite3.OperationalError as e:
-            print(f"Ошибка создания индексов: {e}")
+    @contextlib.contextmanager
+    def writer(self):
+        """
+        Пишущее соединение из write_pool на время блока: connection и cursor
+        подменяются им, а после блока соединение (с откатом незафиксированного)
+        возвращается в пул. Так единственный писатель занят только транзакцией,
+        а не всем запросом (разбором тела, staging загрузок, проверкой пароля).
+        Вложенные блоки используют то же соединение; без write_pool — ничего не меняет.
+        """
+        if self.write_pool is None or self._writer_depth:
+            self._writer_depth += 1
+            try:
+                yield
+            finally:
+                self._writer_depth -= 1
+            return
 
-    def _create_triggers(self):
-        """Создать триггеры для автоматических дат."""
+        reader = (self._connection, self._cursor)
+        connection = self.write_pool.acquire()
+        self._connection, self._cursor = connection, connection.cursor()
+        self._writer_depth = 1
         try:
-            # 1) При вставке в Users, если registration_date пуст, установить текущую дату
-            self.cursor.execute('''
-                CREATE TRIGGER IF NOT EXISTS set_registration_date
-                AFTER INSERT ON Users
-                FOR EACH ROW
-                WHEN NEW.registration_date IS NULL OR NEW.registration_date = ''
-                BEGIN
-                    UPDATE Users
-                    SET registration_date = datetime('now', 'localtime')
-                    WHERE userID = NEW.userID;
-                END;
-            ''')
-
-            # 2) При вставке в News проверяем: if event_end не NULL и event_start > event_end – abort
-            self.cursor.execute('''
-                CREATE TRIGGER IF NOT EXISTS validate_event_dates
-                BEFORE INSERT ON News
-                FOR EACH ROW
-                WHEN NEW.event_end IS NOT NULL AND NEW.event_start > NEW.event_end
-                BEGIN
-                    SELECT RAISE(ABORT, 'event_start must be <= event_end');
-                END;
-            ''')
-
-            # 3) При изменении status → 'Approved' ставим publish_date
-            self.cursor.execute('''
-                CREATE TRIGGER IF NOT EXISTS update_publish_date
-                AFTER UPDATE OF status ON News
-                FOR EACH ROW
-                WHEN NEW.status = 'Approved' AND OLD.status != 'Approved'
-                BEGIN
-                    UPDATE News
-                    SET publish_date = datetime('now', 'localtime')
-                    WHERE newsID = NEW.newsID;
-                END;
-            ''')
-
-
-            self.cursor.execute('''
-                CREATE TRIGGER IF NOT EXISTS delete_news_files
-                BEFORE DELETE ON News
-                FOR EACH ROW
-                BEGIN
-                    DELETE FROM Files
-                    WHERE fileID IN (
-                        SELECT fileID FROM File_Link WHERE newsID = OLD.newsID
-                    );
-                    DELETE FROM File_Link WHERE newsID = OLD.newsID;
-                END;
-            ''')
+            yield
+        finally:
+            self._writer_depth = 0
+            try:
+                self._cursor.close()
+            except sqlite3.Error:
+                pass
+            self.write_pool.release(connection)
+            self._connection, self._cursor = reader
 
-            # 5) При удалении категории сбрасываем categoryID у новостей
-            self.cursor.execute('''
-                CREATE TRIGGER IF NOT EXISTS reset_category_on_delete
-                AFTER DELETE ON Categories
-                FOR EACH ROW
-                BEGIN
-                    UPDATE News
-                    SET categoryID = NULL
-                    WHERE categoryID = OLD.categoryID;
-                END;
-            ''')
+    def migrate(self) -> list:
+        """Применить недостающие миграции схемы. Возвращает список применённых версий."""
+        self.open_connection()
+        return apply_migrations(self.connection)
 
-            self.connection.commit()
-        except sqlite3.OperationalError as e:
-            print(f"Ошибка создания триггеров: {e}")
+    def schema_version(self) -> int:
+        """Текущая версия схемы (PRAGMA user_version)."""
+        return get_schema_version(self.connection)
 
     # -------------------------------
     # Методы для работы с News
 
     def news_add(self, user_id, news_input_data, files_received, files_list, files_folder):
-        """Добавление новой новости."""
-        self.cursor.execute('BEGIN TRANSACTION;')
-
-        # 1) Если переданы файлы, сразу сохраняем их в Files
-        if files_received:
-            for file in files_list:
-                file_guid = str(uuid.uuid4().hex)
-                file_format = file.filename.rsplit('.', 1)[1].lower()
-                file.save(os.path.join(files_folder, file_guid))
-
-                self.cursor.execute('''
-                    INSERT INTO Files (guid, format)
-                    VALUES (?, ?)
-                ''', (file_guid, file_format))
-
-        # 2) Вставляем запись в News (status = Pending by default)
-        self.cursor.execute('''
-            INSERT INTO News (
-                publisherID,
-                title,
-                description,
-                status,
-                event_start,
-                event_end,
-                create_date,
-                categoryID
-            ) VALUES (
-                ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'), ?
-            )
-        ''', (
-            user_id,
-            news_input_data.get("title"),
-            news_input_data.get("description"),
-            news_input_data.get("status", "Pending"),
-            news_input_data.get("event_start"),
-            news_input_data.get("event_end"),
-            news_input_data.get("categoryID")
-        ))
-
-        # 3) Привязка файлов к этой новости (если были)
-        if files_received:
-            news_id = self.cursor.lastrowid
-            for i in range(len(files_list)):
-                # берем последний INSERT INTO Files, OFFSET по i (в том порядке, в котором они вставлялись)
+        """
+        Добавление новой новости.
+        Файлы пишутся в staging до транзакции, транзакция меняет только
+        метаданные, а на место файлы переносятся после commit.
+        """
+        # 1) Если переданы файлы, записываем их в staging (вне транзакции)
+        staged = []
+        try:
+            if files_received:
+                for file in files_list:
+                    staged.append(stage_upload(file, files_folder))
+        except Exception:
+            discard(staged)
+            raise
+
+        with self.writer():
+            self.cursor.execute('BEGIN TRANSACTION;')
+            try:
+                # 2) Вставляем запись в News (status = Pending by default)
                 self.cursor.execute('''
-                    INSERT INTO File_Link (fileID, newsID)
-                    VALUES (
-                        (SELECT fileID FROM Files ORDER BY fileID DESC LIMIT 1 OFFSET ?),
-                        ?
+                    INSERT INTO News (
+                        publisherID,
+                        title,
+                        description,
+                        status,
+                        event_start,
+                        event_end,
+                        create_date,
+                        categoryID
+                    ) VALUES (
+                        ?, ?, ?, ?, ?, ?, datetime('now', 'localtime'), ?
                     )
-                ''', (i, news_id))
+                ''', (
+                    user_id,
+                    news_input_data.get("title"),
+                    news_input_data.get("description"),
+                    news_input_data.get("status", "Pending"),
+                    news_input_data.get("event_start"),
+                    news_input_data.get("event_end"),
+                    news_input_data.get("categoryID")
+                ))
+                news_id = self.cursor.lastrowid
+
+                # 3) Записи Files (одинаковое содержимое — одна запись) и привязка к новости
+                self._link_files(news_id, [self._register_staged(item) for item in staged])
+
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                discard(staged)
+                raise
+
+        # 4) Файлы на место — уже после commit
+        promote(staged, files_folder)
+
+    def news_add_bulk(self, user_id, items: list, upload_folder: str, chunk_size: int = 200) -> list:
+        """
+        Пакетное добавление новостей (статус Pending) от имени user_id.
+        • items — list[dict] с ключами title, description, event_start, event_end,
+          categoryID и files (list[FileStorage], уже проверенные).
+        Новости вставляются пачками по chunk_size, каждая пачка — одна короткая
+        транзакция: файлы пачки пишутся в staging до неё и переносятся на место после commit.
+        Каждая новость — в своём SAVEPOINT: ошибка одной не откатывает остальные.
+        Файлы привязываются по fileID/newsID, возвращённым их же INSERT ... RETURNING.
+        Возвращает list[{"newsID": ...} или {"error": ...}] в порядке items.
+        """
+        results = []
+        for start in range(0, len(items), chunk_size):
+            results.extend(self._news_add_chunk(user_id, items[start:start + chunk_size], upload_folder))
+        return results
+
+    def _news_add_chunk(self, user_id, items: list, upload_folder: str) -> list:
+        """Одна пачка news_add_bulk."""
+        staged = []
+        try:
+            for item in items:
+                staged.append([stage_upload(file, upload_folder) for file in item.get('files', [])])
+        except Exception:
+            discard([f for item_files in staged for f in item_files])
+            raise
+
+        results = []
+        links = []
+        with self.writer():
+            self.cursor.execute('BEGIN TRANSACTION;')
+            try:
+                for item, item_files in zip(items, staged):
+                    self.cursor.execute('SAVEPOINT bulk_item')
+                    try:
+                        self.cursor.execute('''
+                            INSERT INTO News (
+                                publisherID, title, description, status,
+                                event_start, event_end, create_date, categoryID
+                            ) VALUES (
+                                ?, ?, ?, 'Pending', ?, ?, datetime('now', 'localtime'), ?
+                            )
+                            RETURNING newsID
+                        ''', (
+                            user_id,
+                            item.get('title'),
+                            item.get('description'),
+                            item.get('event_start'),
+                            item.get('event_end'),
+                            item.get('categoryID')
+                        ))
+                        news_id = self.cursor.fetchall()[0][0]
+                        file_ids = [self._register_staged(f) for f in item_files]
+                        self.cursor.execute('RELEASE bulk_item')
+                    except sqlite3.IntegrityError as e:
+                        self.cursor.execute('ROLLBACK TO bulk_item')
+                        self.cursor.execute('RELEASE bulk_item')
+                        results.append({"error": str(e)})
+                        continue
 
-        self.connection.commit()
+                    links.extend((file_id, news_id) for file_id in dict.fromkeys(file_ids))
+                    results.append({"newsID": news_id})
+
+                self.cursor.executemany(
+                    'INSERT OR IGNORE INTO File_Link (fileID, newsID) VALUES (?, ?)', links
+                )
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                discard([f for item_files in staged for f in item_files])
+                raise
+
+        for result, item_files in zip(results, staged):
+            if "newsID" in result:
+                promote(item_files, upload_folder)
+            else:
+                discard(item_files)
+        return results
 
     def get_news(self) -> list:
         """Получить все «неудалённые» новости (delete_date IS NULL)."""
         try:
-            self.cursor.execute('''
-                SELECT
-                    n.newsID,
-                    n.title,
-                    n.description,
-                    n.status,
-                    n.create_date,
-                    n.publish_date,
-                    n.event_start,
-                    n.event_end,
-                    up.nick   AS publisher_nick,
-                    um.nick   AS moderator_nick,
-                    c.name    AS category_name,
-                    n.archive_date
-                FROM News n
-                JOIN Users up ON up.userID = n.publisherID
-                LEFT JOIN Users um ON um.userID = n.moderated_byID
-                LEFT JOIN Categories c ON c.categoryID = n.categoryID
-                WHERE n.delete_date IS NULL
-                ORDER BY n.create_date DESC
-            ''')
-
-            news_items = []
-            for row in self.cursor.fetchall():
-                nid = row['newsID']
-                # Получаем список файлов
-                self.cursor.execute('''
-                    SELECT f.fileID, guid, format
-                    FROM Files f
-                    JOIN File_Link fl ON fl.fileID = f.fileID
-                    WHERE fl.newsID = ?
-                    ORDER BY f.fileID ASC
-                ''', (nid,))
-                files = [{
-                    'fileID':    r['fileID'],
-                    'fileName':  r['guid'],
-                    'fileFormat':r['format']
-                } for r in self.cursor.fetchall()]
-
-                news_items.append({
-                    'newsID':         nid,
-                    'title':          row['title'],
-                    'description':    row['description'],
-                    'status':         row['status'],
-                    'create_date':    row['create_date'],
-                    'publish_date':   row['publish_date'],
-                    'event_start':    row['event_start'],
-                    'event_end':      row['event_end'],
-                    'publisher_nick': row['publisher_nick'],
-                    'moderator_nick': row['moderator_nick'],
-                    'category_name':  row['category_name'],
-                    'archive_date':   row['archive_date'],
-                    'files':          files
-                })
-            return news_items
+            return self._fetch_news(
+                columns=NEWS_LIST_COLUMNS,
+                where='n.delete_date IS NULL',
+                order_by='n.create_date DESC'
+            )
 
         except sqlite3.OperationalError as e:
             raise Exception("Ошибка базы данных. Попробуйте позже") from e
@@ -362,8 +540,8 @@ class Storage(object):
         Получить одну новость по ID (если delete_date IS NULL).
         Возвращает [ {данные}, newsID ] или [{}, INVALID_ID].
         """
-        self.cursor.execute('''
-            SELECT
+        news_items = self._fetch_news(
+            columns='''
                 n.newsID,
                 n.title,
                 n.description,
@@ -377,49 +555,623 @@ class Storage(object):
                 c.name    AS category_name,
                 n.categoryID,
                 n.archive_date
-            FROM News n
-            JOIN Users up ON up.userID = n.publisherID
-            LEFT JOIN Users um ON um.userID = n.moderated_byID
-            LEFT JOIN Categories c ON c.categoryID = n.categoryID
-            WHERE n.newsID = ?
-              AND n.delete_date IS NULL
-        ''', (newsID,))
-
-        news_data = self.cursor.fetchone()
-        if not news_data:
+            ''',
+            where='n.newsID = ? AND n.delete_date IS NULL',
+            order_by='n.newsID',
+            params=(newsID,)
+        )
+        if not news_items:
             return [{}, InvalidValues.INVALID_ID.value]
 
-        # Сбор файлов
+        return [news_items[0], news_items[0]['newsID']]
+
+    def get_news_feed(self, limit=None, after=None, category_id=None, event_from=None, event_to=None):
+        """
+        Публичная лента: одобренные и не удалённые новости,
+        упорядоченные по (publish_date, newsID) по убыванию.
+        • limit       — размер страницы (None → вся лента)
+        • after       — ключ (publish_date, newsID) последней новости предыдущей страницы
+        • category_id — фильтр по категории
+        • event_from / event_to — диапазон дат начала события
+        Возвращает (список новостей, ключ следующей страницы или None).
+        """
+        where, params = self._feed_conditions(after, category_id, event_from, event_to)
+
+        # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+        news_items = self._fetch_news(
+            columns=NEWS_LIST_COLUMNS,
+            where=where,
+            order_by='n.publish_date DESC, n.newsID DESC',
+            params=params,
+            limit=limit + 1 if limit is not None else None
+        )
+
+        if limit is None or len(news_items) <= limit:
+            return news_items, None
+
+        news_items = news_items[:limit]
+        last = news_items[-1]
+        return news_items, (last['publish_date'], last['newsID'])
+
+    def iter_news_feed(self, category_id=None, event_from=None, event_to=None,
+                       batch_size: int = STREAM_BATCH_SIZE):
+        """
+        Вся публичная лента по одной новости за раз (для потоковой отдачи JSON),
+        в том же порядке и по тому же ключу (publish_date, newsID), что и get_news_feed.
+        """
+        where, params = self._feed_conditions(None, category_id, event_from, event_to)
+        return self._iter_news(
+            columns=NEWS_LIST_COLUMNS,
+            where=where,
+            keys=(('n.publish_date', 'publish_date'), ('n.newsID', 'newsID')),
+            params=params,
+            batch_size=batch_size
+        )
+
+    @staticmethod
+    def _feed_conditions(after, category_id, event_from, event_to):
+        """Условие WHERE и параметры публичной ленты."""
+        conditions = ["n.status = 'Approved'", "n.delete_date IS NULL"]
+        params = []
+        if after is not None:
+            conditions.append("(n.publish_date, n.newsID) < (?, ?)")
+            params.extend(after)
+        if category_id is not None:
+            conditions.append("n.categoryID = ?")
+            params.append(category_id)
+        if event_from is not None:
+            conditions.append("n.event_start >= ?")
+            params.append(event_from)
+        if event_to is not None:
+            conditions.append("n.event_start <= ?")
+            params.append(event_to)
+        return ' AND '.join(conditions), tuple(params)
+
+    def search_news(self, query: str, limit: int, offset: int = 0):
+        """
+        Полнотекстовый поиск по заголовку и описанию одобренных неудалённых новостей.
+        Ранжирование bm25 (заголовок весит больше описания), подсветка совпадений
+        в title_highlight и snippet тегами <mark> поверх исходного текста новости
+        (с «ё», см. _restore_original; остальной текст HTML-экранирован).
+        Возвращает (список новостей, смещение следующей страницы или None).
+        """
+        match = build_match_query(query)
+        if not match:
+            return [], None
+
+        news_items = self._fetch_news(
+            columns=f'''
+                {NEWS_LIST_COLUMNS},
+                highlight(News_FTS, 0, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}') AS title_highlight,
+                snippet(News_FTS, 1, '{HIGHLIGHT_OPEN}', '{HIGHLIGHT_CLOSE}', '{SNIPPET_ELLIPSIS}', 24) AS snippet
+            ''',
+            join='JOIN News_FTS ON News_FTS.rowid = n.newsID',
+            where='''
+                News_FTS MATCH ?
+                AND n.status = 'Approved'
+                AND n.delete_date IS NULL
+            ''',
+            order_by='bm25(News_FTS, 10.0, 1.0), n.newsID DESC',
+            params=(match,),
+            limit=limit + 1,
+            offset=offset
+        )
+
+        for item in news_items:
+            item['title_highlight'] = _render_highlight(_restore_original(item['title_highlight'], item['title']))
+            item['snippet'] = _render_highlight(_restore_original(item['snippet'], item['description']))
+
+        if len(news_items) <= limit:
+            return news_items, None
+        return news_items[:limit], offset + limit
+
+    @_writes
+    def search_rebuild(self) -> int:
+        """Перестроить полнотекстовый индекс по всем новостям. Возвращает число записей."""
+        try:
+            self.cursor.execute('BEGIN TRANSACTION;')
+            rebuild_news_fts(self.cursor)
+            self.cursor.execute('SELECT COUNT(*) FROM News_FTS')
+            count = self.cursor.fetchone()[0]
+            self.connection.commit()
+            return count
+        except Exception as e:
+            self.connection.rollback()
+            raise e
+
+    def _fetch_news(self, columns: str, where: str, order_by: str, params=(),
+                    limit=None, offset=None, join: str = '') -> list:
+        """
+        Общий путь выборки новостей для всех списков.
+        Сначала одним запросом берём сами новости, затем одним запросом
+        на пачку ID подгружаем их файлы (вместо запроса на каждую строку).
+        Ключи словарей совпадают с псевдонимами колонок из columns.
+        """
+        query, params = self._news_query(columns, where, order_by, params, limit, offset, join)
+        self.cursor.execute(query, params)
+        news_items = [dict(row) for row in self.cursor.fetchall()]
+
+        files_by_news = self._get_files_for_news([item['newsID'] for item in news_items])
+        for item in news_items:
+            item['files'] = files_by_news.get(item['newsID'], [])
+        return news_items
+
+    def _iter_news(self, columns: str, where: str, keys, params=(),
+                   join: str = '', batch_size: int = STREAM_BATCH_SIZE):
+        """
+        То же, что _fetch_news, но генератором: новости читаются пачками
+        по batch_size в порядке убывания keys (см. _iter_keyset), файлы
+        подгружаются на каждую пачку. В памяти держится не больше одной пачки,
+        а пока потребитель её обрабатывает, соединение из пула не занято.
+        """
+        select = f'SELECT {columns} {NEWS_SELECT_FROM} {join}'
+        for rows in self._iter_keyset(select, where, keys, params, descending=True, batch_size=batch_size):
+            news_items = [dict(row) for row in rows]
+            files_by_news = self._get_files_for_news([item['newsID'] for item in news_items])
+            self._release_idle()
+            for item in news_items:
+                item['files'] = files_by_news.get(item['newsID'], [])
+                yield item
+
+    def _iter_keyset(self, select: str, where: str, keys, params=(),
+                     descending: bool = False, batch_size: int = STREAM_BATCH_SIZE):
+        """
+        Результат выборки пачками по ключу сортировки (keyset): каждая пачка —
+        отдельный короткий SELECT ... WHERE where AND (ключ) > (ключ последней строки)
+        ORDER BY ключ LIMIT batch_size. keys — ((выражение SQL, колонка результата), ...),
+        вместе они должны однозначно упорядочивать строки (последним — ID) и не быть
+        NULL у отбираемых строк (иначе ValueError вместо молча оборванной выдачи).
+        Между пачками не остаётся ни открытого курсора, ни снимка чтения
+        (не мешают wal_checkpoint), а соединение пула возвращается (см. _release_idle).
+        """
+        direction, compare = ('DESC', '<') if descending else ('ASC', '>')
+        columns = ', '.join(expression for expression, _ in keys)
+        order_by = ', '.join(f'{expression} {direction}' for expression, _ in keys)
+        after_condition = f"({columns}) {compare} ({', '.join('?' * len(keys))})"
+        after = None
+        while True:
+            condition, batch_params = f'({where})', tuple(params)
+            if after is not None:
+                condition += f' AND {after_condition}'
+                batch_params += after
+            self.cursor.execute(
+                f'{select} WHERE {condition} ORDER BY {order_by} LIMIT ?',
+                batch_params + (batch_size,)
+            )
+            rows = self.cursor.fetchall()
+            self._release_idle()
+            if rows:
+                yield rows
+            if len(rows) < batch_size:
+                return
+            after = tuple(rows[-1][column] for _, column in keys)
+            if None in after:
+                # Сравнение с NULL ложно — следующие пачки молча потерялись бы
+                raise ValueError(f"NULL в ключе потоковой выборки: {dict(zip((c for _, c in keys), after))}")
+
+    def _release_idle(self):
+        """
+        Вернуть читающее соединение в пул между пачками потоковой выборки
+        (следующее обращение возьмёт его снова). Без пула и внутри writer() — ничего.
+        """
+        if self.pool is not None and not self._writer_depth:
+            self.close_connection()
+
+    @staticmethod
+    def _news_query(columns: str, where: str, order_by: str, params=(),
+                    limit=None, offset=None, join: str = ''):
+        """SQL выборки новостей и параметры к нему."""
+        limit_clause = ''
+        params = tuple(params)
+        if limit is not None:
+            limit_clause = 'LIMIT ?'
+            params = params + (limit,)
+            if offset:
+                limit_clause += ' OFFSET ?'
+                params = params + (offset,)
+
+        query = f'''
+            SELECT {columns}
+            {NEWS_SELECT_FROM}
+            {join}
+            WHERE {where}
+            ORDER BY {order_by}
+            {limit_clause}
+        '''
+        return query, params
+
+    def _get_files_for_news(self, news_ids: list) -> dict:
+        """
+        Файлы для набора новостей: {newsID: [{fileID, fileName, fileFormat, variants}, ...]}.
+        variants — ширины готовых уменьшенных копий (см. /uploads/<guid>?w=).
+        ID передаются пачками, чтобы не упереться в лимит параметров SQLite.
+        """
+        files_by_news = {}
+        for start in range(0, len(news_ids), SQLITE_MAX_VARIABLES):
+            chunk = news_ids[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ','.join(['?'] * len(chunk))
+            self.cursor.execute(f'''
+                SELECT fl.newsID, f.fileID, f.guid, f.format,
+                       (SELECT group_concat(v.width) FROM File_Variants v
+                        WHERE v.fileID = f.fileID) AS variants
+                FROM File_Link fl
+                JOIN Files f ON f.fileID = fl.fileID
+                WHERE fl.newsID IN ({placeholders})
+                ORDER BY fl.newsID, f.fileID ASC
+            ''', chunk)
+            for r in self.cursor.fetchall():
+                files_by_news.setdefault(r['newsID'], []).append({
+                    'fileID':    r['fileID'],
+                    'fileName':  r['guid'],
+                    'fileFormat':r['format'],
+                    'variants':  sorted(int(w) for w in r['variants'].split(',')) if r['variants'] else []
+                })
+        return files_by_news
+
+    # -------------------------------
+    # Хранилище файлов (контентно-адресуемое, см. database/filestore.py)
+
+    def _register_staged(self, staged) -> int:
+        """
+        fileID для staged-загрузки: существующая запись с тем же content_hash
+        или новая (guid = хэш). Только метаданные — файл переносит promote() после commit.
+        """
+        self.cursor.execute(
+            'SELECT fileID FROM Files WHERE content_hash = ?', (staged.content_hash,)
+        )
+        row = self.cursor.fetchone()
+        if row:
+            return row['fileID']
+
         self.cursor.execute('''
-            SELECT f.fileID, guid, format
+            INSERT INTO Files (guid, format, content_hash, size)
+            VALUES (?, ?, ?, ?)
+            RETURNING fileID
+        ''', (staged.content_hash, staged.file_format, staged.content_hash, staged.size))
+        return self.cursor.fetchall()[0][0]
+
+    def _link_files(self, news_id: int, file_ids: list):
+        """Привязать файлы к новости (повторная привязка того же файла игнорируется)."""
+        self.cursor.executemany(
+            'INSERT OR IGNORE INTO File_Link (fileID, newsID) VALUES (?, ?)',
+            [(file_id, news_id) for file_id in file_ids]
+        )
+
+    def _delete_unreferenced_files(self, file_ids: list):
+        """Удалить записи Files из file_ids, на которые не осталось ссылок в File_Link."""
+        for start in range(0, len(file_ids), SQLITE_MAX_VARIABLES):
+            chunk = file_ids[start:start + SQLITE_MAX_VARIABLES]
+            placeholders = ','.join(['?'] * len(chunk))
+            self.cursor.execute(f'''
+                DELETE FROM Files
+                WHERE fileID IN ({placeholders})
+                AND NOT EXISTS (SELECT 1 FROM File_Link fl WHERE fl.fileID = Files.fileID)
+            ''', chunk)
+
+    def files_dedupe(self, upload_folder: str, dry_run: bool = False) -> dict:
+        """
+        Перевести уже загруженные файлы (content_hash IS NULL) на хранение по хэшу.
+        ● Считает SHA-256 каждого файла на диске;
+        ● Для каждого содержимого оставляет одну запись Files (blob <hash>),
+          связи дубликатов переносит на неё, записи дубликатов удаляет;
+        ● После фиксации транзакции удаляет с диска старые имена файлов.
+        Новое имя создаётся жёсткой ссылкой (или копией) до транзакции,
+        так что при сбое на любом шаге файлы записей остаются на месте.
+        Возвращает отчёт: сколько файлов обработано, объединено и сколько байт освобождено.
+        """
+        report = {
+            "files_scanned":     0,
+            "files_missing":     0,
+            "duplicates_merged": 0,
+            "bytes_before":      0,
+            "bytes_after":       0,
+            "bytes_saved":       0,
+            "dry_run":           dry_run,
+        }
+
+        self.cursor.execute('SELECT content_hash FROM Files WHERE content_hash IS NOT NULL')
+        stored_hashes = {row[0] for row in self.cursor.fetchall()}
+        self.cursor.execute('''
+            SELECT fileID, guid FROM Files
+            WHERE content_hash IS NULL
+            ORDER BY fileID
+        ''')
+        legacy = self.cursor.fetchall()
+
+        # Хэшируем до транзакции: чтение файлов не держит блокировку записи
+        groups = {}
+        for row in legacy:
+            path = os.path.join(upload_folder, row['guid'])
+            if not os.path.exists(path):
+                report["files_missing"] += 1
+                continue
+            content_hash, size = hash_file(path)
+            report["files_scanned"] += 1
+            report["bytes_before"] += size
+            groups.setdefault(content_hash, []).append((row['fileID'], row['guid'], size))
+
+        plan = []          # (hash, size, id записи-владельца или None, [(fileID, guid)])
+        for content_hash, rows in groups.items():
+            if content_hash in stored_hashes:
+                # Содержимое уже хранится по хэшу — все старые записи становятся дубликатами
+                plan.append((content_hash, rows[0][2], None, [(r[0], r[1]) for r in rows]))
+                report["duplicates_merged"] += len(rows)
+                report["bytes_saved"] += sum(r[2] for r in rows)
+            else:
+                first, rest = rows[0], rows[1:]
+                plan.append((content_hash, first[2], first, [(r[0], r[1]) for r in rest]))
+                report["duplicates_merged"] += len(rest)
+                report["bytes_saved"] += sum(r[2] for r in rest)
+        report["bytes_after"] = report["bytes_before"] - report["bytes_saved"]
+
+        if dry_run or not plan:
+            return report
+
+        # 1) blob под именем хэша — до транзакции, старые имена пока не трогаем
+        for content_hash, _, owner, _ in plan:
+            blob_path = os.path.join(upload_folder, content_hash)
+            if owner is not None and not os.path.exists(blob_path):
+                source = os.path.join(upload_folder, owner[1])
+                try:
+                    os.link(source, blob_path)
+                except OSError:
+                    shutil.copy2(source, blob_path)
+
+        # 2) записи Files и связи — одной транзакцией
+        old_names = []
+        with self.writer():
+            try:
+                self.cursor.execute('BEGIN TRANSACTION;')
+                for content_hash, size, owner, duplicates in plan:
+                    if owner is not None:
+                        owner_id = owner[0]
+                        # Уменьшенные копии назывались по старому guid — построятся заново
+                        self.cursor.execute('''
+                            UPDATE Files
+                            SET guid = ?, content_hash = ?, size = ?, variants_date = NULL
+                            WHERE fileID = ?
+                        ''', (content_hash, content_hash, size, owner_id))
+                        self.cursor.execute('DELETE FROM File_Variants WHERE fileID = ?', (owner_id,))
+                        old_names.append(owner[1])
+                    else:
+                        self.cursor.execute(
+                            'SELECT fileID FROM Files WHERE content_hash = ?', (content_hash,)
+                        )
+                        owner_id = self.cursor.fetchone()['fileID']
+
+                    for file_id, guid in duplicates:
+                        self.cursor.execute('''
+                            INSERT OR IGNORE INTO File_Link (fileID, newsID)
+                            SELECT ?, newsID FROM File_Link WHERE fileID = ?
+                        ''', (owner_id, file_id))
+                        self.cursor.execute('DELETE FROM File_Link WHERE fileID = ?', (file_id,))
+                        self.cursor.execute('DELETE FROM Files WHERE fileID = ?', (file_id,))
+                        old_names.append(guid)
+                self.connection.commit()
+            except Exception as e:
+                self.connection.rollback()
+                raise e
+
+        # 3) старые имена больше ни на что не указывают
+        for guid in old_names:
+            remove_quietly(os.path.join(upload_folder, guid))
+            remove_variants(upload_folder, guid)
+        return report
+
+    def files_gc(self, upload_folder: str, dry_run: bool = False, min_age: float = 3600,
+                 prune_missing: bool = False, sample_size: int = 100,
+                 batch_size: int = GC_BATCH_SIZE) -> dict:
+        """
+        Сверка UPLOAD_FOLDER с таблицей Files.
+        ● Имена файлов (os.scandir, потоком) пачками пишутся во временную таблицу,
+          сравнение с Files — два anti-join'а, без запроса на каждый файл;
+        ● Сироты — blob и копии в .variants без записи в Files (и без записи в журнале
+          File_Deletions, его разбирает фоновый обработчик). Файлы моложе min_age секунд
+          не трогаются: загрузка могла ещё не зафиксировать свою запись;
+        ● Пропавшие — записи Files, для которых на диске нет blob; удаляются
+          (вместе со связями) только при prune_missing.
+        Сироты удаляются через delete_blob — с повторной проверкой ссылки.
+        Возвращает отчёт с числами, примерами имён (до sample_size) и скоростью сканирования.
+        """
+        started = time.perf_counter()
+        deadline = time.time() - min_age
+        report = {
+            "blobs_scanned":        0,
+            "variants_scanned":     0,
+            "orphans":              0,
+            "orphan_bytes":         0,
+            "orphan_variants":      0,
+            "orphan_variant_bytes": 0,
+            "skipped_recent":       0,
+            "missing":              0,
+            "removed":              0,
+            "removed_bytes":        0,
+            "pruned":               0,
+            "dry_run":              dry_run,
+            "samples":              {"orphans": [], "missing": []},
+        }
+
+        try:
+            self.cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS gc_blobs (
+                    guid TEXT PRIMARY KEY, size INTEGER, mtime REAL
+                ) WITHOUT ROWID
+            ''')
+            self.cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS gc_variants (
+                    name TEXT PRIMARY KEY, guid TEXT, size INTEGER, mtime REAL
+                ) WITHOUT ROWID
+            ''')
+            self.cursor.execute('DELETE FROM temp.gc_blobs')
+            self.cursor.execute('DELETE FROM temp.gc_variants')
+
+            # 1) диск → временные таблицы
+            for batch in _batched(scan_blobs(upload_folder), batch_size):
+                self.cursor.executemany('INSERT INTO temp.gc_blobs VALUES (?, ?, ?)', batch)
+                report["blobs_scanned"] += len(batch)
+            for batch in _batched(scan_variants(upload_folder), batch_size):
+                self.cursor.executemany('INSERT INTO temp.gc_variants VALUES (?, ?, ?, ?)', batch)
+                report["variants_scanned"] += len(batch)
+            self.connection.commit()
+            report["scan_seconds"] = round(time.perf_counter() - started, 3)
+
+            # 2) сироты: blob без записи Files
+            orphans = self._iter_keyset(
+                'SELECT b.guid, b.size, b.mtime FROM temp.gc_blobs b',
+                where='''
+                    NOT EXISTS (SELECT 1 FROM Files f WHERE f.guid = b.guid)
+                    AND NOT EXISTS (SELECT 1 FROM File_Deletions d WHERE d.guid = b.guid)
+                ''',
+                keys=(('b.guid', 'guid'),),
+                batch_size=batch_size
+            )
+            for rows in orphans:
+                for row in rows:
+                    if row['mtime'] > deadline:
+                        report["skipped_recent"] += 1
+                        continue
+                    report["orphans"] += 1
+                    report["orphan_bytes"] += row['size']
+                    if len(report["samples"]["orphans"]) < sample_size:
+                        report["samples"]["orphans"].append(row['guid'])
+                    if not dry_run and delete_blob(upload_folder, row['guid'], 'gc', self.file_is_referenced):
+                        report["removed"] += 1
+                        report["removed_bytes"] += row['size']
+
+            # 3) копии, чей оригинал не числится в Files
+            variants = self._iter_keyset(
+                'SELECT v.name, v.size, v.mtime FROM temp.gc_variants v',
+                where='NOT EXISTS (SELECT 1 FROM Files f WHERE f.guid = v.guid)',
+                keys=(('v.name', 'name'),),
+                batch_size=batch_size
+            )
+            variants_dir = variants_folder(upload_folder)
+            for rows in variants:
+                for row in rows:
+                    if row['mtime'] > deadline:
+                        report["skipped_recent"] += 1
+                        continue
+                    report["orphan_variants"] += 1
+                    report["orphan_variant_bytes"] += row['size']
+                    if not dry_run and remove_quietly(os.path.join(variants_dir, row['name'])):
+                        report["removed"] += 1
+                        report["removed_bytes"] += row['size']
+
+            # 4) пропавшие: запись Files без blob (перепроверяем диск — blob мог появиться после сканирования)
+            missing = self._iter_keyset(
+                'SELECT f.fileID, f.guid FROM Files f',
+                where='NOT EXISTS (SELECT 1 FROM temp.gc_blobs b WHERE b.guid = f.guid)',
+                keys=(('f.fileID', 'fileID'),),
+                batch_size=batch_size
+            )
+            missing_ids = []
+            for rows in missing:
+                for row in rows:
+                    if os.path.exists(os.path.join(upload_folder, row['guid'])):
+                        continue
+                    report["missing"] += 1
+                    missing_ids.append(row['fileID'])
+                    if len(report["samples"]["missing"]) < sample_size:
+                        report["samples"]["missing"].append(row['guid'])
+
+            if prune_missing and not dry_run and missing_ids:
+                self.cursor.execute('BEGIN TRANSACTION;')
+                for start in range(0, len(missing_ids), SQLITE_MAX_VARIABLES):
+                    chunk = missing_ids[start:start + SQLITE_MAX_VARIABLES]
+                    placeholders = ','.join(['?'] * len(chunk))
+                    self.cursor.execute(f'DELETE FROM Files WHERE fileID IN ({placeholders})', chunk)
+                    report["pruned"] += self.cursor.rowcount
+                self.connection.commit()
+        except Exception as e:
+            self.connection.rollback()
+            raise e
+        finally:
+            self.cursor.execute('DROP TABLE IF EXISTS temp.gc_blobs')
+            self.cursor.execute('DROP TABLE IF EXISTS temp.gc_variants')
+
+        elapsed = time.perf_counter() - started
+        report["elapsed_seconds"] = round(elapsed, 3)
+        scanned = report["blobs_scanned"] + report["variants_scanned"]
+        report["files_per_second"] = round(scanned / elapsed) if elapsed > 0 else scanned
+        return report
+
+    # -------------------------------
+    # Уменьшенные копии изображений (см. app/images.py)
+
+    def files_pending_variants(self, limit: int = None) -> list:
+        """Файлы, для которых уменьшенные копии ещё не строились: [{fileID, guid}, ...]."""
+        query = '''
+            SELECT fileID, guid FROM Files
+            WHERE variants_date IS NULL
+            ORDER BY fileID
+        '''
+        params = ()
+        if limit is not None:
+            query += ' LIMIT ?'
+            params = (limit,)
+        self.cursor.execute(query, params)
+        return [dict(row) for row in self.cursor.fetchall()]
+
+    @_writes
+    def file_variants_save(self, file_id: int, variants: list) -> bool:
+        """
+        Записать готовые копии файла: variants — list[(width, size)].
+        Возвращает False, если запись Files уже удалена (копии тогда не нужны).
+        """
+        try:
+            self.cursor.execute('BEGIN TRANSACTION;')
+            self.cursor.execute('''
+                UPDATE Files SET variants_date = datetime('now', 'localtime')
+                WHERE fileID = ?
+            ''', (file_id,))
+            if self.cursor.rowcount == 0:
+                self.connection.rollback()
+                return False
+            self.cursor.execute('DELETE FROM File_Variants WHERE fileID = ?', (file_id,))
+            self.cursor.executemany(
+                'INSERT INTO File_Variants (fileID, width, size) VALUES (?, ?, ?)',
+                [(file_id, width, size) for width, size in variants]
+            )
+            self.connection.commit()
+            return True
+        except Exception as e:
+            self.connection.rollback()
+            raise e
+
+    def file_get_by_guid(self, guid: str):
+        """
+        Файл для отдачи по /uploads: {fileID, guid, format, variants_ready, variants}
+        или None. variants_ready — копии уже строились (набор ширин окончательный).
+        """
+        self.cursor.execute('''
+            SELECT f.fileID, f.guid, f.format,
+                   f.variants_date IS NOT NULL AS variants_ready,
+                   (SELECT group_concat(v.width) FROM File_Variants v
+                    WHERE v.fileID = f.fileID) AS variants
             FROM Files f
-            JOIN File_Link fl ON fl.fileID = f.fileID
-            WHERE fl.newsID = ?
-            ORDER BY f.fileID ASC
-        ''', (newsID,))
-
-        files = [{
-            'fileID':    row['fileID'],
-            'fileName':  row['guid'],
-            'fileFormat':row['format']
-        } for row in self.cursor.fetchall()]
-
-        return [{
-            'newsID':         news_data['newsID'],
-            'title':          news_data['title'],
-            'description':    news_data['description'],
-            'status':         news_data['status'],
-            'create_date':    news_data['create_date'],
-            'publish_date':   news_data['publish_date'],
-            'event_start':    news_data['event_start'],
-            'event_end':      news_data['event_end'],
-            'publisher_nick': news_data['publisher_nick'],
-            'moderator_nick': news_data['moderator_nick'],
-            'categoryID':     news_data['categoryID'],
-            'category_name':  news_data['category_name'],
-            'archive_date':   news_data['archive_date'],
-            'files':          files
-        }, news_data['newsID']]
+            WHERE f.guid = ?
+        ''', (guid,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        file = dict(row)
+        file['variants_ready'] = bool(file['variants_ready'])
+        file['variants'] = sorted(int(w) for w in file['variants'].split(',')) if file['variants'] else []
+        return file
+
+    @_writes
+    def files_reset_variants(self) -> int:
+        """Пометить все файлы как необработанные (для пересборки копий). Возвращает их число."""
+        try:
+            self.cursor.execute('BEGIN TRANSACTION;')
+            self.cursor.execute('DELETE FROM File_Variants')
+            self.cursor.execute('UPDATE Files SET variants_date = NULL')
+            count = self.cursor.rowcount
+            self.connection.commit()
+            return count
+        except Exception as e:
+            self.connection.rollback()
+            raise e
 
     def news_update(self, news_id, user_id, news_data, files_received, files, upload_folder, existing_files=None, status_override=None):
         """
@@ -437,157 +1189,492 @@ class Storage(object):
         • files_received     — булево, указывает, пришли ли новые файлы (обычно bool(files))
         • files              — list объектов FileStorage новых загруженных файлов
         • upload_folder      — путь к каталогу для сохранения файлов
+        Новые файлы пишутся в staging до транзакции и переносятся на место после commit;
+        ненужные старые файлы удаляет с диска фоновый обработчик журнала File_Deletions.
         """
-        self.cursor.execute('BEGIN TRANSACTION;')
+        staged = []
         try:
-            # --------------------------
-            # 1. Обновляем саму запись News
-            # --------------------------
-            update_query = """
-                UPDATE News
-                SET title = ?, description = ?, event_start = ?, event_end = ?, publisherID = ?, categoryID = ?
-            """
-            update_values = [
-                news_data.get('title'),
-                news_data.get('description'),
-                news_data.get('event_start'),
-                news_data.get('event_end'),
-                user_id,
-                news_data.get('categoryID')
-            ]
-
-            if status_override:
-                if status_override == 'Archived':
-                    update_query += ", status = ?, archive_date = datetime('now', 'localtime')"
-                    update_values.append(status_override)
-                else:
-                    update_query += ", status = ?, archive_date = NULL"
-                    update_values.append(status_override)
-
-            update_query += " WHERE newsID = ?"
-            update_values.append(news_id)
-            self.cursor.execute(update_query, tuple(update_values))
-
-            # --------------------------
-            # 2. Работа с файлами
-            # --------------------------
-
-            # • existing_files — list[guid] тех файлов, которые фронтенд хочет оставить.
-            #   Если в news_data есть флаг delete_all_files == "true", это означает, что
-            #   пользователь явно попросил удалить все старые файлы.
-            # • files_received  — True, если пришли какие-то новые файлы (files != []).
-            # • files           — list объектов FileStorage с новыми файлами.
-
-            # Определим список GUID тех старых фотографий, которые нужно оставить.
-            keep_guids = []
-            if news_data.get('delete_all_files') == "true":
-                # Явное удаление всех старых файлов  → keep_guids остаётся пустым
+            if files_received and files:
+                for file in files:
+                    if file.filename:
+                        staged.append(stage_upload(file, upload_folder))
+        except Exception:
+            discard(staged)
+            raise
+
+        with self.writer():
+            self.cursor.execute('BEGIN TRANSACTION;')
+            try:
+                # --------------------------
+                # 1. Обновляем саму запись News
+                # --------------------------
+                update_query = """
+                    UPDATE News
+                    SET title = ?, description = ?, event_start = ?, event_end = ?, publisherID = ?, categoryID = ?
+                """
+                update_values = [
+                    news_data.get('title'),
+                    news_data.get('description'),
+                    news_data.get('event_start'),
+                    news_data.get('event_end'),
+                    user_id,
+                    news_data.get('categoryID')
+                ]
+
+                if status_override:
+                    if status_override == 'Archived':
+                        update_query += ", status = ?, archive_date = datetime('now', 'localtime')"
+                        update_values.append(status_override)
+                    else:
+                        update_query += ", status = ?, archive_date = NULL"
+                        update_values.append(status_override)
+
+                update_query += " WHERE newsID = ?"
+                update_values.append(news_id)
+                self.cursor.execute(update_query, tuple(update_values))
+
+                # --------------------------
+                # 2. Работа с файлами
+                # --------------------------
+
+                # • existing_files — list[guid] тех файлов, которые фронтенд хочет оставить.
+                #   Если в news_data есть флаг delete_all_files == "true", это означает, что
+                #   пользователь явно попросил удалить все старые файлы.
+                # • files_received  — True, если пришли какие-то новые файлы (files != []).
+                # • files           — list объектов FileStorage с новыми файлами.
+
+                # Определим список GUID тех старых фотографий, которые нужно оставить.
                 keep_guids = []
-            elif existing_files is not None:
-                # existing_files может быть [] или непустым списком
-                keep_guids = existing_files
-            else:
-                # Если фронтенд не передал existing_files вовсе → считаем, что не меняем старые.
-                # Поэтому получим все старые guids, чтобы их сохранить.
+                if news_data.get('delete_all_files') == "true":
+                    # Явное удаление всех старых файлов  → keep_guids остаётся пустым
+                    keep_guids = []
+                elif existing_files is not None:
+                    # existing_files может быть [] или непустым списком
+                    keep_guids = existing_files
+                else:
+                    # Если фронтенд не передал existing_files вовсе → считаем, что не меняем старые.
+                    # Поэтому получим все старые guids, чтобы их сохранить.
+                    self.cursor.execute("""
+                        SELECT f.guid
+                        FROM Files f
+                        JOIN File_Link fl ON fl.fileID = f.fileID
+                        WHERE fl.newsID = ?
+                    """, (news_id,))
+                    rows_all = self.cursor.fetchall()
+                    keep_guids = [r['guid'] for r in rows_all]
+
+                # 2.1. Получим полную карту {guid: fileID} для всех старых файлов, связанных с этим newsID
                 self.cursor.execute("""
-                    SELECT f.guid
+                    SELECT f.fileID, f.guid
                     FROM Files f
                     JOIN File_Link fl ON fl.fileID = f.fileID
                     WHERE fl.newsID = ?
                 """, (news_id,))
-                rows_all = self.cursor.fetchall()
-                keep_guids = [r['guid'] for r in rows_all]
-
-            # 2.1. Получим полную карту {guid: fileID} для всех старых файлов, связанных с этим newsID
-            self.cursor.execute("""
-                SELECT f.fileID, f.guid
-                FROM Files f
-                JOIN File_Link fl ON fl.fileID = f.fileID
-                WHERE fl.newsID = ?
-            """, (news_id,))
-            rows = self.cursor.fetchall()
-            old_map = {r['guid']: r['fileID'] for r in rows}  # guid → fileID
-
-            # 2.2. Определим guids и fileIDs для удаления: 
-            #     все старые, которых нет в keep_guids
-            to_delete_guids = [g for g in old_map.keys() if g not in keep_guids]
-            to_delete_file_ids = [old_map[g] for g in to_delete_guids]
-
-            # 2.3. Удаляем связи File_Link и сами записи Files для этих fileIDs
-            if to_delete_file_ids:
-                placeholders_db = ','.join(['?'] * len(to_delete_file_ids))
-                # Сначала удалить связи
-                self.cursor.execute(
-                    f"DELETE FROM File_Link WHERE fileID IN ({placeholders_db}) AND newsID = ?",
-                    tuple(to_delete_file_ids) + (news_id,)
-                )
-                # Затем удалить записи из Files
-                self.cursor.execute(
-                    f"DELETE FROM Files WHERE fileID IN ({placeholders_db})",
-                    tuple(to_delete_file_ids)
-                )
-
-            # 2.4. Физически удаляем файлы с диска
-            for guid in to_delete_guids:
-                img_path = os.path.join(upload_folder, guid)
-                if os.path.exists(img_path):
-                    try:
-                        os.remove(img_path)
-                    except Exception as e:
-                        print(f"Ошибка удаления файла {img_path}: {e}")
-
-            # 2.5. Теперь (если нужно) сохраняем новые файлы, пришедшие в параметре files
-            if files_received and files:
-                for file in files:
-                    if not file.filename:
-                        continue
-                    # Генерируем новый уникальный guid
-                    new_guid = str(uuid.uuid4().hex)
-                    ext = file.filename.rsplit('.', 1)[1].lower()
-                    # Сохраняем файл на диск
-                    file.save(os.path.join(upload_folder, new_guid))
-                    # Вставляем запись в Files
-                    self.cursor.execute(
-                        "INSERT INTO Files (guid, format) VALUES (?, ?)",
-                        (new_guid, ext)
-                    )
-                    # Получаем fileID последней вставленной записи
-                    new_file_id = self.cursor.lastrowid
-                    # Вставляем связь (fileID ↔ newsID)
+                rows = self.cursor.fetchall()
+                old_map = {r['guid']: r['fileID'] for r in rows}  # guid → fileID
+
+                # 2.2. Определим guids и fileIDs для удаления: 
+                #     все старые, которых нет в keep_guids
+                to_delete_guids = [g for g in old_map.keys() if g not in keep_guids]
+                to_delete_file_ids = [old_map[g] for g in to_delete_guids]
+
+                # 2.3. Удаляем связи File_Link этой новости, а записи Files —
+                #      только если на них не ссылаются другие новости
+                if to_delete_file_ids:
+                    placeholders_db = ','.join(['?'] * len(to_delete_file_ids))
                     self.cursor.execute(
-                        "INSERT INTO File_Link (fileID, newsID) VALUES (?, ?)",
-                        (new_file_id, news_id)
+                        f"DELETE FROM File_Link WHERE fileID IN ({placeholders_db}) AND newsID = ?",
+                        tuple(to_delete_file_ids) + (news_id,)
                     )
-
-            # 2.6. Для тех guids, которые мы хотим сохранить (keep_guids),
-            #      убедимся, что связи в File_Link существуют. Если уже были —
-            #      ничего не меняем. Если вдруг удалились (в редких случаях) —
-            #      восстанавливаем.
-            for guid in keep_guids:
-                fid = old_map.get(guid)
-                if fid:
-                    # Проверим, существует ли связь
-                    self.cursor.execute(
-                        "SELECT 1 FROM File_Link WHERE fileID = ? AND newsID = ?",
-                        (fid, news_id)
-                    )
-                    if not self.cursor.fetchone():
-                        # Вставим связь заново
+                    self._delete_unreferenced_files(to_delete_file_ids)
+
+                # 2.4. Удалённые записи Files попадают в журнал File_Deletions (триггер),
+                #      файлы с диска удалит фоновый обработчик журнала
+
+                # 2.5. Теперь (если нужно) привязываем новые файлы, записанные в staging
+                self._link_files(news_id, [self._register_staged(item) for item in staged])
+
+                # 2.6. Для тех guids, которые мы хотим сохранить (keep_guids),
+                #      убедимся, что связи в File_Link существуют. Если уже были —
+                #      ничего не меняем. Если вдруг удалились (в редких случаях) —
+                #      восстанавливаем.
+                for guid in keep_guids:
+                    fid = old_map.get(guid)
+                    if fid:
+                        # Проверим, существует ли связь
                         self.cursor.execute(
-                            "INSERT INTO File_Link (fileID, newsID) VALUES (?, ?)",
+                            "SELECT 1 FROM File_Link WHERE fileID = ? AND newsID = ?",
                             (fid, news_id)
                         )
+                        if not self.cursor.fetchone():
+                            # Вставим связь заново
+                            self.cursor.execute(
+                                "INSERT INTO File_Link (fileID, newsID) VALUES (?, ?)",
+                                (fid, news_id)
+                            )
+
+                # --------------------------
+                # 3. Фиксируем транзакцию
+                # --------------------------
+                self.connection.commit()
+
+            except Exception as e:
+                # При любой ошибке возвращаем БД в прежнее состояние
+                self.connection.rollback()
+                discard(staged)
+                raise e
+
+        # --------------------------
+        # 4. Диск: новые файлы на место (старые без ссылок удалит журнал File_Deletions)
+        # --------------------------
+        promote(staged, upload_folder)
+
+    # -------------------------------
+    # Журнал удаления файлов (File_Deletions, см. app/file_deletions.py)
 
-            # --------------------------
-            # 3. Фиксируем транзакцию
-            # --------------------------
+    @_writes
+    def file_deletions_claim(self, limit: int, lease: int, max_attempts: int) -> list:
+        """
+        Забрать до limit записей журнала, срок которых наступил: одним UPDATE ... RETURNING
+        сдвигаем next_attempt на lease секунд вперёд, чтобы другой обработчик
+        (другой процесс) не взял те же записи, пока эти обрабатываются.
+        Возвращает [{deletionID, guid, attempts}, ...].
+        """
+        try:
+            self.cursor.execute('BEGIN IMMEDIATE;')
+            self.cursor.execute('''
+                UPDATE File_Deletions
+                SET next_attempt = datetime('now', ?)
+                WHERE deletionID IN (
+                    SELECT deletionID FROM File_Deletions
+                    WHERE attempts < ? AND next_attempt <= datetime('now')
+                    ORDER BY deletionID
+                    LIMIT ?
+                )
+                RETURNING deletionID, guid, attempts
+            ''', (f'+{int(lease)} seconds', max_attempts, limit))
+            claimed = [dict(row) for row in self.cursor.fetchall()]
             self.connection.commit()
+            return claimed
+        except Exception as e:
+            self.connection.rollback()
+            raise e
 
+    @_writes
+    def file_deletions_finish(self, done: list, failed: list, retry_delay: int):
+        """
+        Итог обработки пачки: done — deletionID выполненных (запись удаляется),
+        failed — [(deletionID, текст ошибки)]: attempts + 1, следующая попытка
+        через retry_delay * 2^attempts секунд.
+        """
+        try:
+            self.cursor.execute('BEGIN TRANSACTION;')
+            self.cursor.executemany(
+                'DELETE FROM File_Deletions WHERE deletionID = ?',
+                [(deletion_id,) for deletion_id in done]
+            )
+            self.cursor.executemany('''
+                UPDATE File_Deletions
+                SET attempts = attempts + 1,
+                    last_error = ?,
+                    next_attempt = datetime('now', '+' || (? * (1 << attempts)) || ' seconds')
+                WHERE deletionID = ?
+            ''', [(error, retry_delay, deletion_id) for deletion_id, error in failed])
+            self.connection.commit()
         except Exception as e:
-            # При любой ошибке возвращаем БД в прежнее состояние
             self.connection.rollback()
             raise e
 
+    def file_is_referenced(self, guid: str) -> bool:
+        """Есть ли запись Files с таким guid."""
+        self.cursor.execute('SELECT 1 FROM Files WHERE guid = ?', (guid,))
+        return self.cursor.fetchone() is not None
+
+    def file_deletions_stats(self, max_attempts: int) -> dict:
+        """Размер журнала: ожидают удаления (pending) и исчерпали попытки (exhausted)."""
+        self.cursor.execute('''
+            SELECT
+                COALESCE(SUM(attempts < ?), 0)  AS pending,
+                COALESCE(SUM(attempts >= ?), 0) AS exhausted
+            FROM File_Deletions
+        ''', (max_attempts, max_attempts))
+        return dict(self.cursor.fetchone())
+
+    # -------------------------------
+    # Обслуживание БД (см. app/maintenance.py)
+
+    @_writes
+    def maintenance_acquire_lease(self, name: str, owner: str, ttl: int) -> bool:
+        """
+        Взять или продлить аренду name на ttl секунд. Удаётся, если аренды нет,
+        она уже принадлежит owner или истекла. Одним UPSERT, без гонок между процессами.
+        """
+        self.cursor.execute('''
+            INSERT INTO Maintenance_Lease (name, owner, expires_at)
+            VALUES (?, ?, datetime('now', ?))
+            ON CONFLICT(name) DO UPDATE
+                SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE Maintenance_Lease.owner = excluded.owner
+                   OR Maintenance_Lease.expires_at <= datetime('now')
+            RETURNING owner
+        ''', (name, owner, f'+{int(ttl)} seconds'))
+        acquired = self.cursor.fetchall()
+        self.connection.commit()
+        return bool(acquired)
+
+    @_writes
+    def maintenance_release_lease(self, name: str, owner: str):
+        """Отпустить аренду, если она принадлежит owner."""
+        self.cursor.execute(
+            'DELETE FROM Maintenance_Lease WHERE name = ? AND owner = ?', (name, owner)
+        )
+        self.connection.commit()
+
+    def maintenance_lease(self, name: str):
+        """Текущая аренда: {owner, expires_at} или None."""
+        self.cursor.execute('''
+            SELECT owner, expires_at FROM Maintenance_Lease
+            WHERE name = ? AND expires_at > datetime('now')
+        ''', (name,))
+        row = self.cursor.fetchone()
+        return dict(row) if row else None
+
+    @_writes
+    def maintenance_record_run(self, task: str, started_at: str, duration_ms: int,
+                               result: dict = None, error: str = None, owner: str = None):
+        """Записать итог запуска задачи (последний запуск + счётчики запусков и ошибок)."""
+        status = 'error' if error is not None else 'ok'
+        self.cursor.execute('''
+            INSERT INTO Maintenance_Runs
+                (task, started_at, finished_at, duration_ms, status, result, error, owner, runs, failures)
+            VALUES (?, ?, datetime('now'), ?, ?, ?, ?, ?, 1, ?)
+            ON CONFLICT(task) DO UPDATE SET
+                started_at  = excluded.started_at,
+                finished_at = excluded.finished_at,
+                duration_ms = excluded.duration_ms,
+                status      = excluded.status,
+                result      = excluded.result,
+                error       = excluded.error,
+                owner       = excluded.owner,
+                runs        = runs + 1,
+                failures    = failures + excluded.failures
+        ''', (task, started_at, duration_ms, status,
+              json.dumps(result, ensure_ascii=False) if result is not None else None,
+              error, owner, int(error is not None)))
+        self.connection.commit()
+
+    def maintenance_runs(self) -> list:
+        """Последние запуски задач обслуживания (result разобран из JSON)."""
+        self.cursor.execute('''
+            SELECT task, started_at, finished_at, duration_ms, status, result, error,
+                   owner, runs, failures
+            FROM Maintenance_Runs
+            ORDER BY task
+        ''')
+        runs = []
+        for row in self.cursor.fetchall():
+            run = dict(row)
+            run['result'] = json.loads(run['result']) if run['result'] else None
+            runs.append(run)
+        return runs
+
+    @_writes
+    def wal_checkpoint(self, mode: str = 'TRUNCATE') -> dict:
+        """
+        Перенести WAL в основной файл. TRUNCATE ещё и обрезает -wal до нуля.
+        busy = 1 — читатели или писатель не дали завершить checkpoint (повторится позже).
+        """
+        if mode not in ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'):
+            raise ValueError(f"Недопустимый режим checkpoint: {mode}")
+        self.cursor.execute(f'PRAGMA wal_checkpoint({mode})')
+        busy, log_frames, checkpointed = self.cursor.fetchone()
+        return {"mode": mode, "busy": busy, "log_frames": log_frames, "checkpointed": checkpointed}
+
+    @_writes
+    def optimize(self, analysis_limit: int = 1000) -> dict:
+        """
+        Обновить статистику планировщика запросов.
+        До SQLite 3.46 PRAGMA optimize смотрит только таблицы, которые читало это же
+        соединение, — для отдельного соединения обслуживания это пусто, поэтому там
+        выполняется ANALYZE; analysis_limit ограничивает число строк, читаемых на индекс.
+        """
+        self.cursor.execute(f'PRAGMA analysis_limit = {int(analysis_limit)}')
+        if sqlite3.sqlite_version_info >= (3, 46, 0):
+            # 0x10000 — проверить все таблицы, 0x02 — ANALYZE там, где это нужно
+            self.cursor.execute('PRAGMA optimize = 0x10002')
+            method = 'optimize'
+        else:
+            self.cursor.execute('ANALYZE')
+            method = 'analyze'
+        self.connection.commit()
+        return {"method": method, "analysis_limit": analysis_limit}
+
+    # -------------------------------
+    # Фоновые задания (см. app/jobs.py)
+
+    @_writes
+    def job_submit(self, kind: str, params: dict = None, created_by: int = None):
+        """
+        Поставить задание в очередь. Если такое же (вид и параметры) уже ждёт
+        или выполняется, новое не создаётся. Возвращает (задание, создано ли оно).
+        """
+        params_json = json.dumps(params or {}, sort_keys=True)
+        self.cursor.execute('BEGIN IMMEDIATE;')
+        try:
+            self.cursor.execute('''
+                SELECT jobID FROM Jobs
+                WHERE kind = ? AND params = ? AND status IN ('queued', 'running')
+                ORDER BY jobID
+                LIMIT 1
+            ''', (kind, params_json))
+            row = self.cursor.fetchone()
+            created = row is None
+            if created:
+                self.cursor.execute(
+                    'INSERT INTO Jobs (kind, params, created_by) VALUES (?, ?, ?) RETURNING jobID',
+                    (kind, params_json, created_by)
+                )
+                row = self.cursor.fetchone()
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return self.job_get(row[0]), created
+
+    @_writes
+    def job_claim(self, owner: str, lease: int):
+        """
+        Взять следующее задание: ожидающее или брошенное (аренда истекла —
+        обработчик пропал). Одним UPDATE ... RETURNING, без гонок между обработчиками.
+        Возвращает задание или None.
+        """
+        claimable = f'''
+            status = 'queued'
+            OR (status = 'running' AND lease_until <= strftime('{SQL_DATETIME_MS}', 'now'))
+        '''
+        # Сначала только чтение: простаивающий обработчик не встаёт в очередь за блокировкой записи
+        self.cursor.execute(f'SELECT 1 FROM Jobs WHERE {claimable} LIMIT 1')
+        found = self.cursor.fetchone()
+        self.connection.commit()
+        if found is None:
+            return None
+
+        self.cursor.execute(f'''
+            UPDATE Jobs
+            SET status      = 'running',
+                owner       = :owner,
+                lease_until = strftime('{SQL_DATETIME_MS}', 'now', :lease),
+                started_at  = coalesce(started_at, strftime('{SQL_DATETIME_MS}', 'now')),
+                updated_at  = strftime('{SQL_DATETIME_MS}', 'now')
+            WHERE jobID = (
+                SELECT jobID FROM Jobs
+                WHERE {claimable}
+                ORDER BY jobID
+                LIMIT 1
+            )
+            RETURNING jobID
+        ''', {"owner": owner, "lease": f'+{int(lease)} seconds'})
+        row = self.cursor.fetchone()
+        self.connection.commit()
+        return self.job_get(row[0]) if row else None
+
+    @_writes
+    def job_update(self, job_id: int, owner: str, state: dict = None, total: int = None) -> bool:
+        """Записать позицию и/или оценку объёма задания. False — задание уже не у owner."""
+        self.cursor.execute(f'''
+            UPDATE Jobs
+            SET state      = coalesce(:state, state),
+                total      = coalesce(:total, total),
+                updated_at = strftime('{SQL_DATETIME_MS}', 'now')
+            WHERE jobID = :job_id AND owner = :owner AND status = 'running'
+        ''', {"state": json.dumps(state) if state is not None else None,
+              "total": total, "job_id": job_id, "owner": owner})
+        self.connection.commit()
+        return self.cursor.rowcount == 1
+
+    @_writes
+    def job_step(self, job_id: int, owner: str, operation: str, params: dict,
+                 state: dict, batch_size: int, lease: int):
+        """
+        Одна пачка операции operation (BULK_OPERATIONS) для задания. Пачка и
+        отметка прогресса (processed, state.after_id, продление аренды) — одна
+        транзакция, поэтому после сбоя задание продолжается с места остановки.
+        Возвращает ключи обработанных строк или None, если задание уже не у owner.
+        """
+        self.cursor.execute('BEGIN IMMEDIATE;')
+        try:
+            ids = self._bulk_batch(operation, params, state.get('after_id', 0), batch_size)
+            self.cursor.execute(f'''
+                UPDATE Jobs
+                SET processed   = processed + :count,
+                    batches     = batches + 1,
+                    state       = :state,
+                    updated_at  = strftime('{SQL_DATETIME_MS}', 'now'),
+                    lease_until = strftime('{SQL_DATETIME_MS}', 'now', :lease)
+                WHERE jobID = :job_id AND owner = :owner AND status = 'running'
+            ''', {
+                "count":  len(ids),
+                "state":  json.dumps(self.job_state_after(state, operation, ids)),
+                "lease":  f'+{int(lease)} seconds',
+                "job_id": job_id,
+                "owner":  owner,
+            })
+            if self.cursor.rowcount != 1:
+                self.connection.rollback()
+                return None
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return ids
+
+    @staticmethod
+    def job_state_after(state: dict, operation: str, ids: list) -> dict:
+        """Позиция задания после пачки: последний ключ и число строк по операциям."""
+        counts = dict(state.get('counts', {}))
+        counts[operation] = counts.get(operation, 0) + len(ids)
+        return dict(state, after_id=max(ids, default=state.get('after_id', 0)), counts=counts)
+
+    @_writes
+    def job_finish(self, job_id: int, owner: str, result: dict = None, error: str = None) -> bool:
+        """Завершить задание (error — с ошибкой). False — задание уже не у owner."""
+        self.cursor.execute(f'''
+            UPDATE Jobs
+            SET status      = :status,
+                result      = :result,
+                error       = :error,
+                lease_until = NULL,
+                updated_at  = strftime('{SQL_DATETIME_MS}', 'now'),
+                finished_at = strftime('{SQL_DATETIME_MS}', 'now')
+            WHERE jobID = :job_id AND owner = :owner AND status = 'running'
+        ''', {
+            "status": 'failed' if error is not None else 'done',
+            "result": json.dumps(result, ensure_ascii=False) if result is not None else None,
+            "error":  error,
+            "job_id": job_id,
+            "owner":  owner,
+        })
+        self.connection.commit()
+        return self.cursor.rowcount == 1
+
+    def job_get(self, job_id: int):
+        """Задание по ID (params, state и result разобраны из JSON) или None."""
+        self.cursor.execute(f'SELECT {JOB_COLUMNS} FROM Jobs WHERE jobID = ?', (job_id,))
+        row = self.cursor.fetchone()
+        return _job_from_row(row) if row else None
+
+    def jobs_recent(self, limit: int = 50) -> list:
+        """Последние задания, новые первыми."""
+        self.cursor.execute(f'SELECT {JOB_COLUMNS} FROM Jobs ORDER BY jobID DESC LIMIT ?', (limit,))
+        return [_job_from_row(row) for row in self.cursor.fetchall()]
+
+    def jobs_stats(self) -> dict:
+        """Число заданий по статусам."""
+        self.cursor.execute('SELECT status, count(*) FROM Jobs GROUP BY status')
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        counts.update({row[0]: row[1] for row in self.cursor.fetchall()})
+        return counts
+
     # -------------------------------
     # Методы для юзеров (Users)
 
@@ -595,6 +1682,7 @@ class Storage(object):
         self.cursor.execute('''SELECT userID, password, user_role FROM Users WHERE auth_token = ?''', (token,))
         return self.cursor.fetchone()
 
+    @_writes
     def user_set_token(self, user_id, token):
         self.cursor.execute('''UPDATE Users SET auth_token = ? WHERE userID = ?''', (token, user_id))
         self.connection.commit()
@@ -626,32 +1714,94 @@ class Storage(object):
         ''', (login,))
         return self.cursor.fetchone()
 
-    def user_create(self, login: str, password: str, nickname: str, role: str = "Publisher"):
+    def user_get_by_login_key(self, login: str):
+        """
+        Get user by normalized login (NFKC + casefold) with password hash.
+        Точное совпадение логина важнее: у пользователей, чьи логины совпадали
+        без учёта регистра до миграции 3, ключ получил суффикс (см. _dedupe_keys).
+        """
+        self.cursor.execute('''
+            SELECT userID, password, user_role, nick, login
+            FROM Users
+            WHERE login_key = :key OR login = :login
+            ORDER BY login = :login DESC
+            LIMIT 1
+        ''', {"key": normalize_key(login), "login": login})
+        return self.cursor.fetchone()
+
+    def user_find_conflict(self, login: str = None, nick: str = None, exclude_id: int = None):
+        """
+        Проверить, заняты ли логин/ник другим пользователем (по нормализованным ключам).
+        Возвращает 'login', 'nick' или None.
+        """
+        if login is not None:
+            self.cursor.execute(
+                "SELECT userID FROM Users WHERE login_key = ?", (normalize_key(login),)
+            )
+            row = self.cursor.fetchone()
+            if row and row['userID'] != exclude_id:
+                return 'login'
+        if nick is not None:
+            self.cursor.execute(
+                "SELECT userID FROM Users WHERE nick_key = ?", (normalize_key(nick),)
+            )
+            row = self.cursor.fetchone()
+            if row and row['userID'] != exclude_id:
+                return 'nick'
+        return None
+
+    @_writes
+    def user_create(self, login: str, password: str, nickname: str, role: str = "Publisher",
+                    password_hash: str = None):
+        """
+        Создать пользователя. password_hash — уже посчитанный хэш пароля
+        (маршруты считают его в пуле процессов, см. app/passwords.py);
+        без него хэш считается здесь же.
+        """
         if role not in ("Administrator", "Moderator", "Publisher"):
             role = "Publisher"
         
         # Проверка уникальности
-        if self.cursor.fetchone():
+        if self.user_find_conflict(login=login, nick=nickname):
             raise ValueError("Пользователь с таким логином или ником уже существует")
 
-        hashed_password = generate_password_hash(password)
+        hashed_password = password_hash or generate_password_hash(password)
         
         # Добавляем реальный пароль (ТОЛЬКО ДЛЯ ТЕСТИРОВАНИЯ)
         self.cursor.execute('''
-            INSERT INTO Users (login, password, real_password, nick, user_role)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (login, hashed_password, password, nickname, role))
+            INSERT INTO Users (login, login_key, password, real_password, nick, nick_key, user_role)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (login, normalize_key(login), hashed_password, password,
+              nickname, normalize_key(nickname), role))
         self.connection.commit()
         return self.cursor.lastrowid
 
+    @_writes
+    def user_set_password_hash(self, user_id: int, new_hash: str, old_hash: str) -> bool:
+        """
+        Заменить хэш пароля (перехэширование при входе), только если он всё ещё old_hash —
+        параллельная смена пароля не затирается. Возвращает True, если хэш заменён.
+        """
+        self.cursor.execute(
+            'UPDATE Users SET password = ? WHERE userID = ? AND password = ?',
+            (new_hash, user_id, old_hash)
+        )
+        self.connection.commit()
+        return self.cursor.rowcount == 1
+
     def user_get_all(self) -> list:
         """Get all users"""
-        self.cursor.execute('''
-            SELECT userID, login, nick, user_role, registration_date 
-            FROM Users
-            ORDER BY userID
-        ''')
-        return [dict(row) for row in self.cursor.fetchall()]
+        return list(self.iter_users())
+
+    def iter_users(self):
+        """Users one at a time, read in short keyset batches (see _iter_keyset)"""
+        for rows in self._iter_keyset(
+            'SELECT userID, login, nick, user_role, registration_date FROM Users',
+            where='1',
+            keys=(('userID', 'userID'),)
+        ):
+            for row in rows:
+                yield dict(row)
 
     def user_get_all_with_passwords(self) -> list:
         """Get all users with password hashes (for admin only)"""
@@ -673,6 +1823,7 @@ class Storage(object):
         ''')
         return [dict(row) for row in self.cursor.fetchall()]
             
+    @_writes
     def user_update(self, user_id, update_data):
         """Обновить данные пользователя"""
         # Проверка существования пользователя
@@ -686,88 +1837,79 @@ class Storage(object):
         if not updates:
             raise ValueError("Нет допустимых полей для обновления")
 
+        conflict = self.user_find_conflict(
+            login=updates.get("login"), nick=updates.get("nick"), exclude_id=user_id
+        )
+        if conflict == "login":
+            raise ValueError(f"Логин '{updates['login']}' уже используется")
+        if conflict == "nick":
+            raise ValueError(f"Никнейм '{updates['nick']}' уже используется")
+
+        # Нормализованные ключи обновляются вместе с самими полями
         if "login" in updates:
-            self.cursor.execute(
-                "SELECT 1 FROM Users WHERE lower(login) = lower(?) AND userID != ?",
-                (updates["login"], user_id)
-            )
-            if self.cursor.fetchone():
-                raise ValueError(f"Логин '{updates['login']}' уже используется")
+            updates["login_key"] = normalize_key(updates["login"])
         if "nick" in updates:
-            self.cursor.execute(
-                "SELECT 1 FROM Users WHERE lower(nick) = lower(?) AND userID != ?",
-                (updates["nick"], user_id)
-            )
-            if self.cursor.fetchone():
-                raise ValueError(f"Никнейм '{updates['nick']}' уже используется")
-
+            updates["nick_key"] = normalize_key(updates["nick"])
 
         set_clause = ", ".join([f"{field} = ?" for field in updates.keys()])
         values = list(updates.values()) + [user_id]
         self.cursor.execute(f"UPDATE Users SET {set_clause} WHERE userID = ?", values)
         self.connection.commit()
 
+    @_writes
     def user_delete(self, user_id):
         """Delete user by ID"""
         self.cursor.execute("DELETE FROM Users WHERE userID = ?", (user_id,))
         self.connection.commit()
 
-    def users_delete_all(self, exclude_ids: list):
-        try:
-            # Находим первого администратора
-            self.cursor.execute('''
-                SELECT userID FROM Users 
-                WHERE user_role = 'Administrator' 
-                ORDER BY userID ASC 
-                LIMIT 1
-            ''')
-            first_admin = self.cursor.fetchone()
-            
-            # Формируем окончательный список исключений
-            final_exclude = exclude_ids.copy()
-            if first_admin:
-                final_exclude.append(first_admin['userID'])
-            
-            # Удаляем дубликаты
-            final_exclude = list(set(final_exclude))
-            
-            # Если список исключений пуст, добавляем несуществующий ID
-            placeholders = ','.join(['?'] * len(final_exclude)) if final_exclude else 'NULL'
-            
-            # Удаляем всех, кроме исключенных ID
-            query = f'''
-                DELETE FROM Users 
-                WHERE userID NOT IN ({placeholders})
-            '''
-            self.cursor.execute(query, final_exclude)
-            
-            self.connection.commit()
-            return True
-        except Exception as e:
-            self.connection.rollback()
-            raise e
+    def users_delete_exclusions(self, exclude_ids: list) -> list:
+        """ID пользователей, которых массовое удаление не трогает: exclude_ids и первый администратор."""
+        self.cursor.execute('''
+            SELECT userID FROM Users 
+            WHERE user_role = 'Administrator' 
+            ORDER BY userID ASC 
+            LIMIT 1
+        ''')
+        first_admin = self.cursor.fetchone()
+        final_exclude = set(exclude_ids)
+        if first_admin:
+            final_exclude.add(first_admin['userID'])
+        return sorted(final_exclude)
+
+    @_writes
+    def users_delete_all(self, exclude_ids: list, batch_size: int = BULK_BATCH_SIZE) -> int:
+        """
+        Удалить всех пользователей, кроме exclude_ids и первого администратора.
+        Сначала пачками удаляются их новости (с файлами — через триггеры), затем
+        сами пользователи (см. BULK_OPERATIONS). Возвращает число удалённых пользователей.
+        """
+        params = {"exclude": self.users_delete_exclusions(exclude_ids)}
+        self.bulk_run('users_news_delete', params, batch_size=batch_size)
+        return self.bulk_run('users_delete', params, batch_size=batch_size)
 
     # -------------------------------
     # Методы для категорий (Categories)
 
+    @_writes
     def category_create(self, name: str, description: str = None) -> int:
         """Создать категорию"""
         if not name.strip():
             raise ValueError("Category name cannot be empty")
         try:
-            if self.cursor.fetchone():
+            if self.category_get_by_name_key(name):
                 raise ValueError(f"Категория с названием '{name}' уже существует")
 
             self.cursor.execute('''
-                INSERT INTO Categories (name, description, create_date)
-                VALUES (?, ?, datetime('now', 'localtime'))
-            ''', (name, description))
+                INSERT INTO Categories (name, name_key, description, create_date)
+                VALUES (?, ?, ?, datetime('now', 'localtime'))
+            ''', (name, normalize_key(name), description))
 
             self.connection.commit()
             return self.cursor.lastrowid
         except sqlite3.IntegrityError:
             raise ValueError(f"Category '{name}' already exists")
 
+    @_writes
     def category_update(self, category_id: int, name: str, description: str = None):
         """Обновить категорию"""
         # Проверяем существование категории
@@ -778,33 +1920,135 @@ class Storage(object):
         # Выполняем обновление
         self.cursor.execute('''
             UPDATE Categories 
-            SET name = ?, description = ?
+            SET name = ?, name_key = ?, description = ?
             WHERE categoryID = ?
-        ''', (name, description, category_id))
+        ''', (name, normalize_key(name), description, category_id))
 
         if self.cursor.rowcount == 0:
             raise ValueError("Не удалось обновить категорию")
 
         self.connection.commit()
 
+    @_writes
     def category_delete(self, category_id: int):
         """Удалить категорию"""
         self.cursor.execute('DELETE FROM Categories WHERE categoryID = ?', (category_id,))
         self.connection.commit()
 
+    @_writes
     def category_delete_all(self):
         """Удалить все категории"""
         self.cursor.execute('DELETE FROM Categories')
         self.connection.commit()
 
+    def category_get_by_name_key(self, name: str):
+        """Найти категорию по нормализованному названию (NFKC + casefold)"""
+        self.cursor.execute(
+            'SELECT categoryID, name FROM Categories WHERE name_key = ?',
+            (normalize_key(name),)
+        )
+        return self.cursor.fetchone()
+
     def category_get_all(self) -> list:
         """Получить все категории"""
-        self.cursor.execute('SELECT * FROM Categories ORDER BY create_date DESC')
+        self.cursor.execute('''
+            SELECT categoryID, name, description, create_date
+            FROM Categories
+            ORDER BY create_date DESC
+        ''')
         return [dict(row) for row in self.cursor.fetchall()]
 
+    # -------------------------------
+    # Переходы статусов новости (модерация, архив, восстановление из корзины)
+
+    @_writes
+    def news_transition(self, news_id: int, action: str, moderator_id: int = None):
+        """
+        Применить переход action (см. NEWS_TRANSITIONS) одним условным UPDATE:
+        новость меняется, только если её текущее состояние допускает переход,
+        поэтому два модератора не могут обработать одну новость дважды.
+        Возвращает (новость, причина):
+        ● ({newsID, status}, None) — переход применён;
+        ● (None, 'not_found') — новости нет там, где ждёт переход (или нет вовсе);
+        ● (None, 'conflict') — новость на месте, но её статус не допускает переход.
+        """
+        transition = NEWS_TRANSITIONS[action]
+        try:
+            self.cursor.execute(f'''
+                UPDATE News
+                SET {transition['set']}
+                WHERE newsID = :news_id AND {_transition_where(transition)}
+                RETURNING newsID, status
+            ''', {"news_id": news_id, "moderator": moderator_id})
+            row = self.cursor.fetchone()
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        if row is not None:
+            return dict(row), None
+
+        # Переход не применён — выясняем почему (только на этом, редком, пути)
+        self.cursor.execute('SELECT delete_date FROM News WHERE newsID = ?', (news_id,))
+        current = self.cursor.fetchone()
+        if current is None or (current['delete_date'] is not None) != transition['trash']:
+            return None, 'not_found'
+        return None, 'conflict'
+
+    @_writes
+    def news_transition_many(self, items: list, moderator_id: int = None, chunk_size: int = 500) -> dict:
+        """
+        Пакетный переход статусов: items — список (newsID, действие) без повторов newsID.
+        Вся пачка — одна транзакция: для каждого действия один условный UPDATE
+        на chunk_size новостей (ID передаются JSON-массивом через json_each),
+        moderated_byID — один параметр на весь запрос.
+        Возвращает {newsID: (новость, причина)} в формате news_transition.
+        """
+        by_action = {}
+        for news_id, action in items:
+            by_action.setdefault(action, []).append(news_id)
+
+        outcomes = {}
+        self.cursor.execute('BEGIN IMMEDIATE;')
+        try:
+            for action, news_ids in by_action.items():
+                transition = NEWS_TRANSITIONS[action]
+                for chunk in _batched(news_ids, chunk_size):
+                    params = {"ids": json.dumps(chunk), "moderator": moderator_id}
+                    self.cursor.execute(f'''
+                        UPDATE News
+                        SET {transition['set']}
+                        WHERE newsID IN (SELECT value FROM json_each(:ids))
+                          AND {_transition_where(transition)}
+                        RETURNING newsID, status
+                    ''', params)
+                    for row in self.cursor.fetchall():
+                        outcomes[row['newsID']] = (dict(row), None)
+
+                    # Не применённые: одна выборка на пачку, чтобы отличить «нет» от «не тот статус»
+                    missed = [news_id for news_id in chunk if news_id not in outcomes]
+                    if not missed:
+                        continue
+                    self.cursor.execute('''
+                        SELECT newsID, delete_date FROM News
+                        WHERE newsID IN (SELECT value FROM json_each(?))
+                    ''', (json.dumps(missed),))
+                    in_trash = {row['newsID']: row['delete_date'] is not None for row in self.cursor.fetchall()}
+                    for news_id in missed:
+                        if in_trash.get(news_id, not transition['trash']) != transition['trash']:
+                            outcomes[news_id] = (None, 'not_found')
+                        else:
+                            outcomes[news_id] = (None, 'conflict')
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return outcomes
+
     # -------------------------------
     # Методы для корзины (Trash / Soft Delete)
 
+    @_writes
     def news_soft_delete(self, newsID: int):
         """
         Мягкое удаление: 
@@ -826,115 +2070,158 @@ class Storage(object):
             self.connection.rollback()
             raise e
 
-    def news_soft_delete_multiple(self, newsIDs: list):
-        """Мягкое удаление сразу нескольких новостей."""
-        try:
-            self.cursor.execute('BEGIN TRANSACTION;')
-            placeholders = ','.join(['?'] * len(newsIDs))
-            self.cursor.execute(f'''
-                UPDATE News
-                SET delete_date = datetime('now', 'localtime'),
-                    archive_date = NULL,
-                    publish_date = NULL
-                WHERE newsID IN ({placeholders})
-            ''', newsIDs)
-            self.connection.commit()
-        except Exception as e:
-            self.connection.rollback()
-            raise e
+    def news_soft_delete_multiple(self, newsIDs: list) -> int:
+        """Мягкое удаление сразу нескольких новостей. Возвращает число изменённых."""
+        return self._news_apply_ids(f'''
+            UPDATE News
+            SET {NEWS_SOFT_DELETE_SET}
+            WHERE delete_date IS NULL AND newsID IN ({{placeholders}})
+        ''', newsIDs)
 
-    def restore_news(self, newsIDs: list):
+    def restore_news(self, newsIDs: list) -> int:
         """
         Восстановление новостей из корзины:
         ● Сбрасываем delete_date,
         ● Очищаем archive_date и publish_date,
         ● Переводим статус → 'Pending' (чтобы новость шла повторно на модерацию).
+        Возвращает число восстановленных.
         """
-        try:
-            self.cursor.execute('BEGIN TRANSACTION;')
-            placeholders = ','.join(['?'] * len(newsIDs))
-            self.cursor.execute(f'''
-                UPDATE News
-                SET delete_date = NULL,
-                    archive_date = NULL,
-                    publish_date = NULL,
-                    status = 'Pending'
-                WHERE newsID IN ({placeholders})
-            ''', newsIDs)
-            self.connection.commit()
-        except Exception as e:
-            self.connection.rollback()
-            raise e
+        return self._news_apply_ids(f'''
+            UPDATE News
+            SET {NEWS_TRANSITIONS['restore']['set']}
+            WHERE delete_date IS NOT NULL AND newsID IN ({{placeholders}})
+        ''', newsIDs)
+
+    def purge_news(self, newsIDs: list) -> int:
+        """
+        Окончательное удаление новостей. Возвращает число удалённых.
+        Триггер delete_news_files снимает связи и удаляет записи Files, на которые
+        больше никто не ссылается; их guid в той же транзакции попадают в журнал
+        File_Deletions, и файлы с диска удаляет фоновый обработчик (app/file_deletions.py).
+        """
+        return self._news_apply_ids('''
+            DELETE FROM News
+            WHERE newsID IN ({placeholders})
+        ''', newsIDs)
 
-    def purge_news(self, newsIDs: list):
+    @_writes
+    def _news_apply_ids(self, statement: str, newsIDs: list) -> int:
         """
-        Окончательное удаление новостей:
-        ● Сначала собираем все файлы (guid) для удаления из ФС,
-        ● Удаляем записи в News (CASCADE по File_Link → Files),
-        ● Затем удаляем файлы с диска.
+        Выполнить statement для списка ID одной транзакцией, подставляя ID
+        пачками не длиннее SQLITE_MAX_VARIABLES. Блокировка записи берётся сразу
+        (BEGIN IMMEDIATE): с отложенной транзакцией запрос с длинным IN при
+        параллельной записи получает SQLITE_BUSY без ожидания. Возвращает число затронутых строк.
         """
+        affected = 0
         try:
-            self.cursor.execute('BEGIN TRANSACTION;')
+            self.cursor.execute('BEGIN IMMEDIATE;')
+            for chunk in _batched(newsIDs, SQLITE_MAX_VARIABLES):
+                self.cursor.execute(statement.format(placeholders=','.join('?' * len(chunk))), chunk)
+                affected += self.cursor.rowcount
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        return affected
 
-            placeholders = ','.join(['?'] * len(newsIDs))
-            # Сбор guid всех файлов для удаления из ФС
-            self.cursor.execute(f'''
-                SELECT f.guid
-                FROM Files f
-                JOIN File_Link fl ON fl.fileID = f.fileID
-                WHERE fl.newsID IN ({placeholders})
-            ''', newsIDs)
-            files_to_delete = [row[0] for row in self.cursor.fetchall()]
+    def news_soft_delete_all(self, batch_size: int = BULK_BATCH_SIZE) -> int:
+        """Мягко удалить все не удалённые новости. Возвращает их число."""
+        return self.bulk_run('news_soft_delete_all', batch_size=batch_size)
 
-            # Удаляем сами новости (и связанные через FK)
-            self.cursor.execute(f'''
-                DELETE FROM News
-                WHERE newsID IN ({placeholders})
-            ''', newsIDs)
-
-            # Физически удаляем файлы с диска
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            for fname in files_to_delete:
-                file_path = os.path.join(upload_folder, fname)
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except Exception as e:
-                        print(f"Ошибка удаления файла {file_path}: {e}")
+    def news_soft_delete_archived(self, batch_size: int = BULK_BATCH_SIZE) -> int:
+        """Переместить в корзину все архивные новости. Возвращает их число."""
+        return self.bulk_run('news_soft_delete_archived', batch_size=batch_size)
 
-            self.connection.commit()
-        except Exception as e:
-            self.connection.rollback()
-            raise e
+    def purge_trash(self, batch_size: int = BULK_BATCH_SIZE) -> int:
+        """Окончательно удалить все новости корзины (см. purge_news). Возвращает их число."""
+        return self.bulk_run('purge_trash', batch_size=batch_size)
 
-    def purge_expired_news(self, days=30):
+    def purge_expired_news(self, days=30, batch_size: int = PURGE_BATCH_SIZE, max_batches: int = None):
         """
         Удаляет из корзины новости, 
         у которых delete_date старее, чем now - days.
+        Удаление идёт пачками по batch_size, каждая — своей короткой транзакцией
+        (bulk_run), чтобы не держать блокировку записи на всё время очистки;
+        max_batches ограничивает объём одного вызова (остаток — при следующем).
+        Возвращает число удалённых новостей.
         """
-        try:
-            self.cursor.execute('BEGIN TRANSACTION;')
-            self.cursor.execute('''
-                SELECT newsID
-                FROM News
-                WHERE delete_date <= datetime('now', ?)
-            ''', (f'-{days} days',))
-            news_ids = [row[0] for row in self.cursor.fetchall()]
-            if news_ids:
-                self.purge_news(news_ids)
-            self.connection.commit()
-            return len(news_ids)
-        except Exception as e:
-            self.connection.rollback()
-            raise e
+        return self.bulk_run(
+            'purge_expired',
+            {"age": f'-{days} days'},
+            batch_size=batch_size,
+            max_batches=max_batches
+        )
+
+    # -------------------------------
+    # Массовые операции по условию (BULK_OPERATIONS)
+
+    def bulk_count(self, operation: str, params: dict = None) -> int:
+        """Сколько строк сейчас подходит под условие операции."""
+        spec = BULK_OPERATIONS[operation]
+        self.cursor.execute(
+            f"SELECT count(*) FROM {spec['table']} WHERE {spec['where']}", _bulk_params(params)
+        )
+        return self.cursor.fetchone()[0]
+
+    @_writes
+    def bulk_run(self, operation: str, params: dict = None,
+                 batch_size: int = BULK_BATCH_SIZE, max_batches: int = None) -> int:
+        """
+        Выполнить операцию над всеми подходящими строками без выборки ID в Python:
+        пачками по batch_size строк, каждая — своей короткой транзакцией
+        (блокировка записи не держится на всё время операции).
+        max_batches ограничивает объём одного вызова. Возвращает число затронутых строк.
+        """
+        affected = 0
+        batches = 0
+        after_id = 0
+        while max_batches is None or batches < max_batches:
+            try:
+                self.cursor.execute('BEGIN IMMEDIATE;')
+                ids = self._bulk_batch(operation, params, after_id, batch_size)
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+            if not ids:
+                break
+            affected += len(ids)
+            batches += 1
+            after_id = max(ids)
+            if len(ids) < batch_size:
+                break
+        return affected
+
+    def _bulk_batch(self, operation: str, params: dict, after_id: int, batch_size: int) -> list:
+        """
+        Одна пачка операции внутри уже открытой транзакции: следующие по ключу
+        строки после after_id, поэтому каждая строка просматривается один раз.
+        Возвращает ключи затронутых строк.
+        """
+        spec = BULK_OPERATIONS[operation]
+        self.cursor.execute(f'''
+            {spec['statement']}
+            WHERE {spec['key']} IN (
+                SELECT {spec['key']} FROM {spec['table']}
+                WHERE {spec['key']} > :after_id AND {spec['where']}
+                ORDER BY {spec['key']}
+                LIMIT :batch_size
+            )
+            RETURNING {spec['key']}
+        ''', dict(_bulk_params(params), after_id=after_id, batch_size=batch_size))
+        return [row[0] for row in self.cursor.fetchall()]
 
     def get_deleted_news(self) -> list:
         """
         Возвращает список всех «удалённых» (в корзине) новостей:
         WHERE delete_date IS NOT NULL
         """
-        self.cursor.execute('''
-            SELECT
+        return list(self.iter_deleted_news())
+
+    def iter_deleted_news(self):
+        """Новости корзины по одной за раз (см. get_deleted_news)."""
+        return self._iter_news(
+            columns='''
                 n.newsID,
                 n.title,
                 n.description,
@@ -947,46 +2234,10 @@ class Storage(object):
                 um.nick   AS moderator_nick,
                 c.name    AS category_name,
                 n.delete_date
-            FROM News n
-            JOIN Users up ON up.userID = n.publisherID
-            LEFT JOIN Users um ON um.userID = n.moderated_byID
-            LEFT JOIN Categories c ON c.categoryID = n.categoryID
-            WHERE n.delete_date IS NOT NULL
-            ORDER BY n.delete_date DESC
-        ''')
-
-        news_items = []
-        for row in self.cursor.fetchall():
-            nid = row['newsID']
-            self.cursor.execute('''
-                SELECT f.fileID, guid, format
-                FROM Files f
-                JOIN File_Link fl ON fl.fileID = f.fileID
-                WHERE fl.newsID = ?
-                ORDER BY f.fileID ASC
-            ''', (nid,))
-            files = [{
-                'fileID':    r['fileID'],
-                'fileName':  r['guid'],
-                'fileFormat':r['format']
-            } for r in self.cursor.fetchall()]
-
-            news_items.append({
-                'newsID':         nid,
-                'title':          row['title'],
-                'description':    row['description'],
-                'status':         row['status'],
-                'create_date':    row['create_date'],
-                'publish_date':   row['publish_date'],
-                'event_start':    row['event_start'],
-                'event_end':      row['event_end'],
-                'publisher_nick': row['publisher_nick'],
-                'moderator_nick': row['moderator_nick'],
-                'category_name':  row['category_name'],
-                'delete_date':    row['delete_date'],
-                'files':          files
-            })
-        return news_items
+            ''',
+            where='n.delete_date IS NOT NULL',
+            keys=(('n.delete_date', 'delete_date'), ('n.newsID', 'newsID'))
+        )
 
     def get_deleted_news_single(self, news_id):
         """Получить одну «удалённую» новость (delete_date IS NOT NULL)."""
@@ -1004,8 +2255,8 @@ class Storage(object):
                 publisher_nick, category_name, files: [...]}
         """
         try:
-            self.cursor.execute('''
-                SELECT
+            return self._fetch_news(
+                columns='''
                     n.newsID,
                     n.title,
                     n.description,
@@ -1015,44 +2266,10 @@ class Storage(object):
                     n.event_end,
                     up.nick   AS publisher_nick,
                     c.name    AS category_name
-                FROM News n
-                JOIN Users up ON up.userID = n.publisherID
-                LEFT JOIN Categories c ON c.categoryID = n.categoryID
-                WHERE n.status = 'Pending'
-                AND n.delete_date IS NULL
-                ORDER BY n.create_date DESC
-            ''')
-
-            pending_items = []
-            for row in self.cursor.fetchall():
-                nid = row['newsID']
-                # Получаем список файлов
-                self.cursor.execute('''
-                    SELECT f.fileID, guid, format
-                    FROM Files f
-                    JOIN File_Link fl ON fl.fileID = f.fileID
-                    WHERE fl.newsID = ?
-                    ORDER BY f.fileID ASC
-                ''', (nid,))
-                files = [{
-                    'fileID':    r['fileID'],
-                    'fileName':  r['guid'],
-                    'fileFormat': r['format']
-                } for r in self.cursor.fetchall()]
-
-                pending_items.append({
-                    'newsID':         nid,
-                    'title':         row['title'],
-                    'description':    row['description'],
-                    'status':         row['status'],
-                    'create_date':    row['create_date'],
-                    'event_start':    row['event_start'],
-                    'event_end':      row['event_end'],
-                    'publisher_nick': row['publisher_nick'],
-                    'category_name':  row['category_name'],
-                    'files':          files
-                })
-            return pending_items
+                ''',
+                where="n.status = 'Pending' AND n.delete_date IS NULL",
+                order_by='n.create_date DESC'
+            )
 
         except sqlite3.OperationalError as e:
             raise sqlite3.DatabaseError(
@@ -1068,8 +2285,12 @@ class Storage(object):
         Возвращает список всех «архивных» новостей:
         WHERE status = 'Archived' AND delete_date IS NULL AND archive_date IS NOT NULL
         """
-        self.cursor.execute('''
-            SELECT
+        return list(self.iter_archived_news())
+
+    def iter_archived_news(self):
+        """Архивные новости по одной за раз (см. get_archived_news)."""
+        return self._iter_news(
+            columns='''
                 n.newsID,
                 n.title,
                 n.description,
@@ -1082,127 +2303,95 @@ class Storage(object):
                 um.nick    AS moderator_nick,
                 c.name     AS category_name,
                 n.archive_date
-            FROM News n
-            JOIN Users up ON up.userID = n.publisherID
-            LEFT JOIN Users um ON um.userID = n.moderated_byID
-            LEFT JOIN Categories c ON c.categoryID = n.categoryID
-            WHERE n.status = 'Archived'
-              AND n.archive_date IS NOT NULL
-              AND n.delete_date IS NULL
-            ORDER BY n.archive_date DESC
-        ''')
-
-        archived_items = []
-        for row in self.cursor.fetchall():
-            nid = row['newsID']
-            self.cursor.execute('''
-                SELECT
-                    f.fileID,
-                    guid AS fileName,
-                    format AS fileFormat
-                FROM Files f
-                JOIN File_Link fl ON fl.fileID = f.fileID
-                WHERE fl.newsID = ?
-                ORDER BY f.fileID ASC
-            ''', (nid,))
-            files = [{
-                'fileID':    r['fileID'],
-                'fileName':  r['fileName'],
-                'fileFormat':r['fileFormat']
-            } for r in self.cursor.fetchall()]
-
-            archived_items.append({
-                'newsID':         nid,
-                'title':          row['title'],
-                'description':    row['description'],
-                'status':         row['status'],
-                'create_date':    row['create_date'],
-                'publish_date':   row['publish_date'],
-                'event_start':    row['event_start'],
-                'event_end':      row['event_end'],
-                'archive_date':   row['archive_date'],
-                'publisher_nick': row['publisher_nick'],
-                'moderator_nick': row['moderator_nick'],
-                'category_name':  row['category_name'],
-                'files':          files
-            })
-        return archived_items
+            ''',
+            where='''
+                n.status = 'Archived'
+                AND n.archive_date IS NOT NULL
+                AND n.delete_date IS NULL
+            ''',
+            keys=(('n.archive_date', 'archive_date'), ('n.newsID', 'newsID'))
+        )
 
 
     # -------------------------------
     # Методы для обновления вкладок админки (Real-time AdminPanel Tabs Updates)
 
+    def data_version(self) -> int:
+        """
+        Текущая версия данных: растёт при каждом изменении News, Users,
+        Categories, Files и File_Link (триггеры из миграции 5).
+        """
+        self.cursor.execute('SELECT version FROM Data_Version WHERE id = 1')
+        row = self.cursor.fetchone()
+        return row['version'] if row else 0
+
+    def dashboard_counts(self) -> dict:
+        """
+        Все счётчики вкладок админки одним чтением строки Dashboard_Counters
+        (таблицу поддерживают триггеры на News и Users).
+        """
+        self.cursor.execute('''
+            SELECT pending_news, users, trash_news, archived_news
+            FROM Dashboard_Counters
+            WHERE id = 1
+        ''')
+        row = self.cursor.fetchone()
+        if not row:
+            return {"pending_news": 0, "users": 0, "trash_news": 0, "archived_news": 0}
+        return dict(row)
+
     def count_pending_news(self) -> int:
         """
         Возвращает количество новостей со статусом 'Pending' и delete_date IS NULL.
         """
-        try:
-            self.cursor.execute('''
-                SELECT COUNT(*) as cnt
-                FROM News
-                WHERE status = 'Pending'
-                  AND delete_date IS NULL
-            ''')
-            row = self.cursor.fetchone()
-            return row['cnt'] if row else 0
-        except sqlite3.OperationalError as e:
-            # Можно логировать e, но поднять более общее исключение
-            raise sqlite3.DatabaseError(
-                "Ошибка подсчёта ожидающих модерацию новостей",
-                details={"operation": "count_pending_news", "error": str(e)}
-            ) from e
+        return self.dashboard_counts()["pending_news"]
 
     def count_users(self) -> int:
         """
         Возвращает количество пользователей в системе.
         """
-        try:
-            self.cursor.execute('''
-                SELECT COUNT(*) as cnt FROM Users
-            ''')
-            row = self.cursor.fetchone()
-            return row['cnt'] if row else 0
-        except sqlite3.OperationalError as e:
-            raise sqlite3.DatabaseError(
-                "Ошибка подсчёта пользователей",
-                details={"operation": "count_users", "error": str(e)}
-            ) from e
-
+        return self.dashboard_counts()["users"]
 
     def count_trash_news(self) -> int:
         """
         Возвращает количество новостей, находящихся в корзине (delete_date IS NOT NULL).
         """
-        try:
-            self.cursor.execute('''
-                SELECT COUNT(*) as cnt
-                FROM News
-                WHERE delete_date IS NOT NULL
-            ''')
-            row = self.cursor.fetchone()
-            return row['cnt'] if row else 0
-        except sqlite3.OperationalError as e:
-            raise sqlite3.DatabaseError(
-                "Ошибка подсчёта новостей в корзине",
-                details={"operation": "count_trash_news", "error": str(e)}
-            ) from e
+        return self.dashboard_counts()["trash_news"]
 
     def count_archived_news(self) -> int:
         """
         Возвращает количество архива новостей (status = 'Archived' и delete_date IS NULL).
         """
-        try:
-            self.cursor.execute('''
-                SELECT COUNT(*) as cnt
-                FROM News
-                WHERE status = 'Archived'
-                  AND archive_date IS NOT NULL
-                  AND delete_date IS NULL
-            ''')
-            row = self.cursor.fetchone()
-            return row['cnt'] if row else 0
-        except sqlite3.OperationalError as e:
-            raise sqlite3.DatabaseError(
-                "Ошибка подсчёта новостей в архиве",
-                details={"operation": "count_archived_news", "error": str(e)}
-            ) from e
+        return self.dashboard_counts()["archived_news"]
+
+    def counters_check(self, rebuild: bool = False) -> dict:
+        """
+        Сверить счётчики с полным подсчётом по таблицам.
+        Возвращает расхождения {счётчик: {"stored": ..., "actual": ...}};
+        при rebuild=True счётчики пересчитываются.
+        """
+        stored = self.dashboard_counts()
+        actual = {}
+        for name, condition in COUNTER_CONDITIONS.items():
+            self.cursor.execute(f"SELECT COUNT(*) FROM News WHERE {condition.format(row='News')}")
+            actual[name] = self.cursor.fetchone()[0]
+        self.cursor.execute("SELECT COUNT(*) FROM Users")
+        actual["users"] = self.cursor.fetchone()[0]
+
+        mismatches = {
+            name: {"stored": stored[name], "actual": value}
+            for name, value in actual.items()
+            if stored[name] != value
+        }
+
+        if rebuild and mismatches:
+            with self.writer():
+                try:
+                    self.cursor.execute('BEGIN TRANSACTION;')
+                    self.cursor.execute('INSERT OR IGNORE INTO Dashboard_Counters (id) VALUES (1)')
+                    rebuild_dashboard_counters(self.cursor)
+                    self.connection.commit()
+                except Exception as e:
+                    self.connection.rollback()
+                    raise e
+        return mismatches
@@ -0,0 +1,267 @@
+"""
+Контентно-адресуемое хранилище загрузок.
+
+Файл хранится в UPLOAD_FOLDER один раз под именем, равным SHA-256 его
+содержимого; это же значение записывается в Files.guid и Files.content_hash.
+Хэш считается по ходу записи загрузки на диск, без повторного чтения файла.
+Одинаковые загрузки ссылаются на одну строку Files через File_Link; blob
+удаляется с диска, только когда на строку Files не осталось ссылок.
+
+Запись в два этапа, чтобы дисковый ввод-вывод не шёл внутри транзакции SQLite:
+1) до транзакции загрузки пишутся в UPLOAD_FOLDER/.staging (stage_upload);
+2) транзакция меняет только метаданные (Files, File_Link);
+3) после commit staged-файлы переносятся на место атомарным os.replace
+   (promote), при откате — удаляются (discard). Брошенные staged-файлы
+   (процесс упал между этапами) убирает sweep_staging.
+"""
+import collections
+import functools
+import glob
+import hashlib
+import os
+import tempfile
+import time
+
+# Размер блока при потоковом чтении загрузок и файлов на диске
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Каталог staged-загрузок внутри UPLOAD_FOLDER (тот же раздел диска → атомарный os.replace)
+STAGING_DIRNAME = '.staging'
+
+# Каталог уменьшенных копий изображений: .variants/<guid>_<ширина>.webp
+VARIANTS_DIRNAME = '.variants'
+VARIANT_FORMAT = 'webp'
+
+# Каталог, куда blob переносится перед окончательным удалением (см. delete_blob)
+TRASH_DIRNAME = '.trash'
+
+# Префикс временных файлов
+TEMP_PREFIX = '.upload-'
+
+# Сигнатуры форматов: MIME-тип оригинала определяется по blob, без запроса к Files
+MAGIC_MIMETYPES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+# Загрузка, записанная в staging и ещё не перенесённая на место
+StagedFile = collections.namedtuple('StagedFile', 'content_hash size file_format path')
+
+
+def stream_to_temp(stream, folder: str):
+    """
+    Записать поток загрузки во временный файл в folder, считая SHA-256 по пути.
+    Возвращает (content_hash, size, temp_path).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=folder)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+    except Exception:
+        remove_quietly(temp_path)
+        raise
+    return digest.hexdigest(), size, temp_path
+
+
+def staging_folder(upload_folder: str) -> str:
+    """Каталог staged-загрузок для данного UPLOAD_FOLDER."""
+    return os.path.join(upload_folder, STAGING_DIRNAME)
+
+
+def stage_upload(file, upload_folder: str) -> StagedFile:
+    """Записать загруженный файл (FileStorage) в staging, посчитав SHA-256."""
+    folder = staging_folder(upload_folder)
+    os.makedirs(folder, exist_ok=True)
+    content_hash, size, path = stream_to_temp(file.stream, folder)
+    file_format = file.filename.rsplit('.', 1)[1].lower()
+    return StagedFile(content_hash, size, file_format, path)
+
+
+def promote(staged: list, upload_folder: str):
+    """
+    Перенести staged-файлы на место (после commit). Если blob с таким хэшем
+    уже лежит в UPLOAD_FOLDER, staged-копия просто удаляется.
+    """
+    for item in staged:
+        blob_path = os.path.join(upload_folder, item.content_hash)
+        if os.path.exists(blob_path):
+            remove_quietly(item.path)
+        else:
+            os.replace(item.path, blob_path)
+
+
+def discard(staged: list):
+    """Удалить staged-файлы (после отката транзакции)."""
+    for item in staged:
+        remove_quietly(item.path)
+
+
+def sweep_staging(upload_folder: str, max_age: float) -> dict:
+    """
+    Удалить из staging файлы старше max_age секунд — остатки запросов,
+    прерванных между записью в staging и переносом на место.
+    Возвращает {"removed": число файлов, "bytes": освобождено байт}.
+    """
+    report = {"removed": 0, "bytes": 0}
+    folder = staging_folder(upload_folder)
+    if not os.path.isdir(folder):
+        return report
+
+    deadline = time.time() - max_age
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime < deadline and remove_quietly(entry.path):
+                report["removed"] += 1
+                report["bytes"] += stat.st_size
+    return report
+
+
+def variants_folder(upload_folder: str) -> str:
+    """Каталог уменьшенных копий изображений для данного UPLOAD_FOLDER."""
+    return os.path.join(upload_folder, VARIANTS_DIRNAME)
+
+
+def variant_path(upload_folder: str, guid: str, width: int) -> str:
+    """Путь к уменьшенной копии файла guid заданной ширины."""
+    return os.path.join(variants_folder(upload_folder), f'{guid}_{int(width)}.{VARIANT_FORMAT}')
+
+
+def remove_variants(upload_folder: str, guid: str):
+    """Удалить все уменьшенные копии файла guid."""
+    pattern = os.path.join(variants_folder(upload_folder), f'{glob.escape(guid)}_*.{VARIANT_FORMAT}')
+    for path in glob.glob(pattern):
+        remove_quietly(path)
+
+
+def delete_blob(upload_folder: str, guid: str, token, is_referenced) -> bool:
+    """
+    Удалить blob guid и его уменьшенные копии, если на него нет записи в Files.
+    Файл сначала атомарно переносится в .trash и только потом проверяется
+    is_referenced(guid): загрузка того же содержимого фиксирует запись Files
+    до переноса своего файла на место, поэтому либо её promote положит файл
+    заново, либо эта проверка увидит запись и вернёт файл обратно.
+    token делает имя в .trash уникальным. Ошибки ввода-вывода (OSError) пробрасываются.
+    Возвращает True, если файл удалён, False — если он снова используется.
+    """
+    path = os.path.join(upload_folder, guid)
+    trash_dir = os.path.join(upload_folder, TRASH_DIRNAME)
+    os.makedirs(trash_dir, exist_ok=True)
+    trash_path = os.path.join(trash_dir, f'{guid}.{token}')
+
+    try:
+        os.replace(path, trash_path)
+    except FileNotFoundError:
+        # Файла нет — или он уже в .trash с прошлой, прерванной попытки
+        if not os.path.exists(trash_path):
+            trash_path = None
+
+    if is_referenced(guid):
+        if trash_path is not None:
+            if os.path.exists(path):
+                os.remove(trash_path)
+            else:
+                os.replace(trash_path, path)
+        return False
+
+    if trash_path is not None:
+        os.remove(trash_path)
+    remove_variants(upload_folder, guid)
+    return True
+
+
+def scan_blobs(upload_folder: str):
+    """
+    Обойти blob-файлы в UPLOAD_FOLDER потоком os.scandir (без списка всех имён в памяти).
+    Служебные каталоги и временные файлы (имена с точки) пропускаются.
+    Даёт кортежи (имя, размер, mtime).
+    """
+    with os.scandir(upload_folder) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            yield entry.name, stat.st_size, stat.st_mtime
+
+
+def scan_variants(upload_folder: str):
+    """
+    Обойти уменьшенные копии в .variants. Даёт кортежи (имя, guid, размер, mtime);
+    файлы, имя которых не похоже на <guid>_<ширина>.webp, пропускаются.
+    """
+    folder = variants_folder(upload_folder)
+    if not os.path.isdir(folder):
+        return
+    suffix = f'.{VARIANT_FORMAT}'
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            guid, sep, width = entry.name.rpartition('_')
+            if (not sep or not guid or not width.endswith(suffix)
+                    or not width[:-len(suffix)].isdigit()
+                    or not entry.is_file(follow_symlinks=False)):
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            yield entry.name, guid, stat.st_size, stat.st_mtime
+
+
+def hash_file(path: str):
+    """SHA-256 и размер файла на диске: (content_hash, size)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+@functools.lru_cache(maxsize=4096)
+def sniff_mimetype(path: str) -> str:
+    """
+    MIME-тип blob по первым байтам (application/octet-stream, если формат неизвестен).
+    Содержимое под именем guid не меняется, поэтому результат кэшируется по пути.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for magic, mimetype in MAGIC_MIMETYPES:
+        if head.startswith(magic):
+            return mimetype
+    return 'application/octet-stream'
+
+
+def remove_quietly(path: str) -> bool:
+    """Удалить файл, если он есть. Возвращает True, если файл был удалён."""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        print(f"Ошибка удаления файла {path}: {e}")
+        return False
@@ -0,0 +1,675 @@
+"""
+Версионные миграции схемы БД.
+
+Текущая версия схемы хранится в PRAGMA user_version. Каждая миграция
+выполняется один раз в отдельной транзакции и повышает user_version.
+Миграции запускаются при старте приложения (create_app) или командой:
+    flask --app main db-upgrade
+"""
+import logging
+import sqlite3
+from database.normalize import normalize_key
+
+logger = logging.getLogger(__name__)
+
+
+def _create_tables(cursor):
+    """Создать необходимые таблицы (если их ещё нет)."""
+    # 1) Таблица Users
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Users (
+            userID INTEGER PRIMARY KEY AUTOINCREMENT,
+            nick TEXT NOT NULL COLLATE NOCASE,
+            login TEXT NOT NULL COLLATE NOCASE,
+            password TEXT NOT NULL,
+            user_role TEXT NOT NULL CHECK(
+                user_role IN ('Administrator', 'Moderator', 'Publisher')
+            ),
+            real_password TEXT,
+            registration_date TEXT NOT NULL DEFAULT ''
+        )
+    ''')
+
+    # 2) Таблица News
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS News (
+            newsID INTEGER PRIMARY KEY AUTOINCREMENT,
+            publisherID INTEGER NOT NULL,
+            moderated_byID INTEGER,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Pending' CHECK(
+                status IN ('Pending', 'Approved', 'Rejected', 'Archived')
+            ),
+            event_start TEXT NOT NULL,
+            event_end TEXT,
+            publish_date TEXT,
+            create_date TEXT NOT NULL,
+            delete_date TEXT,
+            archive_date TEXT,
+            categoryID INTEGER,
+            FOREIGN KEY (publisherID) REFERENCES Users(userID) ON DELETE CASCADE,
+            FOREIGN KEY (moderated_byID) REFERENCES Users(userID) ON DELETE SET NULL,
+            FOREIGN KEY (categoryID) REFERENCES Categories(categoryID) ON DELETE SET NULL
+        )
+    ''')
+
+    # 3) Таблица Files
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Files (
+            fileID INTEGER PRIMARY KEY AUTOINCREMENT,
+            guid TEXT NOT NULL,
+            format TEXT NOT NULL
+        )
+    ''')
+
+    # 4) Таблица File_Link (связь Files ↔ News)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS File_Link (
+            file_linkID INTEGER PRIMARY KEY AUTOINCREMENT,
+            fileID INTEGER NOT NULL,
+            newsID INTEGER NOT NULL,
+            FOREIGN KEY (fileID) REFERENCES Files(fileID) ON DELETE CASCADE,
+            FOREIGN KEY (newsID) REFERENCES News(newsID) ON DELETE CASCADE
+        )
+    ''')
+
+    # 5) Таблица Categories
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Categories (
+            categoryID INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL COLLATE NOCASE UNIQUE,
+            description TEXT,
+            create_date TEXT NOT NULL
+        )
+    ''')
+
+
+def _create_indexes(cursor):
+    """Создать индексы для оптимизации поиска."""
+    # Users
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_nick_nocase ON Users(nick COLLATE NOCASE)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_login_nocase ON Users(login COLLATE NOCASE)')
+
+    # News
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_publisher ON News(publisherID)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_status ON News(status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_create_date ON News(create_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_archive_date ON News(archive_date)')
+    # Публичная лента: keyset-пагинация по (publish_date, newsID)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_news_feed
+        ON News(status, publish_date DESC, newsID DESC)
+        WHERE delete_date IS NULL
+    ''')
+
+    # File_Link
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_link_news ON File_Link(newsID)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_link_file ON File_Link(fileID)')
+
+    # Files
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_files_guid ON Files(guid)')
+
+    # Categories
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_categories_name_nocase ON Categories(name COLLATE NOCASE)')
+
+
+def _create_triggers(cursor):
+    """Создать триггеры для автоматических дат."""
+    # 1) При вставке в Users, если registration_date пуст, установить текущую дату
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS set_registration_date
+        AFTER INSERT ON Users
+        FOR EACH ROW
+        WHEN NEW.registration_date IS NULL OR NEW.registration_date = ''
+        BEGIN
+            UPDATE Users
+            SET registration_date = datetime('now', 'localtime')
+            WHERE userID = NEW.userID;
+        END;
+    ''')
+
+    # 2) При вставке в News проверяем: if event_end не NULL и event_start > event_end – abort
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS validate_event_dates
+        BEFORE INSERT ON News
+        FOR EACH ROW
+        WHEN NEW.event_end IS NOT NULL AND NEW.event_start > NEW.event_end
+        BEGIN
+            SELECT RAISE(ABORT, 'event_start must be <= event_end');
+        END;
+    ''')
+
+    # 3) При изменении status → 'Approved' ставим publish_date
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS update_publish_date
+        AFTER UPDATE OF status ON News
+        FOR EACH ROW
+        WHEN NEW.status = 'Approved' AND OLD.status != 'Approved'
+        BEGIN
+            UPDATE News
+            SET publish_date = datetime('now', 'localtime')
+            WHERE newsID = NEW.newsID;
+        END;
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS delete_news_files
+        BEFORE DELETE ON News
+        FOR EACH ROW
+        BEGIN
+            DELETE FROM Files
+            WHERE fileID IN (
+                SELECT fileID FROM File_Link WHERE newsID = OLD.newsID
+            );
+            DELETE FROM File_Link WHERE newsID = OLD.newsID;
+        END;
+    ''')
+
+    # 5) При удалении категории сбрасываем categoryID у новостей
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS reset_category_on_delete
+        AFTER DELETE ON Categories
+        FOR EACH ROW
+        BEGIN
+            UPDATE News
+            SET categoryID = NULL
+            WHERE categoryID = OLD.categoryID;
+        END;
+    ''')
+
+
+def _migration_baseline(cursor):
+    """Базовая схема: таблицы, индексы и триггеры."""
+    _create_tables(cursor)
+    _create_indexes(cursor)
+    _create_triggers(cursor)
+
+
+# Текст для индекса: та же нормализация ё → е, что и database.search.normalize_text
+FTS_TITLE = "replace(replace({row}.title, 'ё', 'е'), 'Ё', 'Е')"
+FTS_DESCRIPTION = "replace(replace({row}.description, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def rebuild_news_fts(cursor):
+    """Заново заполнить полнотекстовый индекс из таблицы News."""
+    cursor.execute('DELETE FROM News_FTS')
+    cursor.execute(f'''
+        INSERT INTO News_FTS (rowid, title, description)
+        SELECT n.newsID, {FTS_TITLE.format(row='n')}, {FTS_DESCRIPTION.format(row='n')}
+        FROM News n
+    ''')
+
+
+def _migration_news_fts(cursor):
+    """Полнотекстовый индекс FTS5 по заголовку и описанию новостей."""
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS News_FTS USING fts5(
+            title,
+            description,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    ''')
+
+    # Синхронизация индекса с News — рядом с остальными триггерами схемы
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS news_fts_insert
+        AFTER INSERT ON News
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO News_FTS (rowid, title, description)
+            VALUES (NEW.newsID, {FTS_TITLE.format(row='NEW')}, {FTS_DESCRIPTION.format(row='NEW')});
+        END;
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS news_fts_update
+        AFTER UPDATE OF title, description ON News
+        FOR EACH ROW
+        BEGIN
+            DELETE FROM News_FTS WHERE rowid = OLD.newsID;
+            INSERT INTO News_FTS (rowid, title, description)
+            VALUES (NEW.newsID, {FTS_TITLE.format(row='NEW')}, {FTS_DESCRIPTION.format(row='NEW')});
+        END;
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS news_fts_delete
+        AFTER DELETE ON News
+        FOR EACH ROW
+        BEGIN
+            DELETE FROM News_FTS WHERE rowid = OLD.newsID;
+        END;
+    ''')
+
+    # Backfill уже существующих новостей
+    rebuild_news_fts(cursor)
+
+
+def _dedupe_keys(cursor, table: str, id_column: str, column: str, key_column: str):
+    """
+    Развести совпадающие нормализованные ключи до создания уникального индекса.
+    Прежние индексы COLLATE NOCASE сравнивали без учёта регистра только ASCII,
+    поэтому в базе могут быть, например, «Иван» и «иван». Ключ без изменений
+    остаётся у первой по ID строки, у остальных к нему добавляется «#<ID>».
+    Каждая такая группа пишется в лог.
+    """
+    cursor.execute(f'''
+        SELECT {key_column} AS key,
+               json_group_array(json_array({id_column}, {column})) AS rows
+        FROM (SELECT * FROM {table} ORDER BY {id_column})
+        GROUP BY {key_column}
+        HAVING count(*) > 1
+    ''')
+    for key, rows in cursor.fetchall():
+        logger.warning(
+            f"{table}.{column}: совпадают без учёта регистра {rows} (ключ {key!r}); "
+            f"у всех, кроме первой строки, ключ {key_column} получает суффикс #<{id_column}>"
+        )
+    cursor.execute(f'''
+        UPDATE {table}
+        SET {key_column} = {key_column} || '#' || {id_column}
+        WHERE {id_column} NOT IN (SELECT min({id_column}) FROM {table} GROUP BY {key_column})
+    ''')
+
+
+def _migration_normalized_keys(cursor):
+    """
+    Нормализованные ключи (NFKC + casefold) для логина, ника и названия категории
+    с уникальными индексами: проверки уникальности и вход — один поиск по индексу.
+    Уже существующие совпадения ключей разводятся суффиксом (см. _dedupe_keys).
+    """
+    cursor.connection.create_function('normalize_key', 1, normalize_key, deterministic=True)
+
+    cursor.execute('ALTER TABLE Users ADD COLUMN login_key TEXT')
+    cursor.execute('ALTER TABLE Users ADD COLUMN nick_key TEXT')
+    cursor.execute('ALTER TABLE Categories ADD COLUMN name_key TEXT')
+
+    cursor.execute('UPDATE Users SET login_key = normalize_key(login), nick_key = normalize_key(nick)')
+    cursor.execute('UPDATE Categories SET name_key = normalize_key(name)')
+
+    _dedupe_keys(cursor, 'Users', 'userID', 'login', 'login_key')
+    _dedupe_keys(cursor, 'Users', 'userID', 'nick', 'nick_key')
+    _dedupe_keys(cursor, 'Categories', 'categoryID', 'name', 'name_key')
+
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_login_key ON Users(login_key)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_nick_key ON Users(nick_key)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_categories_name_key ON Categories(name_key)')
+
+
+# Условия попадания новости в счётчики админки ({row} — NEW, OLD или News)
+COUNTER_CONDITIONS = {
+    "pending_news":  "{row}.status = 'Pending' AND {row}.delete_date IS NULL",
+    "trash_news":    "{row}.delete_date IS NOT NULL",
+    "archived_news": "{row}.status = 'Archived' AND {row}.archive_date IS NOT NULL AND {row}.delete_date IS NULL",
+}
+
+
+def rebuild_dashboard_counters(cursor):
+    """Пересчитать счётчики админки полным подсчётом по таблицам."""
+    assignments = ',\n'.join(
+        f"{name} = (SELECT COUNT(*) FROM News WHERE {condition.format(row='News')})"
+        for name, condition in COUNTER_CONDITIONS.items()
+    )
+    cursor.execute(f'''
+        UPDATE Dashboard_Counters
+        SET {assignments},
+            users = (SELECT COUNT(*) FROM Users)
+        WHERE id = 1
+    ''')
+
+
+def _news_counter_deltas(sign: str, row: str) -> str:
+    """SET-выражения: прибавить (sign='+') или вычесть (sign='-') вклад строки row."""
+    return ',\n'.join(
+        f"{name} = {name} {sign} ({condition.format(row=row)})"
+        for name, condition in COUNTER_CONDITIONS.items()
+    )
+
+
+def _migration_dashboard_counters(cursor):
+    """
+    Таблица из одной строки со счётчиками для вкладок админки,
+    которую триггеры на News и Users поддерживают в точном состоянии.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Dashboard_Counters (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            pending_news INTEGER NOT NULL DEFAULT 0,
+            users INTEGER NOT NULL DEFAULT 0,
+            trash_news INTEGER NOT NULL DEFAULT 0,
+            archived_news INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO Dashboard_Counters (id) VALUES (1)')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS counters_news_insert
+        AFTER INSERT ON News
+        FOR EACH ROW
+        BEGIN
+            UPDATE Dashboard_Counters
+            SET {_news_counter_deltas('+', 'NEW')}
+            WHERE id = 1;
+        END;
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS counters_news_update
+        AFTER UPDATE OF status, delete_date, archive_date ON News
+        FOR EACH ROW
+        BEGIN
+            UPDATE Dashboard_Counters
+            SET {_news_counter_deltas('-', 'OLD')}
+            WHERE id = 1;
+            UPDATE Dashboard_Counters
+            SET {_news_counter_deltas('+', 'NEW')}
+            WHERE id = 1;
+        END;
+    ''')
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS counters_news_delete
+        AFTER DELETE ON News
+        FOR EACH ROW
+        BEGIN
+            UPDATE Dashboard_Counters
+            SET {_news_counter_deltas('-', 'OLD')}
+            WHERE id = 1;
+        END;
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS counters_users_insert
+        AFTER INSERT ON Users
+        FOR EACH ROW
+        BEGIN
+            UPDATE Dashboard_Counters SET users = users + 1 WHERE id = 1;
+        END;
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS counters_users_delete
+        AFTER DELETE ON Users
+        FOR EACH ROW
+        BEGIN
+            UPDATE Dashboard_Counters SET users = users - 1 WHERE id = 1;
+        END;
+    ''')
+
+    rebuild_dashboard_counters(cursor)
+
+
+# Таблицы, изменение которых меняет содержимое списков новостей и пользователей
+DATA_VERSION_TABLES = ('News', 'Users', 'Categories', 'Files', 'File_Link')
+
+
+def _migration_data_version(cursor):
+    """
+    Монотонная версия данных: любая вставка, изменение или удаление в таблицах
+    DATA_VERSION_TABLES увеличивает её на триггере. По версии строятся ETag списков.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Data_Version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO Data_Version (id, version) VALUES (1, 1)')
+
+    for table in DATA_VERSION_TABLES:
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS data_version_{table.lower()}_{event.lower()}
+                AFTER {event} ON {table}
+                FOR EACH ROW
+                BEGIN
+                    UPDATE Data_Version SET version = version + 1 WHERE id = 1;
+                END;
+            ''')
+
+
+def _migration_content_addressed_files(cursor):
+    """
+    Контентно-адресуемые загрузки (database/filestore.py): хэш и размер
+    содержимого в Files, одна связь на пару (новость, файл) и удаление строки
+    Files вместе с новостью, только если на неё больше никто не ссылается.
+    Уже загруженные файлы получают хэш командой `flask --app main files-dedupe`.
+    """
+    cursor.execute('ALTER TABLE Files ADD COLUMN content_hash TEXT')
+    cursor.execute('ALTER TABLE Files ADD COLUMN size INTEGER')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_files_content_hash
+        ON Files(content_hash)
+        WHERE content_hash IS NOT NULL
+    ''')
+
+    cursor.execute('''
+        DELETE FROM File_Link
+        WHERE file_linkID NOT IN (
+            SELECT MIN(file_linkID) FROM File_Link GROUP BY newsID, fileID
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_file_link_news_file
+        ON File_Link(newsID, fileID)
+    ''')
+
+    cursor.execute('DROP TRIGGER IF EXISTS delete_news_files')
+    cursor.execute('''
+        CREATE TRIGGER delete_news_files
+        BEFORE DELETE ON News
+        FOR EACH ROW
+        BEGIN
+            DELETE FROM Files
+            WHERE fileID IN (
+                SELECT fileID FROM File_Link WHERE newsID = OLD.newsID
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM File_Link other
+                WHERE other.fileID = Files.fileID AND other.newsID <> OLD.newsID
+            );
+            DELETE FROM File_Link WHERE newsID = OLD.newsID;
+        END;
+    ''')
+
+
+def _migration_file_variants(cursor):
+    """
+    Уменьшенные копии изображений (WebP заданных ширин), которые строит
+    фоновый конвейер app/images.py. Files.variants_date — когда файл обработан
+    (NULL — ещё нет); File_Variants — какие ширины для него есть.
+    """
+    cursor.execute('ALTER TABLE Files ADD COLUMN variants_date TEXT')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS File_Variants (
+            fileID INTEGER NOT NULL,
+            width INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            PRIMARY KEY (fileID, width),
+            FOREIGN KEY (fileID) REFERENCES Files(fileID) ON DELETE CASCADE
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_files_variants_pending
+        ON Files(fileID)
+        WHERE variants_date IS NULL
+    ''')
+
+
+def _migration_file_deletions(cursor):
+    """
+    Журнал удаления файлов с диска: каждая удалённая строка Files (из любого
+    пути — правка новости, очистка корзины, каскад от удаления пользователя)
+    в той же транзакции ставит свой guid в очередь File_Deletions.
+    Очередь разбирает фоновый обработчик app/file_deletions.py.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS File_Deletions (
+            deletionID INTEGER PRIMARY KEY AUTOINCREMENT,
+            guid TEXT NOT NULL,
+            enqueue_date TEXT NOT NULL DEFAULT (datetime('now')),
+            next_attempt TEXT NOT NULL DEFAULT (datetime('now')),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_file_deletions_due
+        ON File_Deletions(attempts, next_attempt)
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS file_deletions_enqueue
+        AFTER DELETE ON Files
+        FOR EACH ROW
+        BEGIN
+            INSERT INTO File_Deletions (guid) VALUES (OLD.guid);
+        END;
+    ''')
+
+
+def _migration_maintenance(cursor):
+    """
+    Фоновое обслуживание (app/maintenance.py):
+    ● Maintenance_Lease — строка-аренда: задачи выполняет только процесс,
+      который продлевает аренду (один «ведущий» на все рабочие процессы);
+    ● Maintenance_Runs — последний запуск каждой задачи: время, длительность,
+      итог; по нему же считается срок следующего запуска.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Maintenance_Lease (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Maintenance_Runs (
+            task TEXT PRIMARY KEY,
+            started_at TEXT NOT NULL,
+            finished_at TEXT NOT NULL,
+            duration_ms INTEGER NOT NULL,
+            status TEXT NOT NULL CHECK(status IN ('ok', 'error')),
+            result TEXT,
+            error TEXT,
+            owner TEXT,
+            runs INTEGER NOT NULL DEFAULT 1,
+            failures INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def _migration_jobs(cursor):
+    """
+    Фоновые задания для долгих операций админки (app/jobs.py):
+    ● Jobs — очередь и состояние: вид, параметры, позиция (state) для продолжения
+      после сбоя, счётчики прогресса и аренда обработчика (owner, lease_until).
+      Даты — UTC с миллисекундами, по ним считаются скорость и оставшееся время;
+    ● индекс News(moderated_byID): без него при удалении каждого пользователя
+      ON DELETE SET NULL просматривает всю таблицу News.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS Jobs (
+            jobID INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued' CHECK(
+                status IN ('queued', 'running', 'done', 'failed')
+            ),
+            state TEXT NOT NULL DEFAULT '{}',
+            total INTEGER,
+            processed INTEGER NOT NULL DEFAULT 0,
+            batches INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_by INTEGER,
+            owner TEXT,
+            lease_until TEXT,
+            created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+            started_at TEXT,
+            updated_at TEXT,
+            finished_at TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON Jobs(status, jobID)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_news_moderated_by ON News(moderated_byID)')
+
+
+def _migration_feed_publish_date(cursor):
+    """
+    Ключ ленты (publish_date, newsID) не бывает NULL у одобренных новостей:
+    сравнение с NULL в keyset-курсоре молча отбрасывало такие строки.
+    ● Старые одобренные новости без publish_date получают дату создания;
+    ● триггер ставит publish_date новости, добавленной сразу одобренной
+      (update_publish_date срабатывает только на смену статуса).
+    """
+    cursor.execute('''
+        UPDATE News
+        SET publish_date = create_date
+        WHERE status = 'Approved' AND publish_date IS NULL AND delete_date IS NULL
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS insert_publish_date
+        AFTER INSERT ON News
+        FOR EACH ROW
+        WHEN NEW.status = 'Approved' AND NEW.publish_date IS NULL
+        BEGIN
+            UPDATE News
+            SET publish_date = datetime('now', 'localtime')
+            WHERE newsID = NEW.newsID;
+        END;
+    ''')
+
+
+# (версия, описание, функция миграции) — строго по возрастанию версии.
+# Новые миграции добавляются только в конец списка.
+MIGRATIONS = [
+    (1, "Базовая схема: таблицы, индексы, триггеры", _migration_baseline),
+    (2, "Полнотекстовый поиск по новостям (FTS5)", _migration_news_fts),
+    (3, "Нормализованные ключи логина, ника и названия категории", _migration_normalized_keys),
+    (4, "Счётчики админки, поддерживаемые триггерами", _migration_dashboard_counters),
+    (5, "Версия данных для условных ответов (ETag)", _migration_data_version),
+    (6, "Контентно-адресуемые файлы с подсчётом ссылок", _migration_content_addressed_files),
+    (7, "Уменьшенные копии изображений (WebP)", _migration_file_variants),
+    (8, "Журнал удаления файлов с диска", _migration_file_deletions),
+    (9, "Фоновое обслуживание: аренда ведущего и журнал запусков", _migration_maintenance),
+    (10, "Фоновые задания для долгих операций админки", _migration_jobs),
+    (11, "Дата публикации у всех одобренных новостей (ключ ленты)", _migration_feed_publish_date),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(connection: sqlite3.Connection) -> int:
+    """Текущая версия схемы (PRAGMA user_version)."""
+    return connection.execute('PRAGMA user_version').fetchall()[0][0]
+
+
+def apply_migrations(connection: sqlite3.Connection) -> list:
+    """
+    Применить все миграции новее текущей версии.
+    Каждая миграция идёт в своей транзакции BEGIN IMMEDIATE: если несколько
+    процессов стартуют одновременно, остальные дождутся блокировки,
+    перечитают user_version и пропустят уже применённую миграцию.
+    Возвращает список применённых версий.
+    """
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if get_schema_version(connection) >= version:
+            continue
+
+        cursor = connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE;')
+        try:
+            if get_schema_version(connection) >= version:
+                connection.rollback()
+                continue
+            migrate(cursor)
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        applied.append(version)
+    return applied
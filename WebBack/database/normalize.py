@@ -0,0 +1,11 @@
+import unicodedata
+
+
+def normalize_key(value):
+    """
+    Ключ для сравнения логинов, никнеймов и названий категорий
+    без учёта регистра и юникод-вариантов написания (NFKC + casefold).
+    """
+    if value is None:
+        return None
+    return unicodedata.normalize("NFKC", value).casefold()
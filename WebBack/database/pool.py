@@ -0,0 +1,190 @@
+"""
+Пул соединений SQLite для Storage.
+
+Соединения создаются лениво (не больше size), настраиваются PRAGMA один раз
+при создании и переиспользуются между запросами, сохраняя кэш страниц и кэш
+подготовленных выражений. В каждый момент соединение принадлежит одному
+потоку: поток берёт его через acquire() и возвращает через release().
+
+Пул с readonly=True открывает файл в режиме только для чтения
+(URI mode=ro + PRAGMA query_only) — для GET-запросов. Пул записи размером 1
+даёт единственное сериализованное соединение для всех изменений.
+"""
+import pathlib
+import queue
+import sqlite3
+import threading
+import time
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Не удалось получить соединение из пула за отведённое время."""
+
+
+class ConnectionPool(object):
+    def __init__(self, db_path, size=8, timeout=10, busy_timeout=10,
+                 cached_statements=256, pragmas=None, readonly=False):
+        if size < 1:
+            raise ValueError("Размер пула должен быть не меньше 1")
+
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.pragmas = dict(pragmas or {})
+        self.readonly = readonly
+
+        # LIFO: чаще отдаём «тёплые» соединения с прогретым кэшем
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "discarded": 0,
+            "wait_total": 0.0,
+            "wait_max": 0.0,
+        }
+
+    # -------------------------------
+    # Создание и проверка соединений
+
+    def _connect(self) -> sqlite3.Connection:
+        """Новое соединение с PRAGMA, применяемыми один раз на всё время жизни."""
+        if self.readonly:
+            target = pathlib.Path(self.db_path).absolute().as_uri() + '?mode=ro'
+        else:
+            target = self.db_path
+
+        connection = sqlite3.connect(
+            target,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            uri=self.readonly
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA foreign_keys = ON;')
+        if self.readonly:
+            # Режим журнала задаёт пишущее соединение; читатели только запрещают запись
+            connection.execute('PRAGMA query_only = ON;')
+        else:
+            connection.execute('PRAGMA journal_mode=WAL').fetchall()
+        for name, value in self.pragmas.items():
+            if not name.isidentifier():
+                raise ValueError(f"Недопустимое имя PRAGMA: {name}")
+            connection.execute(f'PRAGMA {name} = {value}').fetchall()
+        return connection
+
+    @staticmethod
+    def _is_healthy(connection) -> bool:
+        try:
+            connection.execute('SELECT 1').fetchall()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created -= 1
+            self._stats["discarded"] += 1
+        try:
+            connection.close()
+        except sqlite3.Error:
+            pass
+
+    # -------------------------------
+    # Выдача и возврат
+
+    def acquire(self) -> sqlite3.Connection:
+        """Взять соединение из пула (ждёт не дольше timeout секунд)."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Пул соединений закрыт")
+
+        start = time.perf_counter()
+        while True:
+            connection = None
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        connection = self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                else:
+                    remaining = self.timeout - (time.perf_counter() - start)
+                    try:
+                        connection = self._idle.get(timeout=max(remaining, 0))
+                    except queue.Empty:
+                        with self._lock:
+                            self._stats["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"Нет свободных соединений с БД ({self.size}) за {self.timeout} с"
+                        )
+
+            if self._is_healthy(connection):
+                break
+            self._discard(connection)
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_total"] += waited
+            self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+        return connection
+
+    def release(self, connection: sqlite3.Connection):
+        """Вернуть соединение в пул, откатив незавершённую транзакцию."""
+        if connection is None:
+            return
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            self._discard(connection)
+            return
+
+        if self._closed:
+            self._discard(connection)
+            return
+        self._idle.put(connection)
+
+    def close(self):
+        """Закрыть все свободные соединения; занятые закроются при возврате."""
+        self._closed = True
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    # -------------------------------
+    # Метрики
+
+    def stats(self) -> dict:
+        with self._lock:
+            checkouts = self._stats["checkouts"]
+            return {
+                "readonly":        self.readonly,
+                "size":            self.size,
+                "created":         self._created,
+                "idle":            self._idle.qsize(),
+                "in_use":          self._created - self._idle.qsize(),
+                "checkouts":       checkouts,
+                "timeouts":        self._stats["timeouts"],
+                "discarded":       self._stats["discarded"],
+                "wait_avg_ms":     round(self._stats["wait_total"] / checkouts * 1000, 3) if checkouts else 0.0,
+                "wait_max_ms":     round(self._stats["wait_max"] * 1000, 3),
+                "wait_total_ms":   round(self._stats["wait_total"] * 1000, 3),
+            }
@@ -0,0 +1,50 @@
+"""
+Подготовка текста и поисковых запросов для полнотекстового индекса News_FTS.
+
+В индекс текст попадает с заменой «ё» на «е» (см. триггеры в migrations.py),
+а слова запроса приводятся к той же форме, усекаются на типичные русские
+окончания и ищутся по префиксу: «новостями» → "новост"* найдёт
+«новость», «новости», «новостей».
+"""
+import re
+
+# Окончания, отбрасываемые у слов запроса (от длинных к коротким)
+RUSSIAN_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'ией', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ов', 'ев', 'ей', 'ой', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ую', 'юю', 'ия', 'ть',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+], key=len, reverse=True)
+
+# Минимальная длина основы после усечения окончания
+MIN_STEM_LENGTH = 3
+
+# Не больше стольких слов из запроса попадает в MATCH
+MAX_QUERY_TERMS = 10
+
+CYRILLIC_WORD = re.compile(r'^[а-я]+$')
+
+
+def normalize_text(text: str) -> str:
+    """Та же нормализация, что применяют триггеры индекса: ё → е."""
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def stem_term(term: str) -> str:
+    """Грубое усечение русского окончания (без словаря)."""
+    if not CYRILLIC_WORD.match(term):
+        return term
+    for ending in RUSSIAN_ENDINGS:
+        if term.endswith(ending) and len(term) - len(ending) >= MIN_STEM_LENGTH:
+            return term[:-len(ending)]
+    return term
+
+
+def build_match_query(query: str) -> str:
+    """
+    Пользовательская строка → выражение FTS5 MATCH.
+    Все слова обязательны (AND), каждое ищется по префиксу основы.
+    Возвращает пустую строку, если в запросе нет слов.
+    """
+    terms = re.findall(r'\w+', normalize_text(query).lower())[:MAX_QUERY_TERMS]
+    return ' '.join(f'"{stem_term(term)}"*' for term in terms)
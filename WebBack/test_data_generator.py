@@ -27,7 +27,7 @@ def random_date(start_days_ago=-100, end_days_forward=100):
 class TestDataGenerator:
     def __init__(self):
         self.db = Storage(db_path=DATABASE_PATH)
-        self.db.open_connection()
+        self.db.migrate()
         self.generated_data = {
             "users": [],
             "categories": [],
@@ -0,0 +1,113 @@
+"""
+Общие фикстуры тестов: приложение на временной базе и каталоге загрузок,
+фоновые обработчики выключены (тесты запускают их явно).
+
+Запуск из каталога WebBack:
+    python -m pytest -q
+"""
+import os
+import sqlite3
+import sys
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import config
+from app import create_app
+from database.db import Storage
+from database.migrations import _migration_baseline
+
+ADMIN = {"login": "admin", "password": "secret1", "nickname": "admin"}
+
+
+def make_config(tmp, **overrides):
+    class TestConfig:
+        pass
+    for key in dir(config):
+        if key.isupper():
+            setattr(TestConfig, key, getattr(config, key))
+    TestConfig.DATABASE_PATH = os.path.join(tmp, "test.db")
+    TestConfig.UPLOAD_FOLDER = os.path.join(tmp, "uploads")
+    TestConfig.IMAGE_VARIANT_WIDTHS = []
+    TestConfig.MAINTENANCE_ENABLED = False
+    TestConfig.FILE_DELETION_WORKERS = 0
+    TestConfig.JOBS_WORKERS = 0
+    TestConfig.RATE_LIMIT_ENABLED = False
+    TestConfig.PASSWORD_HASH_WORKERS = 0
+    TestConfig.PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    for key, value in overrides.items():
+        setattr(TestConfig, key, value)
+    return TestConfig
+
+
+def news_form(title, files=()):
+    form = {
+        "login": ADMIN['login'], "nickname": ADMIN['nickname'],
+        "title": title, "description": "Описание",
+        "event_start": "2025-01-01 10:00:00", "event_end": "2025-01-01 12:00:00",
+        "categoryID": "",
+    }
+    if files:
+        form["files"] = list(files)
+    return form
+
+
+def make_baseline_db(path):
+    """База в схеме кода до версионных миграций (user_version = 0)."""
+    connection = sqlite3.connect(path)
+    _migration_baseline(connection.cursor())
+    connection.commit()
+    return connection
+
+
+def add_user(connection, login, nick, password="secret1"):
+    connection.execute('''
+        INSERT INTO Users (login, nick, password, user_role)
+        VALUES (?, ?, ?, 'Publisher')
+    ''', (login, nick, generate_password_hash(password, 'pbkdf2:sha256:1000')))
+
+
+def open_storage(db_path) -> Storage:
+    db = Storage(db_path)
+    db.open_connection()
+    return db
+
+
+def shutdown_app(app):
+    app.extensions['jobs'].shutdown()
+    app.extensions['file_deletions'].shutdown()
+    app.extensions['password_hasher'].shutdown()
+    app.extensions['db_read_pool'].close()
+    app.extensions['db_write_pool'].close()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(make_config(str(tmp_path)))
+    yield app
+    shutdown_app(app)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    storage = open_storage(app.config['DATABASE_PATH'])
+    yield storage
+    storage.close_connection()
+
+
+@pytest.fixture
+def admin_headers(app, client):
+    assert client.post('/api/auth/register', json=ADMIN).status_code == 200
+    connection = sqlite3.connect(app.config['DATABASE_PATH'])
+    connection.execute("UPDATE Users SET user_role = 'Administrator' WHERE login = ?", (ADMIN['login'],))
+    connection.commit()
+    connection.close()
+    response = client.post('/api/auth/login', json={"login": ADMIN['login'], "password": ADMIN['password']})
+    return {"Authorization": f"Bearer {response.get_json()['token']}"}
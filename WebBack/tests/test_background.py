@@ -0,0 +1,126 @@
+"""Фоновые обработчики: повторы журнала удаления файлов и потеря аренды задания."""
+import os
+
+from app import file_deletions
+from app.file_deletions import FileDeletionWorker
+from app.jobs import JobQueue
+from database.db import Storage
+
+
+def add_trash(db, count):
+    db.cursor.executemany('''
+        INSERT INTO News (publisherID, title, description, event_start, create_date, delete_date)
+        VALUES (1, ?, 'Описание', '2025-01-01 10:00:00', '2025-01-01 10:00:00', '2025-02-01 10:00:00')
+    ''', ((f"Новость {i}",) for i in range(count)))
+    db.connection.commit()
+
+
+def deletion(db):
+    db.cursor.execute('''
+        SELECT attempts, last_error,
+               round((julianday(next_attempt) - julianday('now')) * 86400) AS delay
+        FROM File_Deletions
+    ''')
+    row = db.cursor.fetchone()
+    return dict(row) if row else None
+
+
+def test_file_deletion_retries_with_backoff(app, db, monkeypatch):
+    worker = FileDeletionWorker(app.config['DATABASE_PATH'], app.config['UPLOAD_FOLDER'],
+                                workers=1, max_attempts=3, retry_delay=10, lease=300)
+    db.cursor.execute("INSERT INTO File_Deletions (guid) VALUES ('missing')")
+    db.connection.commit()
+
+    def failing_delete(*args):
+        raise OSError("диск недоступен")
+
+    monkeypatch.setattr(file_deletions, 'delete_blob', failing_delete)
+
+    # Забранная запись до конца аренды не выдаётся другому обработчику
+    claimed = db.file_deletions_claim(10, lease=300, max_attempts=3)
+    assert [entry['attempts'] for entry in claimed] == [0]
+    assert db.file_deletions_claim(10, lease=300, max_attempts=3) == []
+    db.cursor.execute("UPDATE File_Deletions SET next_attempt = datetime('now')")
+    db.connection.commit()
+
+    for attempt, delay in ((1, 10), (2, 20), (3, 40)):
+        assert worker.process_batch() == 1
+        entry = deletion(db)
+        assert (entry['attempts'], entry['last_error']) == (attempt, "диск недоступен")
+        # next_attempt хранится с точностью до секунды
+        assert delay - 1 <= entry['delay'] <= delay
+        # Следующая попытка — только после задержки
+        assert worker.process_batch() == 0
+        db.cursor.execute("UPDATE File_Deletions SET next_attempt = datetime('now')")
+        db.connection.commit()
+
+    # Попытки исчерпаны: запись остаётся в журнале, но больше не забирается
+    assert worker.process_batch() == 0
+    assert db.file_deletions_stats(3) == {"pending": 0, "exhausted": 1}
+
+    monkeypatch.undo()
+    db.cursor.execute("UPDATE File_Deletions SET attempts = 0")
+    db.connection.commit()
+    assert worker.process_batch() == 1
+    assert deletion(db) is None
+
+
+def test_job_step_after_lost_lease(app, db, admin_headers):
+    add_trash(db, 5)
+    job, _ = db.job_submit('purge_trash')
+
+    # Аренда первого обработчика истекла, задание забрал второй
+    assert db.job_claim('first', lease=0)['owner'] == 'first'
+    assert db.job_claim('second', lease=60)['owner'] == 'second'
+
+    assert db.job_step(job['jobID'], 'first', 'purge_trash', {}, {}, batch_size=2, lease=60) is None
+    assert db.bulk_count('purge_trash') == 5
+    assert db.job_get(job['jobID'])['processed'] == 0
+    assert not db.job_update(job['jobID'], 'first', total=5)
+    assert not db.job_finish(job['jobID'], 'first', result={})
+
+    ids = db.job_step(job['jobID'], 'second', 'purge_trash', {}, {}, batch_size=2, lease=60)
+    assert len(ids) == 2
+    assert db.job_get(job['jobID'])['processed'] == 2
+
+    # Обработчик, потерявший аренду, останавливается, не завершая чужое задание
+    queue = JobQueue(app.config['DATABASE_PATH'], workers=0, batch_size=2, batch_pause=0)
+    queue._execute(db, db.job_get(job['jobID']), 'first')
+    assert queue.stats()['lost'] == 1
+    assert db.job_get(job['jobID'])['status'] == 'running'
+    assert db.bulk_count('purge_trash') == 3
+
+    assert queue.run_next('third') is False
+    db.cursor.execute("UPDATE Jobs SET lease_until = strftime('%Y-%m-%d %H:%M:%f', 'now', '-1 seconds')")
+    db.connection.commit()
+    assert queue.run_next('third') is True
+    job = db.job_get(job['jobID'])
+    assert (job['status'], job['owner'], job['processed']) == ('done', 'third', 5)
+    assert db.bulk_count('purge_trash') == 0
+
+
+def test_file_deletion_batch_uses_one_connection(app, db, monkeypatch):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    for guid in ("kept", "gone1", "gone2"):
+        with open(os.path.join(upload_folder, guid), 'wb') as f:
+            f.write(b"blob")
+    # Файл снова загрузили, пока его удаление ждало в журнале
+    db.cursor.execute("INSERT INTO Files (guid, format) VALUES ('kept', 'png')")
+    db.cursor.executemany("INSERT INTO File_Deletions (guid) VALUES (?)", [("kept",), ("gone1",), ("gone2",)])
+    db.connection.commit()
+
+    opened = []
+    open_connection = Storage.open_connection
+
+    def counting_open(self):
+        opened.append(self)
+        return open_connection(self)
+
+    monkeypatch.setattr(Storage, 'open_connection', counting_open)
+    worker = FileDeletionWorker(app.config['DATABASE_PATH'], upload_folder, workers=3)
+    assert worker.process_batch() == 3
+    assert len(opened) == 1
+
+    assert [guid for guid in ("kept", "gone1", "gone2") if os.path.exists(os.path.join(upload_folder, guid))] == ["kept"]
+    assert deletion(db) is None
+    assert worker._stats['deleted'] == 2 and worker._stats['skipped'] == 1
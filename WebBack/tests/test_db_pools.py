@@ -0,0 +1,123 @@
+"""Соединения запроса: пишущее берётся только на время транзакции изменения."""
+import io
+import threading
+import time
+
+import database.db
+from conftest import ADMIN, news_form
+
+
+def test_login_reads_without_writer(app, client, admin_headers):
+    write_pool = app.extensions['db_write_pool']
+    before = write_pool.stats()['checkouts']
+    response = client.post('/api/auth/login', json={"login": ADMIN['login'], "password": ADMIN['password']})
+    assert response.status_code == 200
+    assert write_pool.stats()['checkouts'] == before
+
+
+def test_write_requests_release_writer(app, client, admin_headers):
+    response = client.post('/api/categories', json={"name": "Спорт"}, headers=admin_headers)
+    assert response.status_code == 200
+    stats = app.extensions['db_write_pool'].stats()
+    assert stats['in_use'] == 0
+    assert client.get('/api/categories').get_json()[0]['name'] == "Спорт"
+
+
+def test_slow_upload_staging_does_not_block_writes(app, client, admin_headers, monkeypatch):
+    staging, release = threading.Event(), threading.Event()
+    stage_upload = database.db.stage_upload
+
+    def slow_stage_upload(file, folder):
+        staging.set()
+        release.wait(10)
+        return stage_upload(file, folder)
+
+    monkeypatch.setattr(database.db, 'stage_upload', slow_stage_upload)
+    result = {}
+
+    def upload():
+        result['status'] = app.test_client().post(
+            '/api/news',
+            data=news_form("С файлом", [(io.BytesIO(b"\x89PNG data"), "a.png")]),
+            content_type='multipart/form-data'
+        ).status_code
+
+    thread = threading.Thread(target=upload)
+    thread.start()
+    try:
+        assert staging.wait(10)
+        assert app.extensions['db_write_pool'].stats()['in_use'] == 0
+        start = time.perf_counter()
+        response = client.post('/api/categories', json={"name": "Спорт"}, headers=admin_headers)
+        assert response.status_code == 200
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
+        thread.join()
+    assert result['status'] == 200
+
+
+def test_files_gc_scan_does_not_hold_writer(app, client, admin_headers, monkeypatch):
+    scanning, release = threading.Event(), threading.Event()
+    scan_blobs = database.db.scan_blobs
+
+    def slow_scan_blobs(folder):
+        scanning.set()
+        release.wait(10)
+        yield from scan_blobs(folder)
+
+    monkeypatch.setattr(database.db, 'scan_blobs', slow_scan_blobs)
+    result = {}
+
+    def gc():
+        result['status'] = app.test_client().post(
+            '/api/admin/files/gc', json={"dry_run": True}, headers=admin_headers
+        ).status_code
+
+    thread = threading.Thread(target=gc)
+    thread.start()
+    try:
+        assert scanning.wait(10)
+        assert app.extensions['db_write_pool'].stats()['in_use'] == 0
+        start = time.perf_counter()
+        response = client.post('/api/categories', json={"name": "Спорт"}, headers=admin_headers)
+        assert response.status_code == 200
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
+        thread.join()
+    assert result['status'] == 200
+
+
+def test_maintenance_run_does_not_hold_pooled_connections(app, client, admin_headers):
+    running, release = threading.Event(), threading.Event()
+    scheduler = app.extensions['maintenance']
+
+    def slow_task(db):
+        running.set()
+        release.wait(10)
+        return {"done": True}
+
+    scheduler.tasks['staging_sweep'] = slow_task
+    result = {}
+
+    def run():
+        result['response'] = app.test_client().post(
+            '/api/admin/maintenance/staging_sweep/run', headers=admin_headers
+        )
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    try:
+        assert running.wait(10)
+        assert app.extensions['db_write_pool'].stats()['in_use'] == 0
+        assert app.extensions['db_read_pool'].stats()['in_use'] == 0
+        start = time.perf_counter()
+        response = client.post('/api/categories', json={"name": "Спорт"}, headers=admin_headers)
+        assert response.status_code == 200
+        assert time.perf_counter() - start < 1
+    finally:
+        release.set()
+        thread.join()
+    assert result['response'].status_code == 200
+    assert result['response'].get_json()['result'] == {"done": True}
@@ -0,0 +1,60 @@
+"""Условные ответы списков: ETag из версии данных (Data_Version)."""
+from database.db import Storage
+
+# Изменения каждой таблицы DATA_VERSION_TABLES — вставка, правка и удаление
+MUTATIONS = [
+    "INSERT INTO Users (login, nick, password, user_role) VALUES ('petr', 'petr', 'x', 'Publisher')",
+    "UPDATE Users SET nick = 'petr2' WHERE login = 'petr'",
+    "INSERT INTO Categories (name, name_key, create_date) VALUES ('Спорт', 'спорт', '2025-01-01')",
+    "UPDATE Categories SET description = 'Описание'",
+    "INSERT INTO News (publisherID, title, description, event_start, create_date) "
+    "VALUES (1, 'Новость', 'Описание', '2025-01-01', '2025-01-01')",
+    "UPDATE News SET title = 'Заголовок'",
+    "INSERT INTO Files (guid, format) VALUES ('guid1', 'png')",
+    "UPDATE Files SET size = 10",
+    "INSERT INTO File_Link (fileID, newsID) VALUES (1, 1)",
+    "UPDATE File_Link SET newsID = 1",
+    "DELETE FROM File_Link",
+    "DELETE FROM Files",
+    "DELETE FROM News",
+    "DELETE FROM Categories",
+    "DELETE FROM Users WHERE login = 'petr'",
+]
+
+
+def get_feed(client, etag=None, **query):
+    response = client.get('/api/news', query_string=query,
+                          headers={"If-None-Match": etag} if etag else {})
+    response.get_data()  # дочитать потоковый ответ
+    return response
+
+
+def test_not_modified_until_data_changes(client, db, admin_headers, monkeypatch):
+    response = get_feed(client)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    # 304 отдаётся до выборки списка
+    def no_query(*args, **kwargs):
+        raise AssertionError("список не должен читаться")
+
+    monkeypatch.setattr(Storage, 'iter_news_feed', no_query)
+    response = get_feed(client, etag)
+    assert response.status_code == 304 and response.data == b""
+    assert response.headers['ETag'] == etag
+    monkeypatch.undo()
+
+    for statement in MUTATIONS:
+        db.cursor.execute(statement)
+        db.connection.commit()
+        response = get_feed(client, etag)
+        assert response.status_code == 200, statement
+        assert response.headers['ETag'] != etag
+        etag = response.headers['ETag']
+
+
+def test_etag_depends_on_query(client, admin_headers):
+    first = get_feed(client).headers['ETag']
+    second = get_feed(client, limit=1).headers['ETag']
+    assert first != second
+    assert get_feed(client, second, limit=1).status_code == 304
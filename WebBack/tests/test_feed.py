@@ -0,0 +1,84 @@
+"""Публичная лента: keyset-пагинация по (publish_date, newsID)."""
+import pytest
+
+from app import create_app
+from conftest import add_user, make_baseline_db, make_config, open_storage, shutdown_app
+
+
+@pytest.fixture
+def legacy_app(tmp_path):
+    """Приложение на старой базе: часть одобренных новостей без publish_date."""
+    config = make_config(str(tmp_path))
+    connection = make_baseline_db(config.DATABASE_PATH)
+    add_user(connection, "Иван", "Иван")
+    connection.executemany('''
+        INSERT INTO News (publisherID, title, description, status, event_start, create_date, publish_date)
+        VALUES (1, ?, 'Описание', 'Approved', '2025-01-01', ?, ?)
+    ''', [
+        ("Первая", '2025-01-01 10:00:00', None),
+        ("Вторая", '2025-01-02 10:00:00', '2025-01-02 10:00:00'),
+        ("Третья", '2025-01-03 10:00:00', None),
+        ("Четвёртая", '2025-01-04 10:00:00', '2025-01-04 10:00:00'),
+        ("Пятая", '2025-01-05 10:00:00', None),
+    ])
+    connection.commit()
+    connection.close()
+
+    app = create_app(config)
+    yield app
+    shutdown_app(app)
+
+
+def feed_pages(client, limit):
+    titles, cursor = [], None
+    while True:
+        query = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get('/api/news', query_string=query)
+        assert response.status_code == 200
+        page = response.get_json()
+        titles += [item['title'] for item in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            return titles
+
+
+def test_pages_include_rows_approved_without_publish_date(legacy_app):
+    client = legacy_app.test_client()
+    full = [item['title'] for item in client.get('/api/news').get_json()]
+    assert full == ["Пятая", "Четвёртая", "Третья", "Вторая", "Первая"]
+    assert feed_pages(client, 2) == full
+
+
+def test_news_added_approved_gets_publish_date(client, db, admin_headers):
+    db.cursor.execute('''
+        INSERT INTO News (publisherID, title, description, status, event_start, create_date)
+        VALUES (1, 'Сразу одобрена', 'Описание', 'Approved', '2025-01-01', '2025-01-01 10:00:00')
+    ''')
+    db.connection.commit()
+    db.cursor.execute('SELECT publish_date FROM News')
+    assert db.cursor.fetchone()['publish_date'] is not None
+    assert feed_pages(client, 1) == ["Сразу одобрена"]
+
+
+def test_stream_crosses_batches_on_backfilled_keys(legacy_app):
+    db = open_storage(legacy_app.config['DATABASE_PATH'])
+    try:
+        # Новости без publish_date (до миграции) приходятся на границы пачек по 2
+        streamed = [item['title'] for item in db.iter_news_feed(batch_size=2)]
+        assert streamed == ["Пятая", "Четвёртая", "Третья", "Вторая", "Первая"]
+    finally:
+        db.close_connection()
+
+
+def test_null_stream_key_fails_loudly(db, admin_headers):
+    db.cursor.executemany('''
+        INSERT INTO News (publisherID, title, description, event_start, create_date)
+        VALUES (1, ?, 'Описание', '2025-01-01', '2025-01-01')
+    ''', [("Первая",), ("Вторая",), ("Третья",)])
+    db.connection.commit()
+    batches = db._iter_keyset('SELECT n.newsID, n.publish_date FROM News n', where='1',
+                              keys=(('n.publish_date', 'publish_date'), ('n.newsID', 'newsID')),
+                              descending=True, batch_size=2)
+    assert len(next(batches)) == 2
+    with pytest.raises(ValueError):
+        next(batches)
@@ -0,0 +1,76 @@
+"""Хранилище загрузок: удаление blob, пересекающееся с загрузкой того же содержимого."""
+import os
+
+from database.filestore import (
+    TRASH_DIRNAME, StagedFile, delete_blob, promote, staging_folder, variant_path
+)
+
+GUID = "a" * 64
+
+
+def write(path, data=b"blob"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def stage(upload_folder, data=b"blob"):
+    path = os.path.join(staging_folder(str(upload_folder)), "staged")
+    write(path, data)
+    return StagedFile(GUID, len(data), 'png', path)
+
+
+def trash_entries(upload_folder):
+    trash_dir = os.path.join(upload_folder, TRASH_DIRNAME)
+    return os.listdir(trash_dir) if os.path.isdir(trash_dir) else []
+
+
+def test_unreferenced_blob_removed_with_variants(tmp_path):
+    write(os.path.join(tmp_path, GUID))
+    write(variant_path(str(tmp_path), GUID, 320))
+
+    assert delete_blob(str(tmp_path), GUID, 1, lambda guid: False)
+    assert not os.path.exists(os.path.join(tmp_path, GUID))
+    assert not os.path.exists(variant_path(str(tmp_path), GUID, 320))
+    assert trash_entries(tmp_path) == []
+
+
+def test_upload_committed_before_check_keeps_blob(tmp_path):
+    # Запись Files уже зафиксирована, promote ещё не выполнен: blob возвращается на место
+    write(os.path.join(tmp_path, GUID))
+    staged = [stage(tmp_path)]
+
+    assert not delete_blob(str(tmp_path), GUID, 1, lambda guid: True)
+    promote(staged, str(tmp_path))
+
+    assert os.path.exists(os.path.join(tmp_path, GUID))
+    assert not os.path.exists(staged[0].path)
+    assert trash_entries(tmp_path) == []
+
+
+def test_promote_between_move_and_check_keeps_blob(tmp_path):
+    # promote успел положить новый файл, пока старый лежал в .trash
+    write(os.path.join(tmp_path, GUID), b"old")
+    staged = [stage(tmp_path, b"new")]
+
+    def referenced_after_promote(guid):
+        promote(staged, str(tmp_path))
+        return True
+
+    assert not delete_blob(str(tmp_path), GUID, 1, referenced_after_promote)
+    with open(os.path.join(tmp_path, GUID), 'rb') as f:
+        assert f.read() == b"new"
+    assert trash_entries(tmp_path) == []
+
+
+def test_interrupted_attempt_finished_on_retry(tmp_path):
+    # Прошлая попытка перенесла blob в .trash и прервалась до проверки
+    write(os.path.join(tmp_path, TRASH_DIRNAME, f"{GUID}.7"))
+
+    assert delete_blob(str(tmp_path), GUID, 7, lambda guid: False)
+    assert trash_entries(tmp_path) == []
+
+    write(os.path.join(tmp_path, TRASH_DIRNAME, f"{GUID}.8"))
+    assert not delete_blob(str(tmp_path), GUID, 8, lambda guid: True)
+    assert os.path.exists(os.path.join(tmp_path, GUID))
+    assert trash_entries(tmp_path) == []
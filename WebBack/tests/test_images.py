@@ -0,0 +1,79 @@
+"""Уменьшенные копии изображений (app/images.py)."""
+import concurrent.futures
+import os
+import signal
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.images import ImageVariantPipeline, render_variants
+from app.process_pool import ProcessPool
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def test_animated_images_keep_original(tmp_path):
+    frames = [Image.new('RGB', (400, 300), color) for color in ('red', 'blue')]
+    frames[0].save(tmp_path / 'anim', 'GIF', save_all=True, append_images=frames[1:])
+    Image.new('RGB', (400, 300), 'green').save(tmp_path / 'still', 'PNG')
+
+    assert render_variants(str(tmp_path), 'anim', (100, 200), 80) == []
+    assert [width for width, _ in render_variants(str(tmp_path), 'still', (100, 200), 80)] == [100, 200]
+
+
+def crash():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def test_pool_recreated_after_fork():
+    pool = ProcessPool(1)
+    try:
+        executor = pool._get_executor()
+        assert pool._get_executor() is executor
+        # Пул создаётся, когда в процессе уже работают фоновые потоки: не через fork
+        assert executor._mp_context.get_start_method() != 'fork'
+        pool._pid = os.getpid() + 1  # как после fork: пул родителя в дочернем процессе не работает
+        assert pool._get_executor() is not executor
+        executor.shutdown()
+    finally:
+        pool.shutdown()
+
+
+def add_image(db, upload_folder, guid):
+    os.makedirs(upload_folder, exist_ok=True)
+    Image.new('RGB', (400, 300), 'green').save(os.path.join(upload_folder, guid), 'PNG')
+    db.cursor.execute("INSERT INTO Files (guid, format) VALUES (?, 'png') RETURNING fileID", (guid,))
+    file_id = db.cursor.fetchone()[0]
+    db.connection.commit()
+    return file_id
+
+
+def variant_widths(db, file_id):
+    db.cursor.execute('SELECT width FROM File_Variants WHERE fileID = ? ORDER BY width', (file_id,))
+    return [row[0] for row in db.cursor.fetchall()]
+
+
+def test_pipeline_survives_killed_worker(app, db):
+    upload_folder = app.config['UPLOAD_FOLDER']
+    pipeline = ImageVariantPipeline(app.config['DATABASE_PATH'], upload_folder, [100], workers=1)
+    try:
+        # Процесс пула погиб: следующие файлы обрабатываются в новом пуле
+        with pytest.raises(BrokenProcessPool):
+            pipeline._pool.run(crash)
+        file_id = add_image(db, upload_folder, "first")
+        assert pipeline.run_pending() == 1
+        assert variant_widths(db, file_id) == [100]
+
+        # Файл, который обрабатывался, когда процесс погиб, отправляется повторно
+        file_id = add_image(db, upload_folder, "second")
+        broken = concurrent.futures.Future()
+        broken.set_exception(BrokenProcessPool("процесс пула погиб"))
+        pipeline._save_result(file_id, "second", broken)
+        deadline = time.monotonic() + 30
+        while pipeline.stats()['done'] < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert variant_widths(db, file_id) == [100]
+        assert pipeline.stats()['rebuilt'] >= 1
+    finally:
+        pipeline.shutdown()
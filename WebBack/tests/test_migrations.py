@@ -0,0 +1,83 @@
+"""Миграции схемы на базе, созданной кодом до версионных миграций (user_version = 0)."""
+import sqlite3
+
+from app import create_app
+from conftest import add_user, make_baseline_db, make_config
+from database.migrations import LATEST_VERSION, MIGRATIONS, apply_migrations
+
+
+def test_case_colliding_keys_do_not_block_startup(tmp_path, caplog):
+    config = make_config(str(tmp_path))
+    connection = make_baseline_db(config.DATABASE_PATH)
+    add_user(connection, "Иван", "Ёж", password="first1")
+    add_user(connection, "иван", "ёж", password="second2")
+    add_user(connection, "Петр", "Петр")
+    connection.execute("INSERT INTO Categories (name, create_date) VALUES ('Спорт', '2025-01-01'), ('спорт', '2025-01-01')")
+    connection.commit()
+    connection.close()
+
+    app = create_app(config)
+    try:
+        connection = sqlite3.connect(config.DATABASE_PATH)
+        assert connection.execute('PRAGMA user_version').fetchone()[0] == LATEST_VERSION
+        assert connection.execute('SELECT login, login_key, nick_key FROM Users ORDER BY userID').fetchall() == [
+            ("Иван", "иван", "ёж"), ("иван", "иван#2", "ёж#2"), ("Петр", "петр", "петр")
+        ]
+        assert connection.execute('SELECT name_key FROM Categories ORDER BY categoryID').fetchall() == [
+            ("спорт",), ("спорт#2",)
+        ]
+        connection.close()
+        assert "Users.login" in caplog.text and "Categories.name" in caplog.text
+
+        client = app.test_client()
+        for login, password in (("Иван", "first1"), ("иван", "second2")):
+            response = client.post('/api/auth/login', json={"login": login, "password": password})
+            assert response.status_code == 200
+            assert response.get_json()['login'] == login
+        # Новый пользователь с тем же ключом по-прежнему не проходит
+        response = client.post('/api/auth/register', json={"login": "ИВАН", "password": "secret1", "nickname": "new"})
+        assert response.status_code == 409
+    finally:
+        app.extensions['password_hasher'].shutdown()
+
+
+def test_migration_chain_from_baseline(tmp_path):
+    path = str(tmp_path / "test.db")
+    connection = make_baseline_db(path)
+    add_user(connection, "Иван", "Ёж")
+    connection.executescript('''
+        INSERT INTO Categories (name, create_date) VALUES ('Спорт', '2025-01-01');
+        INSERT INTO News (publisherID, title, description, status, event_start, create_date, categoryID)
+        VALUES (1, 'Ёлка во дворе', 'Описание', 'Approved', '2025-01-01', '2025-01-01', 1),
+               (1, 'На модерации', 'Описание', 'Pending', '2025-01-01', '2025-01-01', NULL);
+        INSERT INTO News (publisherID, title, description, event_start, create_date, delete_date)
+        VALUES (1, 'В корзине', 'Описание', '2025-01-01', '2025-01-01', '2025-02-01');
+        INSERT INTO Files (guid, format) VALUES ('guid1', 'png'), ('guid2', 'png');
+        INSERT INTO File_Link (fileID, newsID) VALUES (1, 1), (1, 1), (2, 3);
+    ''')
+    connection.commit()
+
+    # user_version = 0: базовая миграция повторяется поверх существующих таблиц (IF NOT EXISTS)
+    assert apply_migrations(connection) == [version for version, _, _ in MIGRATIONS]
+    assert apply_migrations(connection) == []
+    assert connection.execute('PRAGMA user_version').fetchone()[0] == LATEST_VERSION
+    assert connection.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+    assert connection.execute('PRAGMA foreign_key_check').fetchall() == []
+
+    # Существующие данные перенесены в новые структуры
+    assert connection.execute("SELECT rowid FROM News_FTS WHERE News_FTS MATCH 'елка'").fetchall() == [(1,)]
+    assert connection.execute('SELECT login_key, nick_key FROM Users').fetchall() == [("иван", "ёж")]
+    assert connection.execute('SELECT name_key FROM Categories').fetchall() == [("спорт",)]
+    assert connection.execute(
+        'SELECT pending_news, users, trash_news, archived_news FROM Dashboard_Counters'
+    ).fetchone() == (1, 1, 1, 0)
+    assert connection.execute('SELECT fileID, newsID FROM File_Link ORDER BY fileID').fetchall() == [(1, 1), (2, 3)]
+    assert connection.execute('SELECT variants_date FROM Files').fetchall() == [(None,), (None,)]
+
+    # Триггеры поздних миграций работают на старых данных
+    connection.execute('PRAGMA foreign_keys = ON')
+    connection.execute('DELETE FROM News WHERE delete_date IS NOT NULL')
+    connection.commit()
+    assert connection.execute('SELECT guid FROM File_Deletions').fetchall() == [("guid2",)]
+    assert connection.execute('SELECT trash_news FROM Dashboard_Counters').fetchone() == (0,)
+    connection.close()
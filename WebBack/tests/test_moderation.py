@@ -0,0 +1,148 @@
+"""Переходы статусов новости: модерация, архив и восстановление из корзины."""
+import threading
+
+import pytest
+
+from app.routes import TRANSITION_CONFLICTS
+from database import db as db_module
+
+
+def add_news(db, status='Pending', deleted=False):
+    db.cursor.execute('''
+        INSERT INTO News (publisherID, title, description, status, event_start, create_date, delete_date)
+        VALUES (1, 'Новость', 'Описание', ?, '2025-01-01 10:00:00', '2025-01-01 10:00:00',
+                CASE WHEN ? THEN '2025-02-01 10:00:00' END)
+        RETURNING newsID
+    ''', (status, deleted))
+    news_id = db.cursor.fetchone()[0]
+    db.connection.commit()
+    return news_id
+
+
+def news_state(db, news_id):
+    db.cursor.execute('SELECT status, moderated_byID, delete_date IS NOT NULL AS deleted FROM News WHERE newsID = ?',
+                      (news_id,))
+    return dict(db.cursor.fetchone())
+
+
+def moderate(client, headers, news_id, action):
+    return client.post(f'/api/admin/moderate-news/{news_id}', json={"action": action}, headers=headers)
+
+
+# URL перехода, статус новости до него (в корзине или нет) и ожидаемый статус после
+TRANSITIONS = {
+    "archive":        ("/api/news/{}/archive", 'Approved', False, 'Archived'),
+    "unarchive":      ("/api/admin/archived-news/{}/restore", 'Archived', False, 'Approved'),
+    "unarchive_edit": ("/api/admin/archived-news/{}/restore-edit", 'Archived', False, 'Pending'),
+    "restore":        ("/api/admin/trash/{}/restore", 'Rejected', True, 'Pending'),
+}
+
+
+@pytest.mark.parametrize("action", sorted(TRANSITIONS))
+def test_transition_applied_once(client, db, admin_headers, action):
+    url, status, deleted, new_status = TRANSITIONS[action]
+    news_id = add_news(db, status, deleted)
+
+    assert client.post(url.format(news_id), headers=admin_headers).status_code == 200
+    assert news_state(db, news_id) == {"status": new_status, "moderated_byID": None, "deleted": 0}
+
+    # Повтор: новость уже не в исходном состоянии
+    response = client.post(url.format(news_id), headers=admin_headers)
+    if action == "restore":
+        # Новости больше нет в корзине — для восстановления её нет
+        assert response.status_code == 404
+    else:
+        assert response.status_code == 422
+        assert response.get_json()['error'] == TRANSITION_CONFLICTS[action][0]
+    assert news_state(db, news_id)['status'] == new_status
+
+    # Несуществующая новость — 404
+    assert client.post(url.format(news_id + 100), headers=admin_headers).status_code == 404
+
+
+def test_moderation_not_found_vs_conflict(client, db, admin_headers):
+    pending = add_news(db)
+    approved = add_news(db, 'Approved')
+    in_trash = add_news(db, 'Pending', deleted=True)
+
+    assert moderate(client, admin_headers, 999, "approve").status_code == 404
+    # Новость в корзине не модерируется: её нет там, где ждёт переход
+    assert moderate(client, admin_headers, in_trash, "approve").status_code == 404
+    assert news_state(db, in_trash) == {"status": 'Pending', "moderated_byID": None, "deleted": 1}
+
+    # Статус не допускает переход — 422, новость не меняется
+    response = moderate(client, admin_headers, approved, "reject")
+    assert response.status_code == 422
+    assert response.get_json()['type'] == "business_rule_violation"
+    assert news_state(db, approved) == {"status": 'Approved', "moderated_byID": None, "deleted": 0}
+
+    response = moderate(client, admin_headers, pending, "reject")
+    assert response.get_json()['newStatus'] == 'Rejected'
+    assert news_state(db, pending) == {"status": 'Rejected', "moderated_byID": 1, "deleted": 1}
+
+
+def test_concurrent_moderation_applies_once(app, db, admin_headers):
+    news_id = add_news(db)
+    barrier = threading.Barrier(2)
+    responses = []
+
+    def run():
+        client = app.test_client()
+        barrier.wait()
+        responses.append(moderate(client, admin_headers, news_id, "approve"))
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Один модератор одобрил, второй получил конфликт, а не обработал новость повторно
+    assert sorted(response.status_code for response in responses) == [200, 422]
+    conflict = next(response for response in responses if response.status_code == 422)
+    assert conflict.get_json()['error'] == TRANSITION_CONFLICTS["approve"][0]
+    assert news_state(db, news_id) == {"status": 'Approved', "moderated_byID": 1, "deleted": 0}
+
+
+def test_moderation_batch_mixed(app, client, db, admin_headers, monkeypatch):
+    app.config['MODERATION_BATCH_CHUNK_SIZE'] = 2
+    chunks = []
+    batched = db_module._batched
+
+    def recording_batched(iterable, size):
+        for chunk in batched(iterable, size):
+            chunks.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr(db_module, '_batched', recording_batched)
+
+    approve = [add_news(db) for _ in range(5)]
+    rejected = add_news(db)
+    approved = add_news(db, 'Approved')
+    items = [{"newsID": news_id, "action": "approve"} for news_id in approve] + [
+        {"newsID": rejected, "action": "reject"},
+        {"newsID": "1", "action": "approve"},
+        {"newsID": approve[0], "action": "reject"},
+        {"newsID": 999, "action": "approve"},
+        {"newsID": approved, "action": "approve"},
+        {"newsID": rejected + 100, "action": "publish"},
+    ]
+    response = client.post('/api/admin/moderate-news/batch', json={"items": items}, headers=admin_headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['applied'], body['failed']) == (6, 5)
+
+    results = body['results']
+    assert [result['index'] for result in results] == list(range(len(items)))
+    assert [result.get('newStatus') for result in results[:6]] == ['Approved'] * 5 + ['Rejected']
+    assert [result.get('error_code') for result in results[6:]] == [
+        "INVALID_ITEM", "DUPLICATE_ITEM", "NOT_FOUND", "ALREADY_MODERATED", "INVALID_ACTION"
+    ]
+
+    # Семь одобрений (с отсутствующей и уже одобренной) — четыре UPDATE
+    # по MODERATION_BATCH_CHUNK_SIZE, отклонение — ещё один
+    assert sorted(chunks) == [1, 1, 2, 2, 2]
+    assert all(news_state(db, news_id) == {"status": 'Approved', "moderated_byID": 1, "deleted": 0}
+               for news_id in approve)
+    assert news_state(db, rejected) == {"status": 'Rejected', "moderated_byID": 1, "deleted": 1}
+    assert news_state(db, approved) == {"status": 'Approved', "moderated_byID": None, "deleted": 0}
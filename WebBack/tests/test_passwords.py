@@ -0,0 +1,26 @@
+"""Хэширование паролей в пуле процессов (app/passwords.py)."""
+import os
+import signal
+
+from app.passwords import PasswordHasher
+
+
+def crash_once(marker):
+    """Первый вызов убивает процесс пула, повторный возвращает результат."""
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os.kill(os.getpid(), signal.SIGKILL)
+    return "done"
+
+
+def test_hasher_survives_killed_worker(tmp_path):
+    hasher = PasswordHasher(method='pbkdf2:sha256:1000', workers=1)
+    try:
+        pwhash = hasher.hash("secret1")
+        # Процесс пула погиб посреди задачи: она повторяется в новом пуле
+        assert hasher._call(crash_once, str(tmp_path / "marker")) == "done"
+        assert hasher.verify(pwhash, "secret1")
+        assert hasher.stats()['rebuilt'] == 1
+        assert hasher._pool._get_executor()._mp_context.get_start_method() != 'fork'
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,35 @@
+"""Полнотекстовый поиск: подсветка поверх исходного текста новости."""
+
+
+def add_approved(db, title, description):
+    db.cursor.execute('''
+        INSERT INTO News (publisherID, title, description, status, event_start, create_date)
+        VALUES (1, ?, ?, 'Approved', '2025-01-01 10:00:00', datetime('now', 'localtime'))
+    ''', (title, description))
+    db.connection.commit()
+
+
+def search(client, query):
+    response = client.get('/api/news/search', query_string={"q": query})
+    assert response.status_code == 200
+    return response.get_json()['items']
+
+
+def test_highlight_keeps_yo(client, db, admin_headers):
+    add_approved(db, "Ёлка новость", "Описание ёжика")
+    items = search(client, "елка")
+    assert items[0]['title_highlight'] == "<mark>Ёлка</mark> новость"
+    assert items[0]['snippet'] == "Описание ёжика"
+
+    items = search(client, "ёжик")
+    assert items[0]['snippet'] == "Описание <mark>ёжика</mark>"
+
+
+def test_snippet_fragment_and_escaping(client, db, admin_headers):
+    words = ["слово"] * 40
+    words[30] = "ёжик"
+    add_approved(db, "<b>Ёж</b> и ель", " ".join(words))
+    item = search(client, "ежик")[0]
+    assert "<mark>ёжик</mark>" in item['snippet']
+    assert item['snippet'].startswith("…") and "ежик" not in item['snippet']
+    assert item['title_highlight'] == "&lt;b&gt;Ёж&lt;/b&gt; и ель"
@@ -0,0 +1,42 @@
+"""Потоковые списки: пачки по keyset, без курсора и соединения между пачками."""
+
+
+def add_news(db, count, delete_date=None):
+    db.cursor.executemany('''
+        INSERT INTO News (publisherID, title, description, status, event_start, create_date, delete_date)
+        VALUES (1, ?, 'Описание', 'Approved', '2025-01-01 10:00:00', '2025-01-01 10:00:00', ?)
+    ''', ((f"Новость {i}", delete_date) for i in range(count)))
+    db.connection.commit()
+
+
+def test_stream_does_not_hold_read_connection(app, client, db, admin_headers):
+    add_news(db, 5)
+    read_pool = app.extensions['db_read_pool']
+
+    response = client.get('/api/news')
+    assert response.status_code == 200
+    # первый элемент уже прочитан, остальное ещё не отдано клиенту
+    assert read_pool.stats()['in_use'] == 0
+
+    db.cursor.execute("UPDATE News SET description = 'Изменено'")
+    db.connection.commit()
+    assert db.wal_checkpoint('TRUNCATE')['busy'] == 0
+
+    assert [item['description'] for item in response.get_json()] == ['Описание'] * 5
+
+
+def test_keyset_batches_with_equal_sort_keys(db, admin_headers):
+    add_news(db, 7, delete_date='2025-02-01 10:00:00')
+    keys = (('n.delete_date', 'delete_date'), ('n.newsID', 'newsID'))
+    batches = list(db._iter_keyset(
+        'SELECT n.newsID, n.delete_date FROM News n',
+        where='n.delete_date IS NOT NULL',
+        keys=keys,
+        descending=True,
+        batch_size=3
+    ))
+    assert [len(rows) for rows in batches] == [3, 3, 1]
+
+    streamed = [row['newsID'] for rows in batches for row in rows]
+    assert streamed == [item['newsID'] for item in db.get_deleted_news()]
+    assert streamed == sorted(streamed, reverse=True)
@@ -0,0 +1,47 @@
+"""Загрузка файлов новостей: проверка при создании и правке."""
+import io
+
+from conftest import news_form
+
+
+def test_update_rejects_invalid_files(client, db, admin_headers):
+    assert client.post('/api/news', data=news_form("Новость"), headers=admin_headers,
+                       content_type='multipart/form-data').status_code < 300
+    db.cursor.execute('SELECT newsID FROM News')
+    news_id = db.cursor.fetchone()['newsID']
+
+    for filename in ("virus.exe", "noextension"):
+        response = client.put(
+            f'/api/news/{news_id}',
+            data=news_form("Правка", [(io.BytesIO(b"data"), filename)]),
+            headers=admin_headers,
+            content_type='multipart/form-data'
+        )
+        assert response.status_code == 400
+        assert response.get_json()['error'] == f"Недопустимый формат файла: {filename}"
+
+    db.cursor.execute('SELECT title FROM News WHERE newsID = ?', (news_id,))
+    assert db.cursor.fetchone()['title'] == "Новость"
+
+
+def test_original_served_without_database(app, client, db, admin_headers):
+    png = b"\x89PNG\r\n\x1a\n" + b"\0" * 32
+    response = client.post('/api/news', data=news_form("С файлом", [(io.BytesIO(png), "a.png")]),
+                           headers=admin_headers, content_type='multipart/form-data')
+    assert response.status_code < 300
+    db.cursor.execute('SELECT guid FROM Files')
+    guid = db.cursor.fetchone()['guid']
+    read_pool = app.extensions['db_read_pool']
+
+    before = read_pool.stats()['checkouts']
+    response = client.get(f'/uploads/{guid}')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png' and response.data == png
+    assert 'immutable' in response.headers['Cache-Control']
+    assert read_pool.stats()['checkouts'] == before
+
+    assert client.get(f'/uploads/{guid}', query_string={"w": 100}).status_code == 200
+    assert read_pool.stats()['checkouts'] == before + 1
+
+    assert client.get('/uploads/missing').status_code == 404
+    assert client.get('/uploads/.staging').status_code == 404
@@ -3,6 +3,7 @@ import { api } from '../services/apiClient';
 import { toast } from 'react-toastify';
 import { useNavigate } from 'react-router-dom';
 import usePagination from './usePagination';
+import { waitForJob } from '../services/jobs';
 
 const useTrashManagement = ({ isActiveTab, onExternalRefresh = 0 }) => {
   const {
@@ -126,7 +127,8 @@ const useTrashManagement = ({ isActiveTab, onExternalRefresh = 0 }) => {
   const purgeTrash = useCallback(async () => {
     if (!window.confirm('Удалить ВСЕ новости безвозвратно?')) return;
     try {
-      await api.delete('/admin/trash/purge');
+      const { jobID } = await api.delete('/admin/trash/purge');
+      await waitForJob(jobID);
       setAllTrash([]);
       toast.success('Корзина очищена');
     } catch {
@@ -2,6 +2,7 @@ import { useState, useCallback, useEffect } from 'react';
 import { api } from '../services/apiClient';
 import { toast } from "react-toastify";
 import usePagination from './usePagination';
+import { waitForJob } from '../services/jobs';
 
 const useUsersManagement = () => {
   const { 
@@ -85,26 +86,22 @@ const useUsersManagement = () => {
     if (!window.confirm("Вы уверены, что хотите удалить ВСЕХ пользователей?")) return;
     
     try {
-      const response = await api.delete("/admin/users/all");
-      
-      setUsers(response.remainingUsers || []);
+      const { jobID, message } = await api.delete("/admin/users/all");
+      toast.info(message);
+
+      const job = await waitForJob(jobID);
       
       setFilters({
         role: '',
         dateRange: [],
       });
 
-      setPagination(prev => ({
-        ...prev,
-        currentPage: 1,
-        totalItems: response.remainingUsers.length,
-        totalPages: Math.ceil(response.remainingUsers.length / prev.perPage)
-      }));
+      await fetchUsers();
       
-      toast.success(`Удалено ${response.deletedCount} пользователей`);
+      toast.success(`Удалено ${job.result?.users_delete ?? 0} пользователей`);
     } catch (error) {
     }
-  }, [setPagination]);
+  }, [fetchUsers]);
 
   const fetchRealPasswords = useCallback(async () => {
     try {
@@ -0,0 +1,23 @@
+import { toast } from "react-toastify";
+import { api } from "./apiClient";
+
+const POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Длинные операции сервер выполняет фоновым заданием: ответ 202 содержит jobID,
+// ход задания — GET /admin/jobs/<jobID>. Ждём, пока задание не завершится.
+export const waitForJob = async (jobID, interval = POLL_INTERVAL_MS) => {
+  for (;;) {
+    const job = await api.get(`/admin/jobs/${jobID}`);
+    if (job.status === "done") {
+      return job;
+    }
+    if (job.status === "failed") {
+      const errorMessage = job.error || "Фоновое задание завершилось с ошибкой";
+      toast.error(errorMessage);
+      throw new Error(errorMessage);
+    }
+    await sleep(interval);
+  }
+};